@@ -1,13 +1,23 @@
 import streamlit as st
 import pandas as pd
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 import altair as alt
 import urllib.parse
-import sqlite3
 import os
+import io
+import uuid
 from contextlib import contextmanager
 
+from emotional_toolkit.cache import LRUCache
+from emotional_toolkit.db import retry
+from emotional_toolkit.frames import evidence_frame as rows_to_frame, summary_frame
+from emotional_toolkit.keywords import KeywordMatcher
+from emotional_toolkit.search import search_evidence
+from emotional_toolkit.storage import ShardedStorage, parse_shards
+from emotional_toolkit.transfer import export_evidence, export_reframing, import_evidence, import_reframing, read_records
+from emotional_toolkit.writebehind import WriteBehindQueue
+
 # Page config
 st.set_page_config(
     page_title="Your Emotional Toolkit",
@@ -18,58 +28,58 @@ st.set_page_config(
 # Database setup
 DB_PATH = "emotional_toolkit.db"
 
+# TOOLKIT_SHARDS spreads users over several database files: a number of
+# hash shards, or "user" for a file per user (default 1, DB_PATH only)
+SHARDS = parse_shards(os.environ.get("TOOLKIT_SHARDS"))
+
+# Most shard files kept open at once
+OPEN_SHARDS = 32
+
+# TOOLKIT_WRITE_BEHIND=1 queues saves, edits and deletes for a background
+# thread instead of committing them in the script thread
+WRITE_BEHIND = os.environ.get("TOOLKIT_WRITE_BEHIND", "") not in ("", "0")
+
+# Seconds the Evidence Locker list waits for queued writes before reading
+WRITE_BEHIND_READ_WAIT = 0.25
+
+@st.cache_resource
+def get_storage():
+    """The process's database shards, each with a pool of long-lived connections shared by all sessions"""
+    return ShardedStorage(DB_PATH, SHARDS, max_open=OPEN_SHARDS)
+
 @contextmanager
-def get_db_connection():
-    """Context manager for database connections"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
+def get_db_connection(user_slug):
+    """Context manager borrowing a pooled connection to the user's database shard"""
+    with get_storage().connection(user_slug) as conn:
         yield conn
-    finally:
-        conn.close()
-
-def init_database():
-    """Initialize the database tables"""
-    with get_db_connection() as conn:
-        # Evidence table
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS evidence (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_slug TEXT NOT NULL,
-                date TEXT NOT NULL,
-                category TEXT NOT NULL,
-                evidence TEXT NOT NULL,
-                impact INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Reframing history table
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS reframing_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_slug TEXT NOT NULL,
-                original_thought TEXT NOT NULL,
-                reframed_thought TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Create indexes for better performance
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_evidence_user ON evidence(user_slug)')
-        conn.execute('CREATE INDEX IF NOT EXISTS idx_reframing_user ON reframing_history(user_slug)')
-        conn.commit()
 
-# Initialize database on app start
-init_database()
+def get_user_id(user_slug):
+    """The user's integer id, which rows refer to them by; added on first use, then cached in process"""
+    return get_storage().user_id(user_slug)
+
+@st.cache_resource
+def get_write_queue():
+    """The process's write-behind queue, replaying any writes a crash left in its journal"""
+    queue = WriteBehindQueue(get_storage(), DB_PATH + ".writes")
+    queue.start()
+    return queue
+
+def queue_write(user_slug, description, sql, params, id_params=(), returns_id=False, must_change=False):
+    """Hand a write to the write-behind queue instead of waiting for its commit"""
+    return get_write_queue().submit(
+        st.session_state.session_id, user_slug, description, sql, params, id_params, returns_id, must_change
+    )
 
 # Initialize session state
 if 'evidence_df' not in st.session_state:
-    st.session_state.evidence_df = pd.DataFrame(columns=["Date", "Category", "Evidence", "Impact"])
+    st.session_state.evidence_df = pd.DataFrame(columns=["Date", "Category", "Evidence", "Impact"]).rename_axis("id")
 
 if 'reframing_history' not in st.session_state:
     st.session_state.reframing_history = []
 
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 if 'editing_reframing' not in st.session_state:
     st.session_state.editing_reframing = None
 
@@ -132,6 +142,15 @@ CATEGORIES = {
     "Patience & Understanding": "⏳"
 }
 
+# Users whose data is kept in memory, shared by all of their sessions
+SHARED_USER_CACHE_SIZE = 64
+
+# Evidence texts kept in memory across sessions; the rest load on demand
+EVIDENCE_TEXT_CACHE_SIZE = 10_000
+
+# Evidence Locker entries shown per page
+EVIDENCE_PAGE_SIZE = 20
+
 # Better keyword mapping for relevant evidence
 CATEGORY_KEYWORDS = {
     "Loving Action": ['love', 'loving', 'affection', 'care', 'caring', 'romantic', 'sweet', 'kind', 'kindness'],
@@ -143,97 +162,293 @@ CATEGORY_KEYWORDS = {
     "Patience & Understanding": ['patient', 'patience', 'understand', 'understanding', 'listen', 'calm']
 }
 
-# Database functions
+@st.cache_resource
+def get_category_matcher():
+    """CATEGORY_KEYWORDS compiled once per process into a single-pass matcher"""
+    return KeywordMatcher(CATEGORY_KEYWORDS)
+
+# Database functions (retried with backoff while another session holds the write lock)
+@retry()
 def save_evidence(user_slug, date, category, evidence, impact):
-    """Save evidence to database"""
-    with get_db_connection() as conn:
-        conn.execute(
-            'INSERT INTO evidence (user_slug, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
-            (user_slug, date.isoformat(), category, evidence, impact)
+    """Save evidence to database, returns the new row id (a temporary one while queued)"""
+    user_id = get_user_id(user_slug)
+    if WRITE_BEHIND:
+        return queue_write(
+            user_slug, "Saving evidence",
+            'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+            (user_id, date.isoformat(), category, evidence, impact),
+            returns_id=True
+        )
+    with get_db_connection(user_slug) as conn:
+        cursor = conn.execute(
+            'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+            (user_id, date.isoformat(), category, evidence, impact)
         )
         conn.commit()
+        return cursor.lastrowid
 
+def evidence_frame(rows):
+    """DataFrame of evidence rows, indexed by row id, with Category a categorical over CATEGORIES"""
+    return rows_to_frame(rows, CATEGORIES)
+
+@retry()
 def get_user_evidence(user_slug):
-    """Get all evidence for a user"""
-    with get_db_connection() as conn:
-        cursor = conn.execute(
-            'SELECT date, category, evidence, impact FROM evidence WHERE user_slug = ? ORDER BY date DESC',
-            (user_slug,)
+    """Get all evidence for a user, indexed by row id, without the text (see get_evidence_texts)"""
+    user_id = get_user_id(user_slug)
+    with get_db_connection(user_slug) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None  # plain tuples, cheaper than sqlite3.Row for every row
+        cursor.execute(
+            'SELECT id, date, category, impact FROM evidence WHERE user_id = ? ORDER BY date DESC, id DESC',
+            (user_id,)
         )
-        rows = cursor.fetchall()
-        
-        if not rows:
-            return pd.DataFrame(columns=["Date", "Category", "Evidence", "Impact"])
-        
-        data = []
-        for row in rows:
-            data.append({
-                "Date": datetime.fromisoformat(row['date']).date(),
-                "Category": row['category'],
-                "Evidence": row['evidence'],
-                "Impact": row['impact']
-            })
-        
-        return pd.DataFrame(data)
+        return summary_frame(cursor.fetchall(), CATEGORIES)
 
-def delete_evidence(user_slug, index):
-    """Delete evidence entry by index"""
-    with get_db_connection() as conn:
-        # Get all evidence for user ordered by date to find the correct ID
-        cursor = conn.execute(
-            'SELECT id FROM evidence WHERE user_slug = ? ORDER BY date DESC',
-            (user_slug,)
+@st.cache_resource
+def get_evidence_text_cache():
+    """Evidence text by (user, row id), least recently used evicted first; row ids are per shard"""
+    return LRUCache(EVIDENCE_TEXT_CACHE_SIZE)
+
+@retry()
+def get_evidence_texts(user_slug, evidence_ids):
+    """Evidence text by row id for the given ids, read from the database only on a cache miss"""
+    user_id = get_user_id(user_slug)
+    cache = get_evidence_text_cache()
+    texts = {evidence_id: cache.get((user_slug, evidence_id)) for evidence_id in evidence_ids}
+    missing = [evidence_id for evidence_id, text in texts.items() if text is None]
+    if missing:
+        with get_db_connection(user_slug) as conn:
+            rows = conn.execute(
+                f'SELECT id, evidence FROM evidence WHERE user_id = ? AND id IN ({", ".join("?" * len(missing))})',
+                (user_id, *missing)
+            )
+            for row in rows:
+                texts[row['id']] = row['evidence']
+                cache.put((user_slug, row['id']), row['evidence'])
+    return texts
+
+def with_evidence_text(df):
+    """Copy of a few session evidence rows with their Evidence text filled in"""
+    texts = get_evidence_texts(st.session_state.user_slug, [int(evidence_id) for evidence_id in df.index])
+    return df.assign(Evidence=[texts.get(int(evidence_id), "") for evidence_id in df.index])
+
+def filter_is_selective(matching, total, page_size=EVIDENCE_PAGE_SIZE):
+    """Whether a page of matching out of total entries is cheaper to read through the filters' index.
+    
+    In date order a page reads about page_size × total / matching entries
+    before it has found page_size matches; through the filters' index it
+    reads and sorts the matching entries.
+    """
+    return matching * matching < page_size * total
+
+@retry()
+def get_evidence_page(user_slug, categories, min_impact, after=None, page_size=EVIDENCE_PAGE_SIZE, selective=False):
+    """One page of filtered evidence, newest first, and whether older entries follow.
+    
+    Uses keyset pagination: after is the (date, id) of the last entry of the
+    previous page, so every page is a single index range scan however deep it is.
+    With selective (see filter_is_selective), the matches are looked up
+    through idx_evidence_user_category_impact and sorted instead.
+    """
+    user_id = get_user_id(user_slug)
+    if not categories:
+        return evidence_frame([]), False
+    
+    placeholders = ", ".join("?" * len(categories))
+    if selective:
+        query = (
+            'SELECT id, date, category, evidence, impact FROM evidence INDEXED BY idx_evidence_user_category_impact '
+            f'WHERE user_id = ? AND category IN ({placeholders}) AND impact >= ?'
         )
-        rows = cursor.fetchall()
+    else:
+        # Unary + keeps the filters off idx_evidence_user_category_impact, which
+        # would need every match sorted; idx_evidence_user_date_id reads in order
+        query = (
+            'SELECT id, date, category, evidence, impact FROM evidence '
+            f'WHERE user_id = ? AND +category IN ({placeholders}) AND +impact >= ?'
+        )
+    params = [user_id, *categories, min_impact]
+    if after is not None:
+        query += ' AND (date < ? OR (date = ? AND id < ?))'
+        params += [after[0], after[0], after[1]]
+    query += ' ORDER BY date DESC, id DESC LIMIT ?'
+    params.append(page_size + 1)  # one extra row tells whether there is a next page
+    
+    with get_db_connection(user_slug) as conn:
+        rows = conn.execute(query, params).fetchall()
+        return evidence_frame(rows[:page_size]), len(rows) > page_size
+
+@retry()
+def search_user_evidence(user_slug, text, limit=3):
+    """Evidence ranked by full-text relevance to text (blended with impact), or None if search is unavailable"""
+    user_id = get_user_id(user_slug)
+    with get_db_connection(user_slug) as conn:
+        rows = search_evidence(conn, user_id, text, limit)
+        return None if rows is None else evidence_frame(rows)
+
+@retry()
+def count_evidence(user_slug, categories=None, min_impact=1):
+    """Number of a user's evidence entries, optionally only those matching the filters.
+    
+    Read from the summary tables unless there is an impact filter.
+    """
+    user_id = get_user_id(user_slug)
+    if categories is None:
+        query = 'SELECT entries FROM evidence_user_stats WHERE user_id = ?'
+        params = [user_id]
+    elif not categories:
+        return 0
+    elif min_impact <= 1:
+        query = (
+            'SELECT SUM(entries) FROM evidence_category_stats '
+            f'WHERE user_id = ? AND category IN ({", ".join("?" * len(categories))})'
+        )
+        params = [user_id, *categories]
+    else:
+        query = (
+            'SELECT COUNT(*) FROM evidence '
+            f'WHERE user_id = ? AND category IN ({", ".join("?" * len(categories))}) AND impact >= ?'
+        )
+        params = [user_id, *categories, min_impact]
+    with get_db_connection(user_slug) as conn:
+        row = conn.execute(query, params).fetchone()
+        return row[0] if row and row[0] is not None else 0
+
+@retry()
+def get_dashboard_data(user_slug):
+    """Growth Dashboard figures, read from the per-user summary tables kept up to date by triggers"""
+    user_id = get_user_id(user_slug)
+    with get_db_connection(user_slug) as conn:
+        summary = conn.execute(
+            'SELECT entries, impact_sum, first_date, last_date FROM evidence_user_stats WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+        if summary is None:
+            return None
         
-        if 0 <= index < len(rows):
-            evidence_id = rows[index]['id']
-            conn.execute('DELETE FROM evidence WHERE id = ?', (evidence_id,))
-            conn.commit()
-            return True
-        return False
+        # Ties go to the first category alphabetically, like Series.mode()
+        category_counts = pd.DataFrame(
+            [tuple(row) for row in conn.execute(
+                'SELECT category, entries FROM evidence_category_stats WHERE user_id = ? ORDER BY entries DESC, category',
+                (user_id,)
+            )],
+            columns=['Category', 'Count']
+        )
+        monthly_stats = pd.DataFrame(
+            [(row['month'], row['impact_sum'] / row['entries'], row['entries']) for row in conn.execute(
+                'SELECT month, entries, impact_sum FROM evidence_monthly_stats WHERE user_id = ? ORDER BY month',
+                (user_id,)
+            )],
+            columns=['Month', 'Average_Impact', 'Entry_Count']
+        )
+        milestones = evidence_frame(conn.execute(
+            'SELECT id, date, category, evidence, impact FROM evidence '
+            'WHERE user_id = ? ORDER BY impact DESC, date DESC, id DESC LIMIT 3',
+            (user_id,)
+        ).fetchall())
+    
+    first_date = datetime.fromisoformat(summary['first_date']).date()
+    last_date = datetime.fromisoformat(summary['last_date']).date()
+    return {
+        "total_entries": summary['entries'],
+        "average_impact": summary['impact_sum'] / summary['entries'],
+        "top_category": category_counts['Category'].iloc[0],
+        "days_span": (last_date - first_date).days + 1,
+        "category_counts": category_counts,
+        "monthly_stats": monthly_stats,
+        "milestones": milestones,
+    }
 
-def update_evidence(user_slug, index, date, category, evidence, impact):
-    """Update evidence entry"""
-    with get_db_connection() as conn:
-        # Get all evidence for user ordered by date to find the correct ID
+@retry()
+def get_data_version(user_slug):
+    """Counter bumped (by triggers) on every write to a user's data, 0 before the first"""
+    user_id = get_user_id(user_slug)
+    with get_db_connection(user_slug) as conn:
+        row = conn.execute('SELECT version FROM user_data_versions WHERE user_id = ?', (user_id,)).fetchone()
+        return 0 if row is None else row['version']
+
+@retry()
+def delete_evidence(user_slug, evidence_id):
+    """Delete evidence entry by id"""
+    user_id = get_user_id(user_slug)
+    if WRITE_BEHIND:
+        queue_write(
+            user_slug, "Deleting evidence",
+            'DELETE FROM evidence WHERE id = ? AND user_id = ?',
+            (int(evidence_id), user_id),
+            id_params=(0,), must_change=True
+        )
+        return True
+    with get_db_connection(user_slug) as conn:
+        cursor = conn.execute('DELETE FROM evidence WHERE id = ? AND user_id = ?', (evidence_id, user_id))
+        conn.commit()
+        return cursor.rowcount > 0
+
+@retry()
+def update_evidence(user_slug, evidence_id, date, category, evidence, impact):
+    """Update evidence entry by id"""
+    user_id = get_user_id(user_slug)
+    if WRITE_BEHIND:
+        queue_write(
+            user_slug, "Updating evidence",
+            'UPDATE evidence SET date = ?, category = ?, evidence = ?, impact = ? WHERE id = ? AND user_id = ?',
+            (date.isoformat(), category, evidence, impact, int(evidence_id), user_id),
+            id_params=(4,), must_change=True
+        )
+        return True
+    with get_db_connection(user_slug) as conn:
         cursor = conn.execute(
-            'SELECT id FROM evidence WHERE user_slug = ? ORDER BY date DESC',
-            (user_slug,)
+            'UPDATE evidence SET date = ?, category = ?, evidence = ?, impact = ? WHERE id = ? AND user_id = ?',
+            (date.isoformat(), category, evidence, impact, evidence_id, user_id)
         )
-        rows = cursor.fetchall()
-        
-        if 0 <= index < len(rows):
-            evidence_id = rows[index]['id']
-            conn.execute(
-                'UPDATE evidence SET date = ?, category = ?, evidence = ?, impact = ? WHERE id = ?',
-                (date.isoformat(), category, evidence, impact, evidence_id)
-            )
-            conn.commit()
-            return True
-        return False
+        conn.commit()
+        return cursor.rowcount > 0
 
+@retry()
 def save_reframing(user_slug, original_thought, reframed_thought):
-    """Save reframing to database"""
-    with get_db_connection() as conn:
-        conn.execute(
-            'INSERT INTO reframing_history (user_slug, original_thought, reframed_thought) VALUES (?, ?, ?)',
-            (user_slug, original_thought, reframed_thought)
+    """Save reframing to database, returns the new history entry"""
+    user_id = get_user_id(user_slug)
+    if WRITE_BEHIND:
+        # Stamped here, in the database's CURRENT_TIMESTAMP format (UTC)
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        reframing_id = queue_write(
+            user_slug, "Saving reframing",
+            'INSERT INTO reframing_history (user_id, original_thought, reframed_thought, created_at) VALUES (?, ?, ?, ?)',
+            (user_id, original_thought, reframed_thought, created_at),
+            returns_id=True
         )
+        return {"id": reframing_id, "original": original_thought, "reframed": reframed_thought, "date": created_at}
+    with get_db_connection(user_slug) as conn:
+        # created_at is filled in by the database; read back in the same
+        # statement, so a retry can never insert the entry twice
+        row = conn.execute(
+            'INSERT INTO reframing_history (user_id, original_thought, reframed_thought) VALUES (?, ?, ?) '
+            'RETURNING id, created_at',
+            (user_id, original_thought, reframed_thought)
+        ).fetchone()
         conn.commit()
+        return {
+            "id": row['id'],
+            "original": original_thought,
+            "reframed": reframed_thought,
+            "date": row['created_at']
+        }
 
+@retry()
 def get_user_reframing_history(user_slug):
     """Get all reframing history for a user"""
-    with get_db_connection() as conn:
+    user_id = get_user_id(user_slug)
+    with get_db_connection(user_slug) as conn:
         cursor = conn.execute(
-            'SELECT original_thought, reframed_thought, created_at FROM reframing_history WHERE user_slug = ? ORDER BY created_at DESC',
-            (user_slug,)
+            'SELECT id, original_thought, reframed_thought, created_at FROM reframing_history WHERE user_id = ? ORDER BY created_at DESC',
+            (user_id,)
         )
         rows = cursor.fetchall()
         
         history = []
         for row in rows:
             history.append({
+                "id": row['id'],
                 "original": row['original_thought'],
                 "reframed": row['reframed_thought'],
                 "date": row['created_at']
@@ -241,114 +456,292 @@ def get_user_reframing_history(user_slug):
         
         return history
 
-def delete_reframing(user_slug, index):
-    """Delete reframing entry by index"""
-    with get_db_connection() as conn:
-        # Get all reframing for user ordered by date to find the correct ID
-        cursor = conn.execute(
-            'SELECT id FROM reframing_history WHERE user_slug = ? ORDER BY created_at DESC',
-            (user_slug,)
+@retry()
+def delete_reframing(user_slug, reframing_id):
+    """Delete reframing entry by id"""
+    user_id = get_user_id(user_slug)
+    if WRITE_BEHIND:
+        queue_write(
+            user_slug, "Deleting reframing",
+            'DELETE FROM reframing_history WHERE id = ? AND user_id = ?',
+            (int(reframing_id), user_id),
+            id_params=(0,), must_change=True
         )
-        rows = cursor.fetchall()
-        
-        if 0 <= index < len(rows):
-            reframing_id = rows[index]['id']
-            conn.execute('DELETE FROM reframing_history WHERE id = ?', (reframing_id,))
-            conn.commit()
-            return True
-        return False
+        return True
+    with get_db_connection(user_slug) as conn:
+        cursor = conn.execute('DELETE FROM reframing_history WHERE id = ? AND user_id = ?', (reframing_id, user_id))
+        conn.commit()
+        return cursor.rowcount > 0
 
-def update_reframing(user_slug, index, original_thought, reframed_thought):
-    """Update reframing entry"""
-    with get_db_connection() as conn:
-        # Get all reframing for user ordered by date to find the correct ID
+@retry()
+def update_reframing(user_slug, reframing_id, original_thought, reframed_thought):
+    """Update reframing entry by id"""
+    user_id = get_user_id(user_slug)
+    if WRITE_BEHIND:
+        queue_write(
+            user_slug, "Updating reframing",
+            'UPDATE reframing_history SET original_thought = ?, reframed_thought = ? WHERE id = ? AND user_id = ?',
+            (original_thought, reframed_thought, int(reframing_id), user_id),
+            id_params=(2,), must_change=True
+        )
+        return True
+    with get_db_connection(user_slug) as conn:
         cursor = conn.execute(
-            'SELECT id FROM reframing_history WHERE user_slug = ? ORDER BY created_at DESC',
-            (user_slug,)
+            'UPDATE reframing_history SET original_thought = ?, reframed_thought = ? WHERE id = ? AND user_id = ?',
+            (original_thought, reframed_thought, reframing_id, user_id)
         )
-        rows = cursor.fetchall()
-        
-        if 0 <= index < len(rows):
-            reframing_id = rows[index]['id']
-            conn.execute(
-                'UPDATE reframing_history SET original_thought = ?, reframed_thought = ? WHERE id = ?',
-                (original_thought, reframed_thought, reframing_id)
-            )
-            conn.commit()
-            return True
-        return False
+        conn.commit()
+        return cursor.rowcount > 0
+
+def import_user_data(user_slug, kind, uploaded_file):
+    """Bulk import an uploaded CSV or JSON file of "evidence" or "reframing" entries.
+    
+    Not retried as a whole: batches already committed would be imported twice.
+    Returns (imported, skipped, first errors).
+    """
+    fmt = "csv" if uploaded_file.name.lower().endswith(".csv") else "json"
+    user_id = get_user_id(user_slug)
+    # Decoded as it is read, so the file is never held as one big string
+    stream = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+    try:
+        with get_db_connection(user_slug) as conn:
+            records = read_records(stream, fmt)
+            if kind == "evidence":
+                return import_evidence(conn, user_id, records, CATEGORIES)
+            return import_reframing(conn, user_id, records)
+    finally:
+        stream.detach()
+
+@retry()
+def export_user_data(user_slug, kind, fmt):
+    """Bytes of a user's "evidence" or "reframing" entries, written straight from the database cursor.
+    
+    Bytes, as st.download_button reads whatever it is given into memory anyway
+    (and does not accept temporary file objects from a callable).
+    """
+    user_id = get_user_id(user_slug)
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    with get_db_connection(user_slug) as conn:
+        if kind == "evidence":
+            export_evidence(conn, user_id, text, fmt)
+        else:
+            export_reframing(conn, user_id, text, fmt)
+    text.flush()
+    text.detach()
+    return buffer.getvalue()
+
+@st.cache_resource(max_entries=SHARED_USER_CACHE_SIZE)
+def get_shared_user_data(user_slug, data_version):
+    """A user's evidence frame and reframing history, one copy shared by all of their sessions.
+    
+    Read-only: the session patches below always build new objects.
+    """
+    return get_user_evidence(user_slug), get_user_reframing_history(user_slug)
 
 def load_user_data(user_slug):
     """Load all data for a user from database"""
-    st.session_state.evidence_df = get_user_evidence(user_slug)
-    st.session_state.reframing_history = get_user_reframing_history(user_slug)
+    evidence_df, reframing_history = get_shared_user_data(user_slug, get_data_version(user_slug))
+    st.session_state.evidence_df = evidence_df
+    st.session_state.reframing_history = reframing_history
+
+# In-memory patches applied after a successful write, so the session state
+# stays in sync without re-reading every row of the user. The loaded data
+# may be shared with other sessions, so these never modify it in place.
+def add_session_evidence(evidence_id, date, category, evidence, impact):
+    """Add a newly saved evidence row to the session DataFrame"""
+    get_evidence_text_cache().put((st.session_state.user_slug, evidence_id), evidence)
+    row = summary_frame([(evidence_id, date.isoformat(), category, impact)], CATEGORIES)
+    if st.session_state.evidence_df.empty:
+        st.session_state.evidence_df = row
+    else:
+        st.session_state.evidence_df = pd.concat([row, st.session_state.evidence_df])
+
+def reload_session_evidence():
+    """Re-read the session's data, for a write to a row it has not loaded (e.g. saved in another tab)"""
+    if WRITE_BEHIND:
+        get_write_queue().flush(timeout=WRITE_BEHIND_READ_WAIT)
+    load_user_data(st.session_state.user_slug)
+
+def update_session_evidence(evidence_id, date, category, evidence, impact):
+    """Apply an edit to one row of the session DataFrame"""
+    get_evidence_text_cache().put((st.session_state.user_slug, evidence_id), evidence)
+    if evidence_id not in st.session_state.evidence_df.index:
+        reload_session_evidence()
+        return
+    evidence_df = st.session_state.evidence_df.copy()
+    evidence_df.loc[evidence_id, ["Date", "Category", "Impact"]] = [date, category, impact]
+    st.session_state.evidence_df = evidence_df
+
+def remove_session_evidence(evidence_id):
+    """Drop a deleted row from the session DataFrame"""
+    get_evidence_text_cache().pop((st.session_state.user_slug, evidence_id))
+    if evidence_id not in st.session_state.evidence_df.index:
+        reload_session_evidence()
+        return
+    st.session_state.evidence_df = st.session_state.evidence_df.drop(index=evidence_id)
+
+def sync_write_behind():
+    """Report this session's failed queued writes, and swap applied temporary ids for row ids"""
+    queue = get_write_queue()
+    failures = queue.failures(st.session_state.session_id)
+    if failures:
+        for message in failures:
+            st.error(f"⚠️ {message}")
+        # The optimistic session state is off now: start over from the database
+        queue.flush(timeout=WRITE_BEHIND_READ_WAIT)
+        load_user_data(st.session_state.user_slug)
+        return
+    
+    evidence_df = st.session_state.evidence_df
+    resolved = {}
+    for temp_id in evidence_df.index[evidence_df.index < 0]:
+        row_id = queue.resolve(st.session_state.user_slug, int(temp_id))
+        if row_id is not None:
+            resolved[temp_id] = row_id
+            text = get_evidence_text_cache().get((st.session_state.user_slug, int(temp_id)))
+            if text is not None:
+                get_evidence_text_cache().put((st.session_state.user_slug, row_id), text)
+    if resolved:
+        st.session_state.evidence_df = evidence_df.rename(index=resolved)
+    
+    if any(entry['id'] < 0 for entry in st.session_state.reframing_history):
+        st.session_state.reframing_history = [
+            {**entry, 'id': queue.resolve(st.session_state.user_slug, entry['id']) or entry['id']} if entry['id'] < 0 else entry
+            for entry in st.session_state.reframing_history
+        ]
+
+def add_session_reframing(entry):
+    """Add a newly saved entry to the session reframing history"""
+    st.session_state.reframing_history = [entry] + st.session_state.reframing_history  # History is newest first
+
+def update_session_reframing(reframing_id, original_thought, reframed_thought):
+    """Apply an edit to one entry of the session reframing history"""
+    st.session_state.reframing_history = [
+        {**entry, 'original': original_thought, 'reframed': reframed_thought} if entry['id'] == reframing_id else entry
+        for entry in st.session_state.reframing_history
+    ]
+
+def remove_session_reframing(reframing_id):
+    """Drop a deleted entry from the session reframing history"""
+    st.session_state.reframing_history = [
+        entry for entry in st.session_state.reframing_history if entry['id'] != reframing_id
+    ]
 
 def get_relevant_evidence(negative_thought):
     """Find evidence from the locker that's relevant to the current negative thought"""
     if st.session_state.evidence_df.empty:
         return []
     
-    negative_lower = negative_thought.lower()
-    relevant_categories = set()
+    # Rank the evidence text itself against the thought
+    matches = search_user_evidence(st.session_state.user_slug, negative_thought)
+    if matches is not None and not matches.empty:
+        return matches.to_dict('records')
     
-    # Check each category's keywords against the negative thought
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in negative_lower:
-                relevant_categories.add(category)
-                break
+    # Categories with a keyword (or an inflection of one) in the negative thought
+    relevant_categories = get_category_matcher().categories(negative_thought)
     
     # If we found relevant categories, get evidence from those categories
     if relevant_categories:
         relevant_evidence = st.session_state.evidence_df[
             st.session_state.evidence_df['Category'].isin(relevant_categories)
         ].nlargest(3, 'Impact')
-        return relevant_evidence.to_dict('records')
+        return with_evidence_text(relevant_evidence).to_dict('records')
     
     # If no specific matches, return highest impact evidence
-    return st.session_state.evidence_df.nlargest(2, 'Impact').to_dict('records')
+    return with_evidence_text(st.session_state.evidence_df.nlargest(2, 'Impact')).to_dict('records')
+
+def superpowers_chart(category_counts):
+    """Bar chart of evidence entries per category"""
+    return alt.Chart(category_counts).mark_bar().encode(
+        x='Count:Q',
+        y=alt.Y('Category:N', sort='-x'),
+        color=alt.value('#ff6b6b')
+    ).properties(height=300)
+
+def impact_chart(monthly_stats):
+    """Line chart of average impact per month, with points sized by entry count"""
+    line_chart = alt.Chart(monthly_stats).mark_line(point=True).encode(
+        x=alt.X('Month:N', title='Month', axis=alt.Axis(labelAngle=-45)),
+        y=alt.Y('Average_Impact:Q', title='Average Impact', scale=alt.Scale(domain=[1, 5])),
+        tooltip=['Month', 'Average_Impact', 'Entry_Count']
+    ).properties(
+        height=300,
+        title='Your Emotional Growth Journey'
+    )
+    
+    # Add points to the line
+    points = alt.Chart(monthly_stats).mark_circle(
+        size=100,
+        opacity=0.7
+    ).encode(
+        x='Month:N',
+        y='Average_Impact:Q',
+        size=alt.Size('Entry_Count:Q', legend=None, scale=alt.Scale(range=[50, 300])),
+        color=alt.value('#667eea'),
+        tooltip=['Month', 'Average_Impact', 'Entry_Count']
+    )
+    
+    return line_chart + points
 
-def edit_reframing_form(index):
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_dashboard_view(user_slug, data_version):
+    """Dashboard figures plus serialized chart specs, recomputed only when data_version changes"""
+    dashboard = get_dashboard_data(user_slug)
+    if dashboard is None:
+        return None
+    
+    dashboard['superpowers_spec'] = superpowers_chart(dashboard['category_counts']).to_dict()
+    # The trend only means something across multiple months
+    if len(dashboard['monthly_stats']) > 1:
+        dashboard['impact_spec'] = impact_chart(dashboard['monthly_stats']).to_dict()
+    else:
+        dashboard['impact_spec'] = None
+    return dashboard
+
+def edit_reframing_form(entry):
     """Form to edit a reframing entry"""
-    entry = st.session_state.reframing_history[index]
+    reframing_id = entry['id']
     
-    with st.form(f"edit_reframing_{index}"):
+    with st.form(f"edit_reframing_{reframing_id}"):
         st.write("**Edit your reframing:**")
-        edited_original = st.text_area("Original thought:", value=entry['original'], key=f"edit_orig_{index}")
-        edited_reframed = st.text_area("Balanced perspective:", value=entry['reframed'], key=f"edit_ref_{index}")
+        edited_original = st.text_area("Original thought:", value=entry['original'], key=f"edit_orig_{reframing_id}")
+        edited_reframed = st.text_area("Balanced perspective:", value=entry['reframed'], key=f"edit_ref_{reframing_id}")
         
         col1, col2 = st.columns(2)
         with col1:
             if st.form_submit_button("💾 Save Changes"):
-                if update_reframing(st.session_state.user_slug, index, edited_original, edited_reframed):
-                    load_user_data(st.session_state.user_slug)  # Reload data
-                    st.session_state.editing_reframing = None
-                    st.rerun()
+                if update_reframing(st.session_state.user_slug, reframing_id, edited_original, edited_reframed):
+                    update_session_reframing(reframing_id, edited_original, edited_reframed)
+                else:
+                    load_user_data(st.session_state.user_slug)  # Entry is gone, resync
+                st.session_state.editing_reframing = None
+                st.rerun()
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state.editing_reframing = None
                 st.rerun()
 
-def edit_evidence_form(index):
+def edit_evidence_form(evidence_id, row):
     """Form to edit an evidence entry"""
-    row = st.session_state.evidence_df.iloc[index]
-    
-    with st.form(f"edit_evidence_{index}"):
+    with st.form(f"edit_evidence_{evidence_id}"):
         st.write("**Edit your evidence:**")
-        edited_date = st.date_input("Date", value=datetime.strptime(str(row['Date']), '%Y-%m-%d'), key=f"edit_date_{index}")
+        edited_date = st.date_input("Date", value=datetime.strptime(str(row['Date']), '%Y-%m-%d'), key=f"edit_date_{evidence_id}")
         edited_category = st.selectbox("Category", options=list(CATEGORIES.keys()), 
                                      index=list(CATEGORIES.keys()).index(row['Category']), 
-                                     key=f"edit_cat_{index}")
-        edited_evidence = st.text_area("Evidence", value=row['Evidence'], key=f"edit_ev_{index}")
-        edited_impact = st.slider("Impact", 1, 5, row['Impact'], key=f"edit_imp_{index}")
+                                     key=f"edit_cat_{evidence_id}")
+        edited_evidence = st.text_area("Evidence", value=row['Evidence'], key=f"edit_ev_{evidence_id}")
+        edited_impact = st.slider("Impact", 1, 5, int(row['Impact']), key=f"edit_imp_{evidence_id}")
         
         col1, col2 = st.columns(2)
         with col1:
             if st.form_submit_button("💾 Save Changes"):
-                if update_evidence(st.session_state.user_slug, index, edited_date, edited_category, edited_evidence, edited_impact):
-                    load_user_data(st.session_state.user_slug)  # Reload data
-                    st.session_state.editing_evidence = None
-                    st.rerun()
+                if update_evidence(st.session_state.user_slug, evidence_id, edited_date, edited_category, edited_evidence, edited_impact):
+                    update_session_evidence(evidence_id, edited_date, edited_category, edited_evidence, edited_impact)
+                else:
+                    load_user_data(st.session_state.user_slug)  # Entry is gone, resync
+                st.session_state.editing_evidence = None
+                st.rerun()
         with col2:
             if st.form_submit_button("❌ Cancel"):
                 st.session_state.editing_evidence = None
@@ -409,6 +802,9 @@ if user_setup():
     if not st.session_state.data_initialized:
         load_user_data(st.session_state.user_slug)
         st.session_state.data_initialized = True
+    
+    if WRITE_BEHIND:
+        sync_write_behind()
 
     # Show user info in sidebar
     with st.sidebar:
@@ -424,6 +820,36 @@ if user_setup():
         if st.session_state.reframing_history:
             st.metric("Reframing Exercises", len(st.session_state.reframing_history))
         
+        with st.expander("📦 Import / Export"):
+            kind = st.radio("Data", ["evidence", "reframing"], horizontal=True,
+                            format_func=lambda x: "Evidence Locker" if x == "evidence" else "Reframing history")
+            
+            uploaded_file = st.file_uploader("Import a CSV or JSON file", type=["csv", "json", "jsonl", "ndjson"],
+                                             help="Columns: date, category, evidence, impact for evidence; "
+                                                  "original, reframed and optionally date for reframings")
+            if st.button("📥 Import", disabled=uploaded_file is None):
+                st.session_state.import_result = import_user_data(st.session_state.user_slug, kind, uploaded_file)
+                load_user_data(st.session_state.user_slug)
+                st.rerun()
+            
+            if 'import_result' in st.session_state:
+                imported, skipped, errors = st.session_state.import_result
+                if imported:
+                    st.success(f"Imported {imported} entries!")
+                if skipped:
+                    st.warning(f"Skipped {skipped} entries that could not be imported")
+                    for number, message in errors:
+                        st.caption(f"Entry {number}: {message}")
+            
+            slug = st.session_state.user_slug
+            col_e1, col_e2 = st.columns(2)
+            with col_e1:
+                st.download_button("⬇️ CSV", data=lambda: export_user_data(slug, kind, "csv"),
+                                   file_name=f"{slug}_{kind}.csv", mime="text/csv", key="export_csv")
+            with col_e2:
+                st.download_button("⬇️ JSON", data=lambda: export_user_data(slug, kind, "json"),
+                                   file_name=f"{slug}_{kind}.json", mime="application/json", key="export_json")
+        
         if st.button("🔄 Switch User"):
             # Clear current user data from URL
             del st.query_params.user
@@ -460,14 +886,15 @@ if user_setup():
                 submitted = st.form_submit_button("🔒 Lock It In!")
                 
                 if submitted and evidence:
-                    save_evidence(st.session_state.user_slug, date, category, evidence, impact)
-                    load_user_data(st.session_state.user_slug)  # Reload updated data
+                    evidence_id = save_evidence(st.session_state.user_slug, date, category, evidence, impact)
+                    add_session_evidence(evidence_id, date, category, evidence, impact)
                     st.success("🎉 Evidence stored in your permanent record!")
                     st.balloons()
 
         with col2:
-            if not st.session_state.evidence_df.empty:
-                st.subheader(f"Your Evidence Collection ({len(st.session_state.evidence_df)} entries)")
+            total_entries = count_evidence(st.session_state.user_slug)
+            if total_entries:
+                st.subheader(f"Your Evidence Collection ({total_entries} entries)")
                 
                 # Filter options
                 col_f1, col_f2 = st.columns(2)
@@ -478,16 +905,32 @@ if user_setup():
                 with col_f2:
                     min_impact = st.slider("Minimum impact:", 1, 5, 1)
                 
-                filtered_df = st.session_state.evidence_df[
-                    (st.session_state.evidence_df['Category'].isin(selected_categories)) &
-                    (st.session_state.evidence_df['Impact'] >= min_impact)
-                ]
+                # Filtering and paging happen in SQL. evidence_page_cursors holds the
+                # (date, id) cursor each visited page starts after; it is reset
+                # whenever the filters change.
+                page_filters = (tuple(selected_categories), min_impact)
+                if st.session_state.get('evidence_page_filters') != page_filters:
+                    st.session_state.evidence_page_filters = page_filters
+                    st.session_state.evidence_page_cursors = [None]
+                page_cursors = st.session_state.evidence_page_cursors
+                
+                if WRITE_BEHIND:
+                    # Show the entries just saved, if the queue gets to them in time
+                    get_write_queue().flush(timeout=WRITE_BEHIND_READ_WAIT)
+                matching_entries = count_evidence(st.session_state.user_slug, selected_categories, min_impact)
+                page_df, has_older = get_evidence_page(st.session_state.user_slug, selected_categories,
+                                                       min_impact, after=page_cursors[-1],
+                                                       selective=filter_is_selective(matching_entries, total_entries))
+                if page_df.empty and len(page_cursors) > 1:
+                    # The last entries of this page were deleted, go back one page
+                    page_cursors.pop()
+                    st.rerun()
                 
-                # Display entries with edit/delete buttons
-                for idx, row in filtered_df.sort_values('Date', ascending=False).iterrows():
+                # Display entries with edit/delete buttons (the index is the row id)
+                for idx, row in page_df.iterrows():
                     with st.container():
                         if st.session_state.editing_evidence == idx:
-                            edit_evidence_form(idx)
+                            edit_evidence_form(idx, row)
                         else:
                             col_d1, col_d2, col_d3 = st.columns([4, 1, 1])
                             with col_d1:
@@ -508,8 +951,25 @@ if user_setup():
                             with col_d3:
                                 if st.button("🗑️", key=f"delete_{idx}"):
                                     if delete_evidence(st.session_state.user_slug, idx):
-                                        load_user_data(st.session_state.user_slug)  # Reload data
-                                        st.rerun()
+                                        remove_session_evidence(idx)
+                                    else:
+                                        load_user_data(st.session_state.user_slug)  # Entry is gone, resync
+                                    st.rerun()
+                
+                # Page control
+                page_count = max(1, -(-matching_entries // EVIDENCE_PAGE_SIZE))
+                col_p1, col_p2, col_p3 = st.columns([1, 2, 1])
+                with col_p1:
+                    if st.button("⬅️ Newer", key="evidence_newer", disabled=len(page_cursors) == 1):
+                        page_cursors.pop()
+                        st.rerun()
+                with col_p2:
+                    st.caption(f"Page {len(page_cursors)} of {page_count} · {matching_entries} matching entries")
+                with col_p3:
+                    if st.button("Older ➡️", key="evidence_older", disabled=not has_older):
+                        last_date = page_df['Date'].iloc[-1]
+                        page_cursors.append((last_date.isoformat(), int(page_df.index[-1])))
+                        st.rerun()
             else:
                 st.info("✨ Your evidence locker is waiting for its first entry...")
 
@@ -565,8 +1025,8 @@ if user_setup():
                 with col_b1:
                     if st.button("💾 Save This Reframing"):
                         if reframed:
-                            save_reframing(st.session_state.user_slug, st.session_state.current_thought, reframed)
-                            load_user_data(st.session_state.user_slug)  # Reload updated data
+                            entry = save_reframing(st.session_state.user_slug, st.session_state.current_thought, reframed)
+                            add_session_reframing(entry)
                             st.success("Reframing saved to your growth history!")
                             del st.session_state.current_thought
                             st.rerun()
@@ -580,10 +1040,10 @@ if user_setup():
             if st.session_state.reframing_history:
                 st.subheader("📖 Your Reframing History")
                 for i, entry in enumerate(reversed(st.session_state.reframing_history)):
-                    idx = len(st.session_state.reframing_history) - 1 - i  # Get original index
+                    idx = entry['id']
                     
                     if st.session_state.editing_reframing == idx:
-                        edit_reframing_form(idx)
+                        edit_reframing_form(entry)
                     else:
                         with st.expander(f"Reframing from {entry['date']}", expanded=i < 3):  # First 3 expanded
                             st.write("**Original thought:**")
@@ -599,76 +1059,35 @@ if user_setup():
                             with col2:
                                 if st.button("🗑️ Delete", key=f"del_ref_{idx}"):
                                     if delete_reframing(st.session_state.user_slug, idx):
-                                        load_user_data(st.session_state.user_slug)  # Reload data
-                                        st.rerun()
+                                        remove_session_reframing(idx)
+                                    else:
+                                        load_user_data(st.session_state.user_slug)  # Entry is gone, resync
+                                    st.rerun()
 
     with tab3:
         st.header("📊 Your Growth Dashboard")
         
-        if not st.session_state.evidence_df.empty:
-            # Ensure Date is datetime for proper processing
-            evidence_df_copy = st.session_state.evidence_df.copy()
-            evidence_df_copy['Date'] = pd.to_datetime(evidence_df_copy['Date'])
-            
+        user_slug = st.session_state.user_slug
+        dashboard = get_dashboard_view(user_slug, get_data_version(user_slug))
+        
+        if dashboard is not None:
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("📈 Your Superpowers Distribution")
                 
-                # Simple bar chart with Altair
-                category_counts = evidence_df_copy['Category'].value_counts().reset_index()
-                category_counts.columns = ['Category', 'Count']
-                
-                chart = alt.Chart(category_counts).mark_bar().encode(
-                    x='Count:Q',
-                    y=alt.Y('Category:N', sort='-x'),
-                    color=alt.value('#ff6b6b')
-                ).properties(height=300)
-                
-                st.altair_chart(chart, use_container_width=True)
+                # Simple bar chart with Altair, serialized once per data version
+                st.vega_lite_chart(spec=dashboard['superpowers_spec'], use_container_width=True)
             
             with col2:
                 st.subheader("🚀 Impact Over Time")
                 
-                # FIXED: Proper monthly grouping and impact calculation
-                monthly_data = evidence_df_copy.copy()
-                
-                # Create month-year column for grouping
-                monthly_data['Month_Year'] = monthly_data['Date'].dt.to_period('M').astype(str)
-                
-                # Calculate monthly statistics
-                monthly_stats = monthly_data.groupby('Month_Year').agg({
-                    'Impact': 'mean',
-                    'Date': 'count'
-                }).reset_index()
-                monthly_stats.columns = ['Month', 'Average_Impact', 'Entry_Count']
+                # Monthly average impact and entry count
+                monthly_stats = dashboard['monthly_stats']
                 
                 # Only show chart if we have data across multiple time periods
-                if len(monthly_stats) > 1:
-                    # Create the line chart
-                    line_chart = alt.Chart(monthly_stats).mark_line(point=True).encode(
-                        x=alt.X('Month:N', title='Month', axis=alt.Axis(labelAngle=-45)),
-                        y=alt.Y('Average_Impact:Q', title='Average Impact', scale=alt.Scale(domain=[1, 5])),
-                        tooltip=['Month', 'Average_Impact', 'Entry_Count']
-                    ).properties(
-                        height=300,
-                        title='Your Emotional Growth Journey'
-                    )
-                    
-                    # Add points to the line
-                    points = alt.Chart(monthly_stats).mark_circle(
-                        size=100,
-                        opacity=0.7
-                    ).encode(
-                        x='Month:N',
-                        y='Average_Impact:Q',
-                        size=alt.Size('Entry_Count:Q', legend=None, scale=alt.Scale(range=[50, 300])),
-                        color=alt.value('#667eea'),
-                        tooltip=['Month', 'Average_Impact', 'Entry_Count']
-                    )
-                    
-                    combined_chart = line_chart + points
-                    st.altair_chart(combined_chart, use_container_width=True)
+                if dashboard['impact_spec'] is not None:
+                    st.vega_lite_chart(spec=dashboard['impact_spec'], use_container_width=True)
                     
                     # Show monthly breakdown
                     with st.expander("📅 Monthly Breakdown"):
@@ -683,20 +1102,17 @@ if user_setup():
             # Statistics
             col_s1, col_s2, col_s3, col_s4 = st.columns(4)
             with col_s1:
-                st.metric("Total Entries", len(evidence_df_copy))
+                st.metric("Total Entries", dashboard['total_entries'])
             with col_s2:
-                avg_impact = evidence_df_copy['Impact'].mean()
-                st.metric("Average Impact", f"{avg_impact:.1f} ⭐")
+                st.metric("Average Impact", f"{dashboard['average_impact']:.1f} ⭐")
             with col_s3:
-                top_category = evidence_df_copy['Category'].mode()[0] if not evidence_df_copy.empty else "N/A"
-                st.metric("Top Strength", top_category)
+                st.metric("Top Strength", dashboard['top_category'])
             with col_s4:
-                days_span = (evidence_df_copy['Date'].max() - evidence_df_copy['Date'].min()).days + 1 if len(evidence_df_copy) > 1 else 1
-                st.metric("Journey Length", f"{days_span} days")
+                st.metric("Journey Length", f"{dashboard['days_span']} days")
             
             # Recent milestones
             st.subheader("🎯 Recent Growth Milestones")
-            recent_high_impact = evidence_df_copy.nlargest(3, 'Impact')
+            recent_high_impact = dashboard['milestones']
             for _, milestone in recent_high_impact.iterrows():
                 with st.expander(f"{milestone['Category']} (Impact: {'⭐' * milestone['Impact']}) - {milestone['Date'].strftime('%Y-%m-%d')}"):
                     st.write(milestone['Evidence'])
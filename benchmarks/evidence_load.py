@@ -0,0 +1,176 @@
+"""Benchmark of loading a user's whole Evidence Locker into a DataFrame.
+
+Builds a throwaway toolkit database with one user of each size (10³, 10⁴
+and 10⁵ entries by default) and times the query plus DataFrame construction
+of the app's loaders against the previous row-by-row loop, which parsed
+every date with datetime.fromisoformat and built one dict per row.
+Also reports peak traced memory during the load and the size of the
+resulting DataFrame.
+
+    python benchmarks/evidence_load.py
+    python benchmarks/evidence_load.py --sizes 100000 --min-time 1
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotional_toolkit.db import PRAGMAS  # noqa: E402
+from emotional_toolkit.frames import evidence_frame, summary_frame  # noqa: E402
+from emotional_toolkit.migrations import migrate  # noqa: E402
+from emotional_toolkit.storage import lookup_user_id  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000)
+
+CATEGORIES = [
+    "Growth & Maturity", "Considerate Moment", "Loving Action", "Smart Insight",
+    "Emotional Strength", "Made Me Laugh", "Teamwork Win", "Personal Breakthrough",
+    "Sweet Gesture", "Problem-Solving", "Patience & Understanding",
+]
+
+QUERY = 'SELECT id, date, category, evidence, impact FROM evidence WHERE user_id = ? ORDER BY date DESC, id DESC'
+
+
+def create_database(path, sizes, seed=0):
+    """Toolkit database with a user "user_<size>" holding size random entries per size"""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    start = date(2020, 1, 1)
+    for size in sizes:
+        user_id = lookup_user_id(conn, f"user_{size}")
+        # Written roughly in date order, as a journal is
+        days = sorted(rng.randrange(2000) for _ in range(size))
+        conn.executemany(
+            'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+            (
+                (user_id, (start + timedelta(days=day)).isoformat(),
+                 rng.choice(CATEGORIES), f"Entry {i}: " + "you listened and helped me through it " * rng.randint(1, 4),
+                 rng.randint(1, 5))
+                for i, day in enumerate(days)
+            ),
+        )
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def row_loop_load(conn, user_id):
+    """The previous loader: sqlite3.Row per row, fromisoformat per date, a list of dicts"""
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(QUERY, (user_id,)).fetchall()
+    data = []
+    for row in rows:
+        data.append({
+            "id": row['id'],
+            "Date": datetime.fromisoformat(row['date']).date(),
+            "Category": row['category'],
+            "Evidence": row['evidence'],
+            "Impact": row['impact']
+        })
+    return pd.DataFrame(data).set_index("id")
+
+
+def columnar_load(conn, user_id):
+    """Plain tuples, bulk date parsing, categorical categories"""
+    conn.row_factory = None
+    return evidence_frame(conn.execute(QUERY, (user_id,)).fetchall(), CATEGORIES)
+
+
+def compact_load(conn, user_id):
+    """The app's loader: as columnar, without the evidence text, which loads on demand"""
+    conn.row_factory = None
+    rows = conn.execute(
+        'SELECT id, date, category, impact FROM evidence WHERE user_id = ? ORDER BY date DESC, id DESC',
+        (user_id,)
+    ).fetchall()
+    return summary_frame(rows, CATEGORIES)
+
+
+LOADERS = {
+    "row loop": row_loop_load,
+    "columnar": columnar_load,
+    "compact": compact_load,
+}
+
+
+def time_call(fn, args, min_time=0.5):
+    """Best seconds per call over repeated calls filling min_time"""
+    fn(*args)  # warm up, and the page cache
+    best = float("inf")
+    spent = 0.0
+    while spent < min_time:
+        start = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+    return best
+
+
+def peak_memory(fn, args):
+    """Peak memory traced while the call runs, in bytes"""
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - start
+
+
+def run(conn, sizes=SIZES, min_time=0.5):
+    results = []
+    for size in sizes:
+        baseline = None
+        for name, fn in LOADERS.items():
+            args = (conn, lookup_user_id(conn, f"user_{size}"))
+            seconds = time_call(fn, args, min_time)
+            frame_bytes = fn(*args).memory_usage(deep=True).sum()
+            result = {
+                "loader": name,
+                "size": size,
+                "seconds": seconds,
+                "peak_bytes": peak_memory(fn, args),
+                "frame_bytes": int(frame_bytes),
+            }
+            results.append(result)
+            baseline = baseline or seconds
+            print(f"{name:<10} {size:>10,} {seconds * 1e3:>12.2f} ms {baseline / seconds:>8.1f}x "
+                  f"{result['peak_bytes'] / 2**20:>10.1f} MiB {frame_bytes / 2**20:>10.1f} MiB", flush=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="entries per user to load")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent timing each entry")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "evidence.db")
+        create_database(path, args.sizes)
+        conn = sqlite3.connect(path)
+        # Same page cache and memory map as the app's pooled connections
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        try:
+            print(f"{'loader':<10} {'entries':>10} {'time/load':>15} {'speedup':>9} {'peak':>14} {'frame':>14}")
+            run(conn, args.sizes, args.min_time)
+        finally:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
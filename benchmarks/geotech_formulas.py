@@ -0,0 +1,171 @@
+"""Benchmarks for the geotech formula kernels.
+
+Times every calculation of the web calculator (Kp/Pp, Ka, FS, q_max/q_min,
+q_u with all of its factors, S_c and t) on a single case and on arrays of
+10³, 10⁶ and 10⁷ cases, and reports throughput and peak traced memory.
+Runs offline with NumPy only.
+
+    python benchmarks/geotech_formulas.py
+    python benchmarks/geotech_formulas.py --sizes 1 1000 --save baseline.json
+    python benchmarks/geotech_formulas.py --compare baseline.json --tolerance 0.25
+
+With --compare the exit status is 1 if any benchmark lost more than
+`tolerance` of its baseline throughput.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geotech import formulas  # noqa: E402
+
+SIZES = (1, 1_000, 1_000_000, 10_000_000)
+
+# Input name -> (low, high) of the uniform range cases are drawn from
+RANGES = {
+    "phi2": (20, 40), "gamma2": (16, 21), "D": (0.5, 3), "c2": (0, 30),
+    "alpha": (0, 15), "phi": (25, 40),
+    "sigma_v": (150, 600), "k1": (0.5, 1), "B": (2, 6), "k2": (0.5, 1),
+    "Pp": (0, 150), "Pa": (50, 250),
+    "e": (0, 0.3), "B_prime": (1.5, 5), "q": (0, 60), "psi": (0, 20),
+    "Cc": (0.1, 0.6), "Hc": (1, 8), "e0": (0.5, 1.5), "sigma0": (40, 200),
+    "dsigma_p": (10, 100), "dsigma_f": (0, 60),
+    "Tv": (0.05, 1), "H": (2, 10), "Cv": (0.5, 5),
+}
+
+
+def _kp_pp(phi2, gamma2, D, c2):
+    return formulas.rankine_pp(formulas.rankine_kp(phi2), gamma2, D, c2)
+
+
+BENCHMARKS = {
+    "Kp/Pp": (_kp_pp, ("phi2", "gamma2", "D", "c2")),
+    "Ka": (formulas.coulomb_ka, ("alpha", "phi")),
+    "FS": (formulas.sliding_fs, ("sigma_v", "k1", "phi2", "B", "k2", "c2", "Pp", "Pa", "alpha")),
+    "q_max/q_min": (formulas.bearing_pressure, ("sigma_v", "B", "e")),
+    "q_u": (formulas.bearing_capacity, ("phi2", "B_prime", "c2", "gamma2", "q", "D", "psi")),
+    "S_c": (formulas.consolidation_settlement, ("Cc", "Hc", "e0", "sigma0", "dsigma_p", "dsigma_f")),
+    "t": (formulas.consolidation_time, ("Tv", "H", "Cv")),
+}
+
+
+def make_inputs(names, size, seed=0):
+    """Random cases within RANGES; size 1 gives Python floats like the apps pass"""
+    rng = np.random.default_rng(seed)
+    if size == 1:
+        return [float(rng.uniform(*RANGES[name])) for name in names]
+    return [rng.uniform(*RANGES[name], size) for name in names]
+
+
+def time_call(fn, args, min_time=0.2, max_repeats=1_000_000):
+    """Best seconds per call, calling fn enough times to fill min_time"""
+    fn(*args)  # warm up
+    best = float("inf")
+    calls = 1
+    spent = 0.0
+    while spent < min_time and calls <= max_repeats:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn(*args)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed / calls)
+        spent += elapsed
+        if elapsed < min_time / 10:
+            calls *= 10
+    return best
+
+
+def peak_memory(fn, args):
+    """Peak memory traced while the call runs, in bytes (inputs excluded)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - start
+
+
+def run(sizes=SIZES, names=None, min_time=0.2):
+    results = []
+    for name in names or BENCHMARKS:
+        fn, inputs = BENCHMARKS[name]
+        for size in sizes:
+            args = make_inputs(inputs, size)
+            seconds = time_call(fn, args, min_time)
+            result = {
+                "benchmark": name,
+                "size": size,
+                "seconds": seconds,
+                "cases_per_s": size / seconds,
+                "peak_bytes": peak_memory(fn, args),
+            }
+            results.append(result)
+            print(f"{name:<12} {size:>10,} {seconds * 1e3:>12.4f} ms {result['cases_per_s']:>16,.0f} cases/s "
+                  f"{result['peak_bytes'] / 2**20:>10.1f} MiB", flush=True)
+            del args
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print throughput against the baseline; returns the regressed entries"""
+    previous = {(r["benchmark"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'benchmark':<12} {'size':>10} {'baseline':>16} {'now':>16} {'change':>8}")
+    for result in results:
+        old = previous.get((result["benchmark"], result["size"]))
+        if old is None:
+            continue
+        change = result["cases_per_s"] / old["cases_per_s"] - 1
+        flag = "  REGRESSION" if change < -tolerance else ""
+        print(f"{result['benchmark']:<12} {result['size']:>10,} {old['cases_per_s']:>16,.0f} "
+              f"{result['cases_per_s']:>16,.0f} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="case counts to run")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each entry")
+    parser.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed throughput loss against the baseline (default 0.2)")
+    args = parser.parse_args(argv)
+
+    print(f"{'benchmark':<12} {'size':>10} {'time/call':>15} {'throughput':>24} {'peak':>14}")
+    results = run(args.sizes, args.only, args.min_time)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
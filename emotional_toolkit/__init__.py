@@ -0,0 +1,5 @@
+"""Storage layer behind the Your Emotional Toolkit Streamlit app.
+
+Nothing in this package imports Streamlit, so it can be used from scripts
+and maintenance jobs as well as from the app.
+"""
@@ -0,0 +1,175 @@
+"""Pooled SQLite connections for the toolkit database.
+
+Streamlit runs every browser session's script in its own thread of one
+Python process. Opening a connection per query throws away SQLite's page
+cache and statement cache every time, so connections are instead kept open
+in a small per-process pool and handed to one thread at a time.
+
+Every connection is put in WAL mode, so readers never block the writer and
+concurrent sessions only serialize on the writes themselves. Writers still
+take turns: a busy timeout makes SQLite wait for the lock, and `retry`
+retries a whole operation with exponential backoff if it still comes back
+"database is locked".
+"""
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Applied to every new connection, in order
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),     # durable at WAL checkpoints, no fsync per commit
+    ("cache_size", -16_000),       # 16 MB page cache per connection
+    ("mmap_size", 256 * 2**20),    # read through a 256 MB memory map
+    ("temp_store", "MEMORY"),
+)
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free within the timeout"""
+
+
+class PoolClosed(RuntimeError):
+    """The pool was closed before a connection could be taken from it"""
+
+
+# Put in the idle queue by close, so threads waiting for a connection wake up
+_CLOSED = None
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections to one database file"""
+
+    def __init__(self, path, max_size=8, timeout=10.0, busy_timeout=5.0, cached_statements=256):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue()  # most recently used first, its cache is warmest
+        self._size = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self):
+        # Connections move between Streamlit's script threads, but the pool
+        # only ever lends each one to a single thread at a time
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if below max_size"""
+        if self._closed:
+            raise PoolClosed("Connection pool is closed")
+        try:
+            return self._checked(self._idle.get_nowait())
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._size < self.max_size:
+                self._size += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._size -= 1
+                    raise
+        try:
+            return self._checked(self._idle.get(timeout=self.timeout))
+        except queue.Empty:
+            raise PoolTimeout(f"No database connection free after {self.timeout} s") from None
+
+    def _checked(self, conn):
+        if conn is _CLOSED:
+            self._idle.put(_CLOSED)  # for the next waiter
+            raise PoolClosed("Connection pool is closed")
+        return conn
+
+    def release(self, conn):
+        """Return a connection; an uncommitted transaction is rolled back"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+        conn.close()
+
+    def discard(self, conn):
+        """Close a connection that is no longer usable instead of returning it"""
+        with self._lock:
+            self._size -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            try:
+                self.release(conn)
+            except sqlite3.Error:
+                # The connection is no longer usable (e.g. rollback failed)
+                self.discard(conn)
+
+    def close(self):
+        """Close every idle connection; borrowed ones close when returned.
+
+        Threads waiting for a connection get PoolClosed.
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is _CLOSED:
+                continue
+            conn.close()
+            with self._lock:
+                self._size -= 1
+        self._idle.put(_CLOSED)
+
+
+def is_locked(exc):
+    """True for the transient errors raised while another writer holds the lock"""
+    message = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def retry(attempts=5, backoff=0.05, max_backoff=1.0):
+    """Decorator retrying a whole database operation while the database is locked.
+
+    Waits backoff, 2 × backoff, 4 × backoff, ... (capped at max_backoff, with
+    jitter so competing sessions do not retry in lockstep) between attempts.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return fn(*args, **kwargs)
+                except sqlite3.OperationalError as exc:
+                    if not is_locked(exc) or attempt == attempts - 1:
+                        raise
+                    delay = min(backoff * 2**attempt, max_backoff)
+                    time.sleep(delay * random.uniform(0.5, 1.0))
+        return wrapper
+    return decorator
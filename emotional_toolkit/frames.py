@@ -0,0 +1,56 @@
+"""pandas DataFrames of evidence rows as the app keeps them in session state.
+
+Columns are compact: Date is an Arrow date32 (4 bytes), Category a
+categorical with int8 codes and Impact an int8. Frames are built a column
+at a time from the fetched tuples: NumPy parses the ISO dates in one call
+and category codes come from one dictionary lookup per row.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+def _levels(categories, row_categories):
+    """categories, then any other category found in the rows, sorted"""
+    levels = list(categories)
+    levels += sorted(set(row_categories).difference(levels))
+    return levels
+
+
+def _columns(ids, dates, row_categories, impacts, categories):
+    levels = _levels(categories, row_categories)
+    codes = {category: code for code, category in enumerate(levels)}
+    code_dtype = np.int8 if len(levels) <= 127 else np.int16
+    index = pd.Index(np.array(ids, dtype=np.int64), name="id")
+    columns = {
+        # Scalars come back as datetime.date, as the app expects
+        "Date": pd.arrays.ArrowExtensionArray(pa.array(np.array(dates, dtype="datetime64[D]"), type=pa.date32())),
+        "Category": pd.Categorical.from_codes(
+            np.fromiter(map(codes.__getitem__, row_categories), dtype=code_dtype, count=len(row_categories)),
+            categories=levels,
+        ),
+        "Impact": np.array(impacts, dtype=np.int8),
+    }
+    return index, columns
+
+
+def summary_frame(rows, categories=()):
+    """DataFrame of (id, date, category, impact) rows, indexed by row id, without evidence text"""
+    ids, dates, row_categories, impacts = list(zip(*rows)) or [()] * 4
+    index, columns = _columns(ids, dates, row_categories, impacts, categories)
+    return pd.DataFrame(columns, index=index)
+
+
+def evidence_frame(rows, categories=()):
+    """DataFrame of (id, date, category, evidence, impact) rows, indexed by row id"""
+    ids, dates, row_categories, evidence, impacts = list(zip(*rows)) or [()] * 5
+    index, columns = _columns(ids, dates, row_categories, impacts, categories)
+    return pd.DataFrame(
+        {
+            "Date": columns["Date"],
+            "Category": columns["Category"],
+            "Evidence": np.array(evidence, dtype=object),
+            "Impact": columns["Impact"],
+        },
+        index=index,
+    )
@@ -0,0 +1,96 @@
+"""Single-pass keyword matching of thoughts against categories.
+
+Keywords are compiled once into hash tables, single words and multi-word
+phrases separately. Matching splits the thought into words in one regex
+pass and looks up each word, plus a handful of candidate base forms for
+inflected words ("fixing" -> "fix", "cared" -> "care", "worries" ->
+"worry"). The cost per word is a few dictionary lookups, however many
+keywords are registered, and only whole words match: "fix" no longer
+matches inside "prefix".
+"""
+import re
+
+_WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+
+# Suffix -> replacements tried on the remaining stem ("" keeps it as is)
+_SUFFIXES = (
+    ("ies", ("y",)),
+    ("ied", ("y",)),
+    ("ness", ("",)),
+    ("ment", ("", "e")),
+    ("fully", ("",)),
+    ("ful", ("",)),
+    ("ing", ("", "e")),
+    ("ers", ("", "e")),
+    ("er", ("", "e")),
+    ("ed", ("", "e")),
+    ("es", ("", "e")),
+    ("ly", ("",)),
+    ("s", ("",)),
+)
+
+
+def words(text):
+    """Lower-cased words of text, in order"""
+    return _WORD.findall(text.lower())
+
+
+def base_forms(word):
+    """word followed by the base forms it may be an inflection of"""
+    forms = [word]
+    for suffix, replacements in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            stem = word[:-len(suffix)]
+            forms.extend(stem + replacement for replacement in replacements)
+            # planned -> plan, stopping -> stop
+            if len(stem) >= 3 and stem[-1] == stem[-2] and stem[-1] not in "aeiouls":
+                forms.append(stem[:-1])
+    return list(dict.fromkeys(forms))
+
+
+class KeywordMatcher:
+    """Categories whose keywords occur in a text, found in one pass over its words"""
+
+    def __init__(self, keywords=None):
+        self._words = {}
+        self._phrases = {}
+        self._phrase_lengths = set()
+        for category, category_keywords in (keywords or {}).items():
+            self.add(category, category_keywords)
+
+    def add(self, category, keywords):
+        """Register more keywords (single words or phrases) for a category"""
+        for keyword in keywords:
+            parts = tuple(words(keyword))
+            if len(parts) == 1:
+                self._words.setdefault(parts[0], set()).add(category)
+            elif parts:
+                self._phrases.setdefault(parts, set()).add(category)
+                self._phrase_lengths.add(len(parts))
+        return self
+
+    def extended(self, keywords):
+        """Copy of this matcher with extra {category: keywords}, e.g. a user's own"""
+        matcher = KeywordMatcher()
+        matcher._words = {word: set(categories) for word, categories in self._words.items()}
+        matcher._phrases = {phrase: set(categories) for phrase, categories in self._phrases.items()}
+        matcher._phrase_lengths = set(self._phrase_lengths)
+        for category, category_keywords in keywords.items():
+            matcher.add(category, category_keywords)
+        return matcher
+
+    def categories(self, text):
+        """Set of categories with at least one keyword in text"""
+        found = set()
+        tokens = words(text)
+        for i, word in enumerate(tokens):
+            for form in base_forms(word):
+                categories = self._words.get(form)
+                if categories:
+                    found |= categories
+                    break
+            for length in self._phrase_lengths:
+                categories = self._phrases.get(tuple(tokens[i:i + length]))
+                if categories:
+                    found |= categories
+        return found
@@ -0,0 +1,513 @@
+"""Versioned schema migrations for the toolkit database.
+
+The schema version lives in SQLite's `PRAGMA user_version`. `migrate`
+applies every migration above the stored version, each in its own
+IMMEDIATE transaction, so concurrent app processes starting up at the same
+time apply each migration exactly once. Databases created before
+migrations existed report version 0 and go through the same steps; the
+first migration only creates what is missing.
+
+    python -m emotional_toolkit.migrations emotional_toolkit.db
+
+migrates a database file and prints the query plan of each of the app's
+reads, flagging any that still sort through a temporary B-tree.
+"""
+import sqlite3
+import sys
+
+from emotional_toolkit.search import fts5_available, has_fts
+
+
+# Keep evidence_fts in step with evidence
+_EVIDENCE_FTS_TRIGGERS = (
+        '''
+        CREATE TRIGGER IF NOT EXISTS evidence_fts_insert AFTER INSERT ON evidence BEGIN
+            INSERT INTO evidence_fts(rowid, evidence) VALUES (new.id, new.evidence);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS evidence_fts_delete AFTER DELETE ON evidence BEGIN
+            INSERT INTO evidence_fts(evidence_fts, rowid, evidence) VALUES ('delete', old.id, old.evidence);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS evidence_fts_update AFTER UPDATE OF evidence ON evidence BEGIN
+            INSERT INTO evidence_fts(evidence_fts, rowid, evidence) VALUES ('delete', old.id, old.evidence);
+            INSERT INTO evidence_fts(rowid, evidence) VALUES (new.id, new.evidence);
+        END
+        ''',
+)
+
+
+def _add_evidence_fts(conn):
+    """Full-text index over evidence.evidence, if this SQLite has FTS5"""
+    if not fts5_available(conn):
+        # Relevant evidence falls back to category keywords
+        return
+    # External content: the text is stored once, in evidence
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS evidence_fts USING fts5(
+            evidence, content='evidence', content_rowid='id', tokenize='porter unicode61'
+        )
+    ''')
+    for statement in _EVIDENCE_FTS_TRIGGERS:
+        conn.execute(statement)
+    conn.execute("INSERT INTO evidence_fts(evidence_fts) VALUES ('rebuild')")
+
+
+# Tables were keyed on user_slug up to migration 7 and on user_id after it,
+# so the trigger bodies below take the user column's name
+
+def _stats_delta(row, sign, user='user_slug'):
+    """Statements adding (sign '+') or removing (sign '-') one evidence row in the summary tables"""
+    return f'''
+            INSERT INTO evidence_user_stats ({user}, entries, impact_sum, first_date, last_date)
+            VALUES ({row}.{user}, {sign}1, {sign}{row}.impact, {row}.date, {row}.date)
+            ON CONFLICT ({user}) DO UPDATE SET
+                entries = entries {sign} 1,
+                impact_sum = impact_sum {sign} {row}.impact;
+            INSERT INTO evidence_category_stats ({user}, category, entries, impact_sum)
+            VALUES ({row}.{user}, {row}.category, {sign}1, {sign}{row}.impact)
+            ON CONFLICT ({user}, category) DO UPDATE SET
+                entries = entries {sign} 1,
+                impact_sum = impact_sum {sign} {row}.impact;
+            INSERT INTO evidence_monthly_stats ({user}, month, entries, impact_sum)
+            VALUES ({row}.{user}, substr({row}.date, 1, 7), {sign}1, {sign}{row}.impact)
+            ON CONFLICT ({user}, month) DO UPDATE SET
+                entries = entries {sign} 1,
+                impact_sum = impact_sum {sign} {row}.impact;
+    '''
+
+
+# First and last dates come from two seeks on idx_evidence_user_date_id,
+# so a delete or an edit of the earliest or latest entry stays cheap
+_REFRESH_DATES = '''
+            UPDATE evidence_user_stats SET
+                first_date = (SELECT MIN(date) FROM evidence WHERE {user} = {row}.{user}),
+                last_date = (SELECT MAX(date) FROM evidence WHERE {user} = {row}.{user})
+            WHERE {user} = {row}.{user};
+'''
+
+
+def _stats_triggers(user):
+    """Triggers keeping the summary tables up to date"""
+    return (
+        f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_stats_insert AFTER INSERT ON evidence BEGIN
+            {_stats_delta('new', '+', user)}
+            UPDATE evidence_user_stats SET
+                first_date = min(first_date, new.date),
+                last_date = max(last_date, new.date)
+            WHERE {user} = new.{user};
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_stats_delete AFTER DELETE ON evidence BEGIN
+            {_stats_delta('old', '-', user)}
+            {_DROP_EMPTY_STATS}
+            {_REFRESH_DATES.format(row='old', user=user)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS evidence_stats_update
+        AFTER UPDATE OF {user}, date, category, impact ON evidence BEGIN
+            {_stats_delta('old', '-', user)}
+            {_stats_delta('new', '+', user)}
+            {_DROP_EMPTY_STATS}
+            {_REFRESH_DATES.format(row='old', user=user)}
+            {_REFRESH_DATES.format(row='new', user=user)}
+        END
+        ''',
+    )
+
+_DROP_EMPTY_STATS = '''
+            DELETE FROM evidence_user_stats WHERE entries = 0;
+            DELETE FROM evidence_category_stats WHERE entries = 0;
+            DELETE FROM evidence_monthly_stats WHERE entries = 0;
+'''
+
+def _bump_version(row, user='user_slug'):
+    return f'''
+            INSERT INTO user_data_versions ({user}, version) VALUES ({row}.{user}, 1)
+            ON CONFLICT ({user}) DO UPDATE SET version = version + 1;
+    '''
+
+
+def _add_version_triggers(conn, user='user_slug'):
+    """Bump the owner's data version on every write to evidence or reframing_history"""
+    for table in ('evidence', 'reframing_history'):
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_insert AFTER INSERT ON {table} BEGIN
+            {_bump_version('new', user)}
+        END
+        ''')
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_delete AFTER DELETE ON {table} BEGIN
+            {_bump_version('old', user)}
+        END
+        ''')
+        # Both owners when an entry moves between users
+        conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_update AFTER UPDATE ON {table} BEGIN
+            {_bump_version('old', user)}
+            INSERT INTO user_data_versions ({user}, version)
+            SELECT new.{user}, 1 WHERE new.{user} != old.{user}
+            ON CONFLICT ({user}) DO UPDATE SET version = version + 1;
+        END
+        ''')
+
+
+def _add_user_version_triggers(conn):
+    _add_version_triggers(conn, 'user_id')
+
+
+def _with_user_ids(table, columns, definition):
+    """Step rebuilding a table with user_id in place of user_slug, keeping ids and the id sequence"""
+    def step(conn):
+        row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+        conn.execute(f'CREATE TABLE {table}_new ({definition})')
+        conn.execute(
+            f'INSERT INTO {table}_new (id, user_id, {", ".join(columns)}) '
+            f'SELECT t.id, users.id, {", ".join("t." + column for column in columns)} '
+            f'FROM {table} t JOIN users ON users.slug = t.user_slug ORDER BY t.id'
+        )
+        # Drops the old table's indexes and triggers with it
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+        if row:
+            # Ids of deleted rows are still never reused
+            conn.execute('UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = ?', (row[0], table))
+    return step
+
+
+def _add_evidence_fts_triggers(conn):
+    """The full-text index triggers, dropped with the old evidence table; the index itself is unchanged"""
+    if has_fts(conn):
+        for statement in _EVIDENCE_FTS_TRIGGERS:
+            conn.execute(statement)
+
+# (version, description, steps), in order. A step is an SQL statement or a
+# function called with the connection.
+MIGRATIONS = [
+    (1, "initial schema", [
+        '''
+        CREATE TABLE IF NOT EXISTS evidence (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_slug TEXT NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            evidence TEXT NOT NULL,
+            impact INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS reframing_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_slug TEXT NOT NULL,
+            original_thought TEXT NOT NULL,
+            reframed_thought TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_evidence_user ON evidence(user_slug)',
+        'CREATE INDEX IF NOT EXISTS idx_reframing_user ON reframing_history(user_slug)',
+    ]),
+    (2, "composite indexes for the app's sorts and filters", [
+        'CREATE INDEX IF NOT EXISTS idx_evidence_user_date ON evidence(user_slug, date DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_evidence_user_category_impact ON evidence(user_slug, category, impact)',
+        'CREATE INDEX IF NOT EXISTS idx_reframing_user_created ON reframing_history(user_slug, created_at DESC)',
+        # Both are prefixes of the composite indexes above
+        'DROP INDEX IF EXISTS idx_evidence_user',
+        'DROP INDEX IF EXISTS idx_reframing_user',
+        'ANALYZE',
+    ]),
+    (3, "keyset pagination of evidence", [
+        # id breaks ties between entries of the same date, so (date, id) is a
+        # unique cursor and a page is one index range scan
+        'CREATE INDEX IF NOT EXISTS idx_evidence_user_date_id ON evidence(user_slug, date DESC, id DESC)',
+        'DROP INDEX IF EXISTS idx_evidence_user_date',
+        'ANALYZE',
+    ]),
+    (4, "full-text index of evidence", [
+        _add_evidence_fts,
+    ]),
+    (5, "per-user evidence summaries for the Growth Dashboard", [
+        '''
+        CREATE TABLE IF NOT EXISTS evidence_user_stats (
+            user_slug TEXT PRIMARY KEY,
+            entries INTEGER NOT NULL,
+            impact_sum INTEGER NOT NULL,
+            first_date TEXT,
+            last_date TEXT
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS evidence_category_stats (
+            user_slug TEXT NOT NULL,
+            category TEXT NOT NULL,
+            entries INTEGER NOT NULL,
+            impact_sum INTEGER NOT NULL,
+            PRIMARY KEY (user_slug, category)
+        ) WITHOUT ROWID
+        ''',
+        # month is the YYYY-MM prefix of evidence.date
+        '''
+        CREATE TABLE IF NOT EXISTS evidence_monthly_stats (
+            user_slug TEXT NOT NULL,
+            month TEXT NOT NULL,
+            entries INTEGER NOT NULL,
+            impact_sum INTEGER NOT NULL,
+            PRIMARY KEY (user_slug, month)
+        ) WITHOUT ROWID
+        ''',
+        # Existing evidence
+        'DELETE FROM evidence_user_stats',
+        'DELETE FROM evidence_category_stats',
+        'DELETE FROM evidence_monthly_stats',
+        '''
+        INSERT INTO evidence_user_stats (user_slug, entries, impact_sum, first_date, last_date)
+        SELECT user_slug, COUNT(*), SUM(impact), MIN(date), MAX(date) FROM evidence GROUP BY user_slug
+        ''',
+        '''
+        INSERT INTO evidence_category_stats (user_slug, category, entries, impact_sum)
+        SELECT user_slug, category, COUNT(*), SUM(impact) FROM evidence GROUP BY user_slug, category
+        ''',
+        '''
+        INSERT INTO evidence_monthly_stats (user_slug, month, entries, impact_sum)
+        SELECT user_slug, substr(date, 1, 7), COUNT(*), SUM(impact) FROM evidence GROUP BY user_slug, substr(date, 1, 7)
+        ''',
+        # Kept up to date from here on by the triggers
+        *_stats_triggers('user_slug'),
+        # Recent Growth Milestones: a user's highest impact entries, newest first
+        'CREATE INDEX IF NOT EXISTS idx_evidence_user_impact_date_id ON evidence(user_slug, impact DESC, date DESC, id DESC)',
+        'ANALYZE',
+    ]),
+    (6, "per-user data version for cache invalidation", [
+        # A user without a row is at version 0. Rows are never deleted, so a
+        # version number is never reused for different data.
+        '''
+        CREATE TABLE IF NOT EXISTS user_data_versions (
+            user_slug TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        _add_version_triggers,
+    ]),
+    (7, "bookkeeping for the write-behind queue", [
+        # Last journal entry applied, written in the same transaction as the writes
+        '''
+        CREATE TABLE IF NOT EXISTS write_behind_state (
+            journal TEXT PRIMARY KEY,
+            applied_seq INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        # Row ids given to queued inserts, for journal entries that refer to them
+        '''
+        CREATE TABLE IF NOT EXISTS write_behind_ids (
+            journal TEXT NOT NULL,
+            temp_id INTEGER NOT NULL,
+            row_id INTEGER NOT NULL,
+            PRIMARY KEY (journal, temp_id)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    (8, "integer user ids in place of user_slug", [
+        # Rows are never deleted, so an id always means the same user
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            slug TEXT NOT NULL UNIQUE
+        )
+        ''',
+        '''
+        INSERT OR IGNORE INTO users (slug)
+        SELECT user_slug FROM evidence
+        UNION SELECT user_slug FROM reframing_history
+        UNION SELECT user_slug FROM user_data_versions
+        ''',
+        _with_user_ids('evidence', ('date', 'category', 'evidence', 'impact', 'created_at'), '''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            evidence TEXT NOT NULL,
+            impact INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        '''),
+        _with_user_ids('reframing_history', ('original_thought', 'reframed_thought', 'created_at'), '''
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            original_thought TEXT NOT NULL,
+            reframed_thought TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        '''),
+        'CREATE INDEX idx_evidence_user_date_id ON evidence(user_id, date DESC, id DESC)',
+        'CREATE INDEX idx_evidence_user_category_impact ON evidence(user_id, category, impact)',
+        'CREATE INDEX idx_evidence_user_impact_date_id ON evidence(user_id, impact DESC, date DESC, id DESC)',
+        'CREATE INDEX idx_reframing_user_created ON reframing_history(user_id, created_at DESC)',
+        _add_evidence_fts_triggers,
+        # Summaries and versions, rekeyed; rowid tables, as user_id is the rowid
+        'ALTER TABLE evidence_user_stats RENAME TO evidence_user_stats_old',
+        '''
+        CREATE TABLE evidence_user_stats (
+            user_id INTEGER PRIMARY KEY,
+            entries INTEGER NOT NULL,
+            impact_sum INTEGER NOT NULL,
+            first_date TEXT,
+            last_date TEXT
+        )
+        ''',
+        '''
+        INSERT INTO evidence_user_stats (user_id, entries, impact_sum, first_date, last_date)
+        SELECT users.id, entries, impact_sum, first_date, last_date
+        FROM evidence_user_stats_old JOIN users ON users.slug = user_slug
+        ''',
+        'DROP TABLE evidence_user_stats_old',
+        'ALTER TABLE evidence_category_stats RENAME TO evidence_category_stats_old',
+        '''
+        CREATE TABLE evidence_category_stats (
+            user_id INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            entries INTEGER NOT NULL,
+            impact_sum INTEGER NOT NULL,
+            PRIMARY KEY (user_id, category)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO evidence_category_stats (user_id, category, entries, impact_sum)
+        SELECT users.id, category, entries, impact_sum
+        FROM evidence_category_stats_old JOIN users ON users.slug = user_slug
+        ''',
+        'DROP TABLE evidence_category_stats_old',
+        'ALTER TABLE evidence_monthly_stats RENAME TO evidence_monthly_stats_old',
+        '''
+        CREATE TABLE evidence_monthly_stats (
+            user_id INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            entries INTEGER NOT NULL,
+            impact_sum INTEGER NOT NULL,
+            PRIMARY KEY (user_id, month)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT INTO evidence_monthly_stats (user_id, month, entries, impact_sum)
+        SELECT users.id, month, entries, impact_sum
+        FROM evidence_monthly_stats_old JOIN users ON users.slug = user_slug
+        ''',
+        'DROP TABLE evidence_monthly_stats_old',
+        *_stats_triggers('user_id'),
+        'ALTER TABLE user_data_versions RENAME TO user_data_versions_old',
+        '''
+        CREATE TABLE user_data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        ''',
+        '''
+        INSERT INTO user_data_versions (user_id, version)
+        SELECT users.id, version FROM user_data_versions_old JOIN users ON users.slug = user_slug
+        ''',
+        'DROP TABLE user_data_versions_old',
+        _add_user_version_triggers,
+        'ANALYZE',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Reads the app issues, with sample parameters, for plan checks
+QUERY_PLAN_CHECKS = {
+    "evidence by date": (
+        'SELECT id, date, category, evidence, impact FROM evidence WHERE user_id = ? ORDER BY date DESC, id DESC',
+        (1,),
+    ),
+    "evidence page": (
+        'SELECT id, date, category, evidence, impact FROM evidence '
+        'WHERE user_id = ? AND +category IN (?, ?) AND +impact >= ? AND (date < ? OR (date = ? AND id < ?)) '
+        'ORDER BY date DESC, id DESC LIMIT ?',
+        (1, "Loving Action", "Smart Insight", 3, "2024-06-01", "2024-06-01", 100, 21),
+    ),
+    "evidence by category and impact": (
+        'SELECT COUNT(*) FROM evidence WHERE user_id = ? AND category = ? AND impact >= ?',
+        (1, "Loving Action", 3),
+    ),
+    "top evidence by impact": (
+        'SELECT id, date, category, evidence, impact FROM evidence '
+        'WHERE user_id = ? ORDER BY impact DESC, date DESC, id DESC LIMIT ?',
+        (1, 3),
+    ),
+    "reframing history": (
+        'SELECT id, original_thought, reframed_thought, created_at FROM reframing_history '
+        'WHERE user_id = ? ORDER BY created_at DESC',
+        (1,),
+    ),
+}
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the database up to SCHEMA_VERSION; returns the versions applied"""
+    applied = []
+    for version, _, steps in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def explain(conn, sql, params=()):
+    """Detail lines of EXPLAIN QUERY PLAN for one query"""
+    return [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def temp_btree_queries(conn, checks=QUERY_PLAN_CHECKS):
+    """Names of checked queries whose plan still uses a temporary B-tree"""
+    return [name for name, (sql, params) in checks.items()
+            if any('TEMP B-TREE' in line for line in explain(conn, sql, params))]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print("usage: python -m emotional_toolkit.migrations DB_PATH", file=sys.stderr)
+        return 2
+    conn = sqlite3.connect(argv[0])
+    try:
+        applied = migrate(conn)
+        print(f"Schema version {schema_version(conn)}"
+              + (f" (applied {', '.join(map(str, applied))})" if applied else " (up to date)"))
+        for name, (sql, params) in QUERY_PLAN_CHECKS.items():
+            print(f"\n{name}:")
+            for line in explain(conn, sql, params):
+                print(f"  {line}")
+        slow = temp_btree_queries(conn)
+        if slow:
+            print(f"\nQueries sorting through a temporary B-tree: {', '.join(slow)}")
+            return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Full-text search of evidence against a negative thought.
+
+Evidence text is indexed in an FTS5 table (see migration 4) that triggers
+keep in sync with the evidence table. A thought is turned into an OR query
+of its meaningful words; the porter tokenizer matches "loving" with "love"
+and "listened" with "listen". Matches are ranked by BM25 relevance scaled
+up by the entry's impact, so a strong text match with impact 5 beats an
+equally strong one with impact 1.
+"""
+import re
+
+# Words too common in thoughts to say anything about which evidence fits
+STOPWORDS = frozenset("""
+a about after again all am an and any are as at be because been but by can could did do does
+doing don't for from had has have he her him his how i i'm if in into is it it's its just
+me more most my myself no not now of on once only or other our out over own really same she
+should so some such than that the their them then there these they this those through to too
+under until up very was we were what when where which while who why will with would you your
+feel feels feeling like always never ever enough much
+""".split())
+
+# Extra weight per impact level above 1: impact 5 doubles the score
+IMPACT_WEIGHT = 0.25
+
+_WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+
+
+def fts_query(text, max_terms=32):
+    """FTS5 MATCH expression OR-ing the meaningful words of text, or None"""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if word not in STOPWORDS and len(word) > 1 and word not in terms:
+            terms.append(word)
+    if not terms:
+        return None
+    # Quoted, so words like AND/NOT/NEAR are never read as operators
+    return " OR ".join('"' + term.replace("'", " ") + '"' for term in terms[:max_terms])
+
+
+SEARCH_SQL = f'''
+    SELECT e.id, e.date, e.category, e.evidence, e.impact
+    FROM evidence_fts
+    JOIN evidence e ON e.id = evidence_fts.rowid
+    WHERE evidence_fts MATCH ? AND e.user_id = ?
+    ORDER BY bm25(evidence_fts) * (1 + {IMPACT_WEIGHT} * (e.impact - 1))
+    LIMIT ?
+'''
+
+
+def search_evidence(conn, user_id, text, limit=3):
+    """Best matching evidence rows for text, or None when there is nothing to search with.
+
+    None (rather than an empty list) means the thought has no searchable
+    words or the database has no full-text index, so callers can fall back
+    to category keywords.
+    """
+    query = fts_query(text)
+    if query is None or not has_fts(conn):
+        return None
+    return conn.execute(SEARCH_SQL, (query, user_id, limit)).fetchall()
+
+
+def has_fts(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'evidence_fts'"
+    ).fetchone() is not None
+
+
+def fts5_available(conn):
+    """Whether this SQLite build includes the FTS5 extension"""
+    return any(row[0] == "ENABLE_FTS5" for row in conn.execute("PRAGMA compile_options"))
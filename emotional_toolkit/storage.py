@@ -0,0 +1,184 @@
+"""Which SQLite file holds each user's data.
+
+By default every user lives in one database file. With more shards, users
+are spread over that many files by a hash of their slug, and with
+"user" every user gets a file of their own. Each file has its own write
+lock, WAL and VACUUM, so sessions of users on different shards never wait
+on each other's writes, and removing a per-user file removes the user.
+
+Shard files are opened lazily, on a user's first query, and brought up to
+date with the migrations then. Each open shard keeps its own connection
+pool; at most max_open of them stay open, the least recently used being
+closed first.
+
+Rows refer to their user by an integer id from the shard's users table
+(see migration 8). A slug's id is looked up once per process and cached:
+a user's row is added on first use and never deleted, so an id never
+changes.
+
+Changing the number of shards does not move existing data: the files are
+named after the shard count ("emotional_toolkit.3-of-8.db"), so a changed
+setting opens new, empty shards instead of looking for users in the
+wrong file.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from emotional_toolkit.cache import LRUCache
+from emotional_toolkit.db import ConnectionPool, PoolClosed, retry
+from emotional_toolkit.migrations import migrate
+
+PER_USER = "user"
+
+
+def parse_shards(value):
+    """Shard setting from text (TOOLKIT_SHARDS): a number of files, or "user" for a file per user"""
+    value = (value or "1").strip().lower()
+    if value == PER_USER:
+        return PER_USER
+    try:
+        shards = int(value)
+    except ValueError:
+        shards = 0
+    if shards < 1:
+        raise ValueError(f"Invalid shard setting {value!r}, expected a positive number or {PER_USER!r}")
+    return shards
+
+
+def lookup_user_id(conn, user_slug):
+    """users.id of a slug in the connection's database, adding the user if new"""
+    row = conn.execute('SELECT id FROM users WHERE slug = ?', (user_slug,)).fetchone()
+    if row is None:
+        conn.execute('INSERT OR IGNORE INTO users (slug) VALUES (?)', (user_slug,))
+        conn.commit()
+        row = conn.execute('SELECT id FROM users WHERE slug = ?', (user_slug,)).fetchone()
+    return row[0]
+
+
+def _digest(user_slug):
+    # Stable across processes and Python versions, unlike hash()
+    return hashlib.sha256(user_slug.encode("utf-8")).digest()
+
+
+class ShardedStorage:
+    """Connection pools of the database files users are sharded over"""
+
+    def __init__(self, path, shards=1, max_open=32, max_user_ids=100_000, **pool_options):
+        self.path = path
+        self.shards = shards
+        self.max_open = max_open
+        self.pool_options = pool_options
+        self._user_ids = LRUCache(max_user_ids)
+        self._pools = OrderedDict()  # shard path -> ConnectionPool, least recently used first
+        self._opening = {}           # shard path -> lock held while the shard is opened
+        self._lock = threading.Lock()
+
+    def shard_path(self, user_slug):
+        """Path of the database file holding a user's data"""
+        if self.shards == 1:
+            return self.path
+        base, ext = os.path.splitext(self.path)
+        if self.shards == PER_USER:
+            return os.path.join(f"{base}.users", f"{_digest(user_slug).hex()[:32]}{ext}")
+        index = int.from_bytes(_digest(user_slug)[:8], "big") % self.shards
+        return f"{base}.{index}-of-{self.shards}{ext}"
+
+    def pool(self, user_slug):
+        """Connection pool of a user's shard, opening the shard if needed"""
+        path = self.shard_path(user_slug)
+        with self._lock:
+            pool = self._cached(path)
+            if pool is not None:
+                return pool
+            opening = self._opening.setdefault(path, threading.Lock())
+        # Opening migrates the shard, which may take a while: only sessions
+        # of this shard wait for it, not every lookup
+        with opening:
+            with self._lock:
+                pool = self._cached(path)
+                if pool is not None:
+                    return pool
+            try:
+                pool = self._open(path)
+            finally:
+                with self._lock:
+                    if self._opening.get(path) is opening:
+                        del self._opening[path]
+            with self._lock:
+                existing = self._cached(path)
+                if existing is not None:
+                    # Opened meanwhile by a caller that missed our lock
+                    pool.close()
+                    return existing
+                self._pools[path] = pool
+                while len(self._pools) > self.max_open:
+                    # Connections still borrowed from it close when returned
+                    self._pools.popitem(last=False)[1].close()
+                return pool
+
+    def _cached(self, path):
+        """The open pool of a shard, marked most recently used (called with the lock held)"""
+        pool = self._pools.get(path)
+        if pool is not None:
+            self._pools.move_to_end(path)
+        return pool
+
+    def user_id(self, user_slug):
+        """users.id of a user in their shard, added on first use"""
+        user_id = self._user_ids.get(user_slug)
+        if user_id is None:
+            with self.connection(user_slug) as conn:
+                user_id = lookup_user_id(conn, user_slug)
+            self._user_ids.put(user_slug, user_id)
+        return user_id
+
+    @contextmanager
+    def connection(self, user_slug):
+        """Borrow a connection to a user's shard for the duration of a with block"""
+        while True:
+            pool = self.pool(user_slug)
+            try:
+                conn = pool.acquire()
+            except PoolClosed:
+                continue  # closed between lookup and acquire, open it again
+            break
+        try:
+            yield conn
+        finally:
+            try:
+                pool.release(conn)
+            except sqlite3.Error:
+                # The connection is no longer usable (e.g. rollback failed)
+                pool.discard(conn)
+
+    def open_shards(self):
+        """Paths of the shards currently open"""
+        with self._lock:
+            return list(self._pools)
+
+    def close(self):
+        """Close every open shard"""
+        with self._lock:
+            while self._pools:
+                self._pools.popitem()[1].close()
+
+    def _open(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pool = ConnectionPool(path, **self.pool_options)
+        try:
+            retry()(self._migrate)(pool)
+        except BaseException:
+            pool.close()
+            raise
+        return pool
+
+    @staticmethod
+    def _migrate(pool):
+        with pool.connection() as conn:
+            migrate(conn)
@@ -0,0 +1,253 @@
+"""Bulk import and export of a user's evidence and reframing history.
+
+Imports read records one at a time from a text stream, CSV with a header
+row or JSON (an array of objects, or one object per line), so a file is
+never parsed into memory as a whole. Valid rows are inserted with
+`executemany` in batches of `batch_size`, one transaction per batch;
+invalid rows are skipped and reported with their record number. Each
+batch is staged in a temporary table and moved over with a single
+INSERT ... SELECT: the full-text index flushes once per statement when
+written from a trigger, which makes row-by-row inserts slow down as the
+index grows.
+
+Exports write rows to a text stream straight off the database cursor,
+in the same formats the importer reads.
+"""
+import csv
+import json
+from datetime import date, datetime
+
+EVIDENCE_FIELDS = ("date", "category", "evidence", "impact")
+REFRAMING_FIELDS = ("original", "reframed", "date")
+
+# Other spellings accepted on import, e.g. the app's own column names
+_ALIASES = {
+    "original_thought": "original",
+    "reframed_thought": "reframed",
+    "created_at": "date",
+}
+
+# Skipped rows reported individually; the rest are only counted
+MAX_ERRORS = 20
+
+
+def iter_json_records(stream, chunk_size=1 << 16):
+    """Yield the values of a JSON array, or of whitespace-separated JSON values (NDJSON)"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    in_array = None
+    while True:
+        # Skip whitespace, and commas between array elements
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ",")):
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = stream.read(chunk_size), 0
+            eof = not buffer
+        if pos == len(buffer):
+            if in_array:
+                raise ValueError("Unterminated JSON array")
+            return
+
+        if in_array is None:
+            in_array = buffer[pos] == "["
+            if in_array:
+                pos += 1
+                continue
+        elif in_array and buffer[pos] == "]":
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as exc:
+            more = "" if eof else stream.read(chunk_size)
+            if not more:
+                raise ValueError(f"Invalid JSON: {exc}") from None
+            # The value continues in the next chunk
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield value
+        pos = end
+
+
+def read_records(stream, fmt):
+    """Records (dicts) from a text stream in "csv" or "json" format"""
+    if fmt == "csv":
+        return csv.DictReader(stream)
+    if fmt == "json":
+        return iter_json_records(stream)
+    raise ValueError(f"Unknown format {fmt!r}, expected 'csv' or 'json'")
+
+
+def _normalized(record):
+    if not isinstance(record, dict):
+        raise ValueError(f"expected an object, got {type(record).__name__}")
+    fields = {}
+    for key, value in record.items():
+        key = str(key).strip().lower()
+        fields[_ALIASES.get(key, key)] = value.strip() if isinstance(value, str) else value
+    return fields
+
+
+def evidence_row(record, categories):
+    """(date, category, evidence, impact) from an import record, or ValueError"""
+    fields = _normalized(record)
+    missing = [name for name in EVIDENCE_FIELDS if fields.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    try:
+        entry_date = date.fromisoformat(str(fields["date"])[:10])
+    except ValueError:
+        raise ValueError(f"invalid date {fields['date']!r}, expected YYYY-MM-DD") from None
+    if not isinstance(fields["category"], str) or fields["category"] not in categories:
+        raise ValueError(f"unknown category {fields['category']!r}")
+    try:
+        impact = int(fields["impact"])
+    except (TypeError, ValueError, OverflowError):
+        impact = None
+    if impact is None or not 1 <= impact <= 5 or impact != float(fields["impact"]):
+        raise ValueError(f"impact must be a whole number from 1 to 5, got {fields['impact']!r}")
+    return entry_date.isoformat(), fields["category"], str(fields["evidence"]), impact
+
+
+def reframing_row(record):
+    """(original, reframed, created_at or None) from an import record, or ValueError"""
+    fields = _normalized(record)
+    missing = [name for name in REFRAMING_FIELDS[:2] if fields.get(name) in (None, "")]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    created_at = fields.get("date")
+    if created_at in (None, ""):
+        created_at = None
+    else:
+        try:
+            # Stored like SQLite's CURRENT_TIMESTAMP, so history sorts correctly
+            created_at = datetime.fromisoformat(str(created_at)).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            raise ValueError(f"invalid date {created_at!r}") from None
+    return str(fields["original"]), str(fields["reframed"]), created_at
+
+
+def import_rows(conn, columns, sql, rows, batch_size=1000):
+    """Stage tuples of columns in temp.import_batch, running sql (which reads it) every batch_size rows.
+
+    Returns the number of rows imported. Each batch is its own transaction.
+    """
+    conn.execute(f'CREATE TEMP TABLE IF NOT EXISTS import_batch ({", ".join(columns)})')
+    stage = f'INSERT INTO temp.import_batch VALUES ({", ".join("?" * len(columns))})'
+    imported = 0
+    batch = []
+
+    def flush():
+        conn.execute('DELETE FROM temp.import_batch')
+        conn.executemany(stage, batch)
+        conn.execute(sql)
+        conn.commit()
+
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+                imported += len(batch)
+                batch = []
+        if batch:
+            flush()
+            imported += len(batch)
+    finally:
+        conn.execute('DROP TABLE IF EXISTS temp.import_batch')
+    return imported
+
+
+def _valid_rows(records, to_row, errors):
+    """Rows of the records to_row accepts; rejections are appended to errors.
+
+    A file that cannot be read any further (bad JSON, bad encoding) ends the
+    import after the rows before it, with the reason as the last error.
+    """
+    records = iter(records)
+    number = 0
+    while True:
+        number += 1
+        try:
+            record = next(records)
+        except StopIteration:
+            return
+        except (ValueError, csv.Error) as exc:
+            errors.append((number, f"import stopped, {exc}"))
+            return
+        try:
+            yield to_row(record)
+        except ValueError as exc:
+            errors.append((number, str(exc)))
+
+
+def _import(conn, columns, sql, records, to_row, batch_size):
+    errors = []
+    imported = import_rows(conn, columns, sql, _valid_rows(records, to_row, errors), batch_size)
+    return imported, len(errors), errors[:MAX_ERRORS]
+
+
+def import_evidence(conn, user_id, records, categories, batch_size=1000):
+    """Insert valid evidence records; returns (imported, skipped, first errors as (record number, message))"""
+    return _import(
+        conn,
+        ('user_id', 'date', 'category', 'evidence', 'impact'),
+        'INSERT INTO evidence (user_id, date, category, evidence, impact) '
+        'SELECT user_id, date, category, evidence, impact FROM temp.import_batch ORDER BY rowid',
+        records,
+        lambda record: (user_id, *evidence_row(record, categories)),
+        batch_size,
+    )
+
+
+def import_reframing(conn, user_id, records, batch_size=1000):
+    """Insert valid reframing records; returns (imported, skipped, first errors as (record number, message))"""
+    return _import(
+        conn,
+        ('user_id', 'original_thought', 'reframed_thought', 'created_at'),
+        'INSERT INTO reframing_history (user_id, original_thought, reframed_thought, created_at) '
+        'SELECT user_id, original_thought, reframed_thought, COALESCE(created_at, CURRENT_TIMESTAMP) '
+        'FROM temp.import_batch ORDER BY rowid',
+        records,
+        lambda record: (user_id, *reframing_row(record)),
+        batch_size,
+    )
+
+
+def write_records(rows, fields, out, fmt):
+    """Write tuples of fields to a text stream as CSV or as a JSON array (one object per line)"""
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(fields)
+        writer.writerows(rows)
+        return
+    if fmt != "json":
+        raise ValueError(f"Unknown format {fmt!r}, expected 'csv' or 'json'")
+    out.write("[")
+    separator = "\n"
+    for row in rows:
+        out.write(separator)
+        out.write(json.dumps(dict(zip(fields, row)), ensure_ascii=False))
+        separator = ",\n"
+    out.write("\n]\n")
+
+
+def export_evidence(conn, user_id, out, fmt):
+    """Write a user's evidence, newest first, to a text stream"""
+    rows = conn.execute(
+        'SELECT date, category, evidence, impact FROM evidence WHERE user_id = ? ORDER BY date DESC, id DESC',
+        (user_id,)
+    )
+    write_records(map(tuple, rows), EVIDENCE_FIELDS, out, fmt)
+
+
+def export_reframing(conn, user_id, out, fmt):
+    """Write a user's reframing history, newest first, to a text stream"""
+    rows = conn.execute(
+        'SELECT original_thought, reframed_thought, created_at FROM reframing_history '
+        'WHERE user_id = ? ORDER BY created_at DESC',
+        (user_id,)
+    )
+    write_records(map(tuple, rows), REFRAMING_FIELDS, out, fmt)
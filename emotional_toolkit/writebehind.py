@@ -0,0 +1,328 @@
+"""Write-behind queue for the toolkit's saves, edits and deletes.
+
+Instead of blocking a script thread on the insert and commit, a write is
+appended to a journal file and queued, and the caller carries on as if it
+had succeeded. A background thread applies queued writes in grouped
+transactions, one per batch, so a burst of saves costs one commit.
+
+Inserts get a temporary negative id straight away. Later writes may refer
+to it (editing an entry that is still queued), and it is swapped for the
+real row id when the insert is applied; `resolve` maps one to the other.
+The most recent max_ids are kept in memory, and all of them in the shard's
+write_behind_ids table, where an id stays until the session has resolved
+it (or, for a session that never came back, until the app restarts).
+A write that fails is reported back to the session that submitted it
+through `failures`.
+
+Writes go to the shard of the user they belong to (see storage), a batch
+being applied as one transaction per shard it touches.
+
+The journal makes queued writes survive a crash of the app process: on
+start, writes a shard has not recorded as applied are replayed. The last
+journal entry applied to a shard and the ids given to temporary ids are
+stored in the same transaction as the writes themselves (see migration 7),
+so a write is never applied twice. Entries and temporary ids are numbered
+on from the last numbers of the previous journal, which an emptied journal
+starts with. The journal is flushed to the OS on every write but not
+fsynced, and one journal serves one app process.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from emotional_toolkit.cache import LRUCache
+from emotional_toolkit.db import is_locked
+
+
+class WriteBehindQueue:
+    """Journalled queue of writes applied by a background thread"""
+
+    def __init__(self, storage, journal_path, flush_interval=0.05, max_batch=500, attempts=5, max_ids=100_000):
+        self.storage = storage
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.attempts = attempts
+        self._pending = []
+        self._ids = LRUCache(max_ids)  # temporary id -> row id, for resolve
+        self._resolved = {}     # shard path -> temporary ids resolved by their session since the last drain
+        self._settled = 0       # temporary ids from here up belong to applied (or failed) inserts
+        self._first_temp_id = 0 # temporary ids from here up were handed out before the app started
+        self._failures = {}     # session -> [message, ...]
+        self._touched = {}      # shard path -> a user on it, for shards written since the journal was emptied
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._submitted = 0     # last seq handed out
+        self._applied = 0       # last seq applied (or failed)
+        self._temp_id = 0       # last temporary id handed out
+        self._journal = None
+        self._thread = None
+        self._stopping = False
+
+    # -- Lifecycle --
+
+    def start(self):
+        """Replay what the journal holds beyond each shard's applied entry, then start flushing"""
+        ops = []
+        last_seq = 0
+        lowest = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn last line from a crash mid-write
+                    if "user" in op:
+                        ops.append(op)
+                    last_seq = max(last_seq, op["seq"])
+                    lowest = min(lowest, op.get("temp_id") or 0)
+        applied = {}
+        for op in ops:
+            path = self.storage.shard_path(op["user"])
+            if path not in applied:
+                applied[path], shard_lowest = self._with_retry(op["user"], self._load_state)
+                lowest = min(lowest, shard_lowest)
+                self._touched[path] = op["user"]
+        replay = [op for op in ops if op["seq"] > applied[self.storage.shard_path(op["user"])]]
+        self._temp_id = self._first_temp_id = lowest
+        self._submitted = max([last_seq] + list(applied.values()))
+        self._applied = replay[0]["seq"] - 1 if replay else self._submitted
+        self._pending = replay
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="toolkit-write-behind", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=None):
+        """Apply what is queued and stop the background thread"""
+        with self._wake:
+            self._stopping = True
+            self._wake.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._journal is not None:
+            self._journal.close()
+
+    # -- Used by the app --
+
+    def submit(self, session, user_slug, description, sql, params, id_params=(), returns_id=False, must_change=False):
+        """Queue one statement on a user's shard; returns the temporary id of the new row when returns_id.
+
+        id_params are the positions in params holding row ids, which may be
+        temporary ids of rows still queued. With must_change, the write fails
+        if it changes no row (the entry was deleted meanwhile).
+        """
+        with self._wake:
+            if self._stopping:
+                raise RuntimeError("Write-behind queue is closed")
+            self._submitted += 1
+            op = {
+                "seq": self._submitted,
+                "session": session,
+                "user": user_slug,
+                "description": description,
+                "sql": sql,
+                "params": list(params),
+                "id_params": list(id_params),
+                "temp_id": self._next_temp_id() if returns_id else None,
+                "must_change": must_change,
+            }
+            self._journal.write(json.dumps(op) + "\n")
+            self._journal.flush()
+            self._pending.append(op)
+            self._wake.notify_all()
+            return op["temp_id"]
+
+    def resolve(self, user_slug, temp_id):
+        """Row id a user's temporary id was given, or None while its insert is queued (or failed)"""
+        row_id = self._ids.get(temp_id)
+        if row_id is None and temp_id >= self._settled:
+            # Applied, but no longer in memory
+            row_id = self._with_retry(user_slug, lambda conn: self._stored_id(conn, temp_id))
+        if row_id is not None:
+            # Kept in the shard until then, for the session to resolve
+            path = self.storage.shard_path(user_slug)
+            with self._lock:
+                self._touched.setdefault(path, user_slug)
+                self._resolved.setdefault(path, set()).add(temp_id)
+        return row_id
+
+    def failures(self, session):
+        """Messages of the session's writes that failed since the last call"""
+        with self._lock:
+            return self._failures.pop(session, [])
+
+    def flush(self, timeout=None):
+        """Wait until every write submitted so far has been applied; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._wake:
+            target = self._submitted
+            self._wake.notify_all()
+            while self._applied < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._wake.wait(remaining)
+        return True
+
+    # -- Background thread --
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._pending and not self._stopping:
+                    self._wake.wait()
+                if not self._pending and self._stopping:
+                    return
+            # Let a burst of writes gather into one transaction
+            time.sleep(self.flush_interval)
+            with self._lock:
+                batch = self._pending[:self.max_batch]
+            shards = {}
+            for op in batch:
+                shards.setdefault(self.storage.shard_path(op["user"]), []).append(op)
+            for path, ops in shards.items():
+                with self._lock:
+                    self._touched[path] = ops[0]["user"]
+                try:
+                    self._apply(ops)
+                except Exception as exc:
+                    # The shard itself is unusable (e.g. disk full): report
+                    # the writes rather than let the thread die
+                    for op in ops:
+                        self._fail(op, exc)
+            with self._wake:
+                del self._pending[:len(batch)]
+                self._applied = batch[-1]["seq"]
+                self._settled = min([self._settled] + [op["temp_id"] for op in batch if op["temp_id"]])
+                drained = not self._pending
+                if drained:
+                    self._truncate_journal()
+                self._wake.notify_all()
+            if drained:
+                # No journal entry refers to these temporary ids any more,
+                # and their sessions have swapped them for the row ids
+                with self._lock:
+                    touched, self._touched = self._touched, {}
+                    resolved, self._resolved = self._resolved, {}
+                for path, user_slug in touched.items():
+                    try:
+                        self._with_retry(user_slug, lambda conn: self._forget_ids(conn, resolved.get(path, ())))
+                    except Exception:
+                        pass  # only bookkeeping, tried again after the next drain
+                        # (ids resolved meanwhile stay until the app restarts)
+
+    def _apply(self, ops):
+        """Apply one shard's writes in one transaction, or one write at a time if that fails"""
+        user_slug = ops[0]["user"]
+        try:
+            self._with_retry(user_slug, lambda conn: self._apply_ops(conn, ops))
+        except (sqlite3.Error, _WriteFailed):
+            # Each write is reported on its own: some of them are committed
+            # by the time the shard fails altogether
+            for op in ops:
+                try:
+                    self._with_retry(user_slug, lambda conn: self._apply_ops(conn, [op]))
+                except Exception as exc:
+                    self._fail(op, exc)
+                    try:
+                        # Still mark it done, so it is not replayed
+                        self._with_retry(user_slug, lambda conn: self._apply_ops(conn, [], op["seq"]))
+                    except Exception:
+                        pass  # replayed, and reported again, after a restart
+
+    def _with_retry(self, user_slug, fn):
+        for attempt in range(self.attempts):
+            try:
+                with self.storage.connection(user_slug) as conn:
+                    return fn(conn)
+            except sqlite3.OperationalError as exc:
+                if not is_locked(exc) or attempt == self.attempts - 1:
+                    raise
+                time.sleep(min(0.05 * 2**attempt, 1.0))
+
+    def _apply_ops(self, conn, ops, seq=None):
+        new_ids = {}
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for op in ops:
+                params = list(op["params"])
+                for i in op["id_params"]:
+                    if params[i] < 0:
+                        row_id = new_ids.get(params[i]) or self._ids.get(params[i])
+                        if row_id is None:
+                            row_id = self._stored_id(conn, params[i])
+                        if row_id is None:
+                            raise _WriteFailed("the entry was never saved")
+                        params[i] = row_id
+                cursor = conn.execute(op["sql"], params)
+                if op["must_change"] and cursor.rowcount == 0:
+                    raise _WriteFailed("the entry no longer exists")
+                if op["temp_id"] is not None:
+                    new_ids[op["temp_id"]] = cursor.lastrowid
+                    conn.execute(
+                        'INSERT OR REPLACE INTO write_behind_ids (journal, temp_id, row_id) VALUES (?, ?, ?)',
+                        (self.journal_path, op["temp_id"], cursor.lastrowid)
+                    )
+            conn.execute(
+                'INSERT INTO write_behind_state (journal, applied_seq) VALUES (?, ?) '
+                'ON CONFLICT (journal) DO UPDATE SET applied_seq = excluded.applied_seq',
+                (self.journal_path, seq if seq is not None else ops[-1]["seq"])
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        for temp_id, row_id in new_ids.items():
+            self._ids.put(temp_id, row_id)
+
+    def _load_state(self, conn):
+        """The shard's last applied journal entry, and the lowest temporary id it has recorded"""
+        row = conn.execute(
+            'SELECT applied_seq FROM write_behind_state WHERE journal = ?', (self.journal_path,)
+        ).fetchone()
+        lowest = conn.execute(
+            'SELECT MIN(temp_id) FROM write_behind_ids WHERE journal = ?', (self.journal_path,)
+        ).fetchone()[0]
+        return (row[0] if row else 0), (lowest or 0)
+
+    def _stored_id(self, conn, temp_id):
+        row = conn.execute(
+            'SELECT row_id FROM write_behind_ids WHERE journal = ? AND temp_id = ?', (self.journal_path, temp_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _forget_ids(self, conn, resolved):
+        """Drop the ids resolved by their sessions, and those of sessions from before the app started"""
+        conn.execute(
+            'DELETE FROM write_behind_ids WHERE journal = ? AND temp_id >= ?', (self.journal_path, self._first_temp_id)
+        )
+        conn.executemany(
+            'DELETE FROM write_behind_ids WHERE journal = ? AND temp_id = ?',
+            ((self.journal_path, temp_id) for temp_id in resolved)
+        )
+        conn.commit()
+
+    def _next_temp_id(self):
+        # Called with the lock held
+        self._temp_id -= 1
+        return self._temp_id
+
+    def _fail(self, op, exc):
+        with self._lock:
+            self._failures.setdefault(op["session"], []).append(f"{op['description']} failed: {exc}")
+
+    def _truncate_journal(self):
+        """Start an empty journal once everything in it is applied (called with the lock held)"""
+        self._journal.close()
+        # Replaced in one step, so a crash never leaves it without the last numbers
+        with open(self.journal_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"seq": self._applied, "temp_id": self._temp_id}) + "\n")
+        os.replace(self.journal_path + ".tmp", self.journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+
+class _WriteFailed(Exception):
+    """A queued write that cannot be applied"""
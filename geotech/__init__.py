@@ -0,0 +1,27 @@
+"""Geotechnical calculation engine behind the Streamlit calculators.
+
+Importing this package only pulls in NumPy, so the formulas can be used
+from scripts and services without Streamlit.
+"""
+from geotech.formulas import (
+    NC_UNDRAINED,
+    bearing_capacity,
+    bearing_capacity_factors,
+    bearing_pressure,
+    consolidation_settlement,
+    consolidation_time,
+    coulomb_ka,
+    coulomb_pa,
+    coulomb_ka_valid,
+    depth_factors,
+    drainage_path,
+    eccentricity_ok,
+    inclination_factors,
+    rankine_kp,
+    rankine_pp,
+    resultant_inclination,
+    sliding_driving_force,
+    sliding_fs,
+    sliding_resisting_force,
+    time_factor,
+)
@@ -0,0 +1,5 @@
+import sys
+
+from geotech.cli import main
+
+sys.exit(main())
@@ -0,0 +1,59 @@
+"""Vectorized batch evaluation of design-case tables.
+
+A case table is any mapping of column name to 1-D array (a pandas
+DataFrame works as-is). Every row is one design case and the whole table is
+evaluated in a single pass through the formula engine.
+"""
+import numpy as np
+
+from geotech import formulas
+
+# Input columns of the general bearing capacity equation and the value used
+# when an optional column is absent or empty (None means required)
+BEARING_INPUTS = {
+    "phi2": None,
+    "B_prime": None,
+    "c2": 0.0,
+    "gamma2": 0.0,
+    "q": 0.0,
+    "D": 0.0,
+    "psi": 0.0,
+}
+
+BEARING_OUTPUTS = (
+    "Nc", "Nq", "Ng",
+    "Fcd", "Fqd", "Fyd",
+    "Fci", "Fqi", "Fyi",
+    "cohesion", "surcharge", "soil_weight",
+    "qu",
+)
+
+
+def missing_columns(columns, inputs=BEARING_INPUTS):
+    """Required input columns that are not present in the table"""
+    return [name for name, default in inputs.items() if default is None and name not in columns]
+
+
+def _column(table, name, default, n_rows):
+    if name not in table:
+        return np.full(n_rows, default, dtype=float)
+    values = np.asarray(table[name], dtype=float)
+    if default is not None:
+        # An empty cell means the field was left blank, as in the single-case form
+        values = np.where(np.isnan(values), default, values)
+    return values
+
+
+def run_bearing_cases(table):
+    """Evaluate the bearing capacity equation for every row of a case table.
+
+    Returns a dict of output columns (see BEARING_OUTPUTS), each as long as
+    the table. Rows with a missing required value come back as NaN.
+    """
+    missing = missing_columns(table)
+    if missing:
+        raise KeyError(f"Missing required columns: {', '.join(missing)}")
+    n_rows = len(np.asarray(table["phi2"]))
+    args = {name: _column(table, name, default, n_rows) for name, default in BEARING_INPUTS.items()}
+    result = formulas.bearing_capacity(**args)
+    return {name: np.broadcast_to(result[name], (n_rows,)) for name in BEARING_OUTPUTS}
@@ -0,0 +1,78 @@
+"""Process-wide memoization of formula results.
+
+Streamlit reruns the calculator script on every interaction and every
+browser session runs it in the same Python process, so a module-level cache
+is shared by all sessions. Inputs are normalized before lookup (ints,
+floats and NumPy scalars of equal value match, as do -0.0 and 0.0) but
+never rounded, so a cached result is only returned for the exact same
+inputs. Array inputs bypass the cache; the vectorized paths are fast
+enough on their own. The LRU itself is emotional_toolkit.cache's.
+"""
+import functools
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from emotional_toolkit.cache import LRUCache
+
+DEFAULT_MAXSIZE = int(os.environ.get("GEOTECH_CACHE_SIZE", "4096"))
+
+_cache = LRUCache(DEFAULT_MAXSIZE)
+
+
+class _Uncacheable(Exception):
+    pass
+
+
+def normalize(value):
+    """Hashable, canonical form of a scalar formula input"""
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    # Equal ints and floats hash alike, so 2 and 2.0 share an entry
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        return 0.0 if value == 0 else value  # -0.0 and 0.0 are the same input
+    raise _Uncacheable
+
+
+def memoize(fn, cache=None):
+    """Wrap a formula so scalar calls are answered from the shared cache"""
+    cache = _cache if cache is None else cache
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            key = (name, tuple(map(normalize, args)),
+                   tuple(sorted((k, normalize(v)) for k, v in kwargs.items())))
+        except _Uncacheable:
+            return fn(*args, **kwargs)
+        result = cache.get_or_compute(key, lambda: fn(*args, **kwargs))
+        # Callers get their own copy of dict results
+        return dict(result) if isinstance(result, dict) else result
+
+    return wrapper
+
+
+def memoized(module, cache=None):
+    """Namespace with a memoized version of every public function in module"""
+    namespace = SimpleNamespace()
+    for name, value in vars(module).items():
+        if name.isupper():
+            setattr(namespace, name, value)
+        elif callable(value) and not name.startswith("_") and value.__module__ == module.__name__:
+            setattr(namespace, name, memoize(value, cache))
+    return namespace
+
+
+def stats():
+    """Hit/miss statistics of the shared cache"""
+    return _cache.stats()
+
+
+def clear():
+    """Empty the shared cache and reset its statistics"""
+    _cache.clear()
@@ -0,0 +1,350 @@
+"""Command-line and local HTTP interface to the formula engine.
+
+Cases are JSON objects whose keys are the input names of a calculation,
+plus an optional "calc" (defaults to the one given on the command line or
+in the URL) and an optional "id" that is echoed back. Input may be a single
+object, a JSON array or NDJSON (one object per line); results are written
+as NDJSON, one line per case, in input order, as each chunk is evaluated.
+
+    python -m geotech list
+    python -m geotech run --calc bearing cases.ndjson
+    python -m geotech serve --port 8000
+
+Only NumPy is imported, so start-up stays fast for batch jobs. NaN results
+are written as null and infinite ones (e.g. FS with no driving force) as
+"inf" / "-inf", so the output is strict JSON.
+"""
+import argparse
+import json
+import math
+import sys
+
+import numpy as np
+
+from geotech import batch, consolidation, formulas
+
+NAN = math.nan
+
+
+def _rankine(phi2, gamma2, D, c2):
+    kp = formulas.rankine_kp(phi2)
+    return {"kp": kp, "pp": formulas.rankine_pp(kp, gamma2, D, c2)}
+
+
+def _sliding(sigma_v, k1, phi2, B, k2, c2, Pp, Pa, alpha):
+    return {
+        "resisting_force": formulas.sliding_resisting_force(sigma_v, k1, phi2, B, k2, c2, Pp),
+        "driving_force": formulas.sliding_driving_force(Pa, alpha),
+        "fs": formulas.sliding_fs(sigma_v, k1, phi2, B, k2, c2, Pp, Pa, alpha),
+    }
+
+
+def _bearing_pressure(sigma_v, B, e):
+    q_max, q_min = formulas.bearing_pressure(sigma_v, B, e)
+    ok = formulas.eccentricity_ok(B, e)
+    return {"q_max": np.where(ok, q_max, NAN), "q_min": np.where(ok, q_min, NAN)}
+
+
+def _time_factor(t, H, Cv):
+    Tv = formulas.time_factor(t, H, Cv)
+    return {"Tv": Tv, "U": consolidation.degree_of_consolidation(Tv)}
+
+
+# name -> (inputs, outputs, fn). An input default of None means required;
+# NaN means optional, with the outputs that need it coming back as null.
+CALCULATIONS = {
+    "rankine": (
+        {"phi2": None, "gamma2": NAN, "D": NAN, "c2": NAN},
+        ("kp", "pp"),
+        _rankine,
+    ),
+    "coulomb": (
+        {"alpha": None, "phi": None},
+        ("ka",),
+        lambda alpha, phi: {"ka": formulas.coulomb_ka(alpha, phi)},
+    ),
+    "sliding": (
+        dict.fromkeys(("sigma_v", "k1", "phi2", "B", "k2", "c2", "Pp", "Pa", "alpha")),
+        ("resisting_force", "driving_force", "fs"),
+        _sliding,
+    ),
+    "bearing_pressure": (
+        {"sigma_v": None, "B": None, "e": None},
+        ("q_max", "q_min"),
+        _bearing_pressure,
+    ),
+    "bearing": (
+        batch.BEARING_INPUTS,
+        batch.BEARING_OUTPUTS,
+        lambda **columns: formulas.bearing_capacity(**columns),
+    ),
+    "inclination": (
+        {"Pa": None, "alpha": None, "sigma_v": None},
+        ("psi",),
+        lambda Pa, alpha, sigma_v: {"psi": formulas.resultant_inclination(Pa, alpha, sigma_v)},
+    ),
+    "settlement": (
+        dict.fromkeys(("Cc", "Hc", "e0", "sigma0", "dsigma_p", "dsigma_f")),
+        ("settlement",),
+        lambda **columns: {"settlement": formulas.consolidation_settlement(**columns)},
+    ),
+    "time": (
+        {"Tv": None, "H": None, "Cv": None},
+        ("t",),
+        lambda Tv, H, Cv: {"t": formulas.consolidation_time(Tv, H, Cv)},
+    ),
+    "time_factor": (
+        {"t": None, "H": None, "Cv": None},
+        ("Tv", "U"),
+        _time_factor,
+    ),
+}
+
+
+# name -> [(valid, inputs, message)]: cases for which valid(*inputs) is False
+# get message as their error instead of null results
+CHECKS = {
+    "coulomb": [(formulas.coulomb_ka_valid, ("alpha", "phi"), "Invalid input: cos²α must be greater than cos²φ'")],
+    "bearing_pressure": [(formulas.eccentricity_ok, ("B", "e"), "Eccentricity (e) cannot exceed B/6")],
+}
+
+
+def describe():
+    """Inputs (with defaults, null = required) and outputs of every calculation"""
+    return {
+        name: {
+            "inputs": {key: None if default is None or math.isnan(default) else default
+                       for key, default in inputs.items()},
+            "required": [key for key, default in inputs.items() if default is None],
+            "outputs": list(outputs),
+        }
+        for name, (inputs, outputs, _) in CALCULATIONS.items()
+    }
+
+
+def _json_value(value):
+    value = float(value)
+    if math.isnan(value):
+        return None
+    if math.isinf(value):
+        return "inf" if value > 0 else "-inf"
+    return value
+
+
+def evaluate(calc, cases):
+    """Evaluate a list of cases of one calculation in a single vectorized pass"""
+    inputs, outputs, fn = CALCULATIONS[calc]
+    n = len(cases)
+    errors = [[] for _ in range(n)]
+    columns = {}
+    for name, default in inputs.items():
+        column = np.full(n, NAN if default is None else default)
+        for i, case in enumerate(cases):
+            value = case.get(name)
+            if value is None:
+                if default is None:
+                    errors[i].append(f"Missing {name}")
+                continue
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                errors[i].append(f"Invalid {name}: {value!r}")
+        columns[name] = column
+
+    with np.errstate(all="ignore"):
+        result = fn(**columns)
+        for valid, names, message in CHECKS.get(calc, ()):
+            valid = np.broadcast_to(valid(*(columns[name] for name in names)), (n,))
+            for i in np.flatnonzero(~valid):
+                if not errors[i]:
+                    errors[i].append(message)
+    result = {name: np.broadcast_to(result[name], (n,)) for name in outputs}
+
+    rows = []
+    for i, case in enumerate(cases):
+        row = {"id": case["id"]} if "id" in case else {}
+        row["calc"] = calc
+        if errors[i]:
+            row["error"] = ", ".join(errors[i])
+        else:
+            row.update((name, _json_value(values[i])) for name, values in result.items())
+        rows.append(row)
+    return rows
+
+
+def _evaluate_chunk(cases, calc):
+    rows = [None] * len(cases)
+    groups = {}
+    for i, case in enumerate(cases):
+        name = case.get("calc", calc)
+        if not isinstance(name, str) or name not in CALCULATIONS:
+            rows[i] = {"id": case["id"]} if "id" in case else {}
+            rows[i]["error"] = f"Unknown calc: {name!r}" if name else "No calc given"
+            continue
+        groups.setdefault(name, []).append(i)
+    for name, indexes in groups.items():
+        for i, row in zip(indexes, evaluate(name, [cases[i] for i in indexes])):
+            rows[i] = row
+    return rows
+
+
+def run_cases(cases, calc=None, chunk_size=4096):
+    """Yield one result row per case, evaluating chunk_size cases at a time"""
+    chunk = []
+    for case in cases:
+        chunk.append(case)
+        if len(chunk) >= chunk_size:
+            yield from _evaluate_chunk(chunk, calc)
+            chunk = []
+    if chunk:
+        yield from _evaluate_chunk(chunk, calc)
+
+
+def read_cases(lines):
+    """Yield case objects from an iterable of text lines (JSON or NDJSON)"""
+    lines = iter(lines)
+    for first in lines:
+        if first.strip():
+            break
+    else:
+        return
+
+    if first.lstrip().startswith("["):
+        document = json.loads(first + "".join(lines))
+        if not isinstance(document, list):
+            raise ValueError("Expected a JSON array or object of cases")
+        yield from _checked(document)
+        return
+
+    try:
+        yield from _checked([json.loads(first)])
+    except json.JSONDecodeError:
+        # A single pretty-printed object
+        yield from _checked([json.loads(first + "".join(lines))])
+        return
+    for number, line in enumerate(lines, start=2):
+        if line.strip():
+            try:
+                case = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"Line {number}: {exc}") from None
+            yield from _checked([case])
+
+
+def _checked(cases):
+    for case in cases:
+        if not isinstance(case, dict):
+            raise ValueError(f"A case must be a JSON object, got {type(case).__name__}")
+        yield case
+
+
+def write_ndjson(rows, out):
+    for row in rows:
+        out.write(json.dumps(row, ensure_ascii=False))
+        out.write("\n")
+
+
+def serve(host="127.0.0.1", port=8000, chunk_size=4096):
+    """Serve the calculations over HTTP until interrupted.
+
+    GET  /calcs        describe() as JSON
+    POST /calc/<name>  cases (JSON or NDJSON body) of one calculation
+    POST /run          cases that each name their own "calc"
+
+    Responses are NDJSON streamed as each chunk of cases is evaluated.
+    """
+    import io
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") in ("", "/calcs"):
+                self._send_json(200, describe())
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            path = self.path.rstrip("/")
+            if path == "/run":
+                calc = None
+            elif path.startswith("/calc/") and path[len("/calc/"):] in CALCULATIONS:
+                calc = path[len("/calc/"):]
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            rows = run_cases(read_cases(io.StringIO(body.decode("utf-8"))), calc, chunk_size)
+            try:
+                first = next(rows, None)
+            except (ValueError, UnicodeDecodeError) as exc:
+                self._send_json(400, {"error": str(exc)})
+                return
+
+            # No Content-Length: the body is streamed until the connection closes
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            out = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+            try:
+                if first is not None:
+                    write_ndjson([first], out)
+                write_ndjson(rows, out)
+            except ValueError as exc:
+                write_ndjson([{"error": str(exc)}], out)
+            out.detach()
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving geotech calculations on http://{host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m geotech", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="show calculations with their inputs and outputs")
+
+    run = commands.add_parser("run", help="evaluate JSON/NDJSON cases and write NDJSON results")
+    run.add_argument("input", nargs="?", default="-", help="case file (default: stdin)")
+    run.add_argument("--calc", choices=sorted(CALCULATIONS), help="calculation for cases without a \"calc\" key")
+    run.add_argument("--chunk-size", type=int, default=4096, help="cases evaluated per vectorized pass")
+
+    server = commands.add_parser("serve", help="serve the calculations over HTTP")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8000)
+    server.add_argument("--chunk-size", type=int, default=4096)
+
+    args = parser.parse_args(argv)
+    if args.command == "list":
+        json.dump(describe(), sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    elif args.command == "run":
+        try:
+            source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        except OSError as exc:
+            run.error(f"can't open '{args.input}': {exc.strerror}")  # exits with status 2
+        try:
+            write_ndjson(run_cases(read_cases(source), args.calc, args.chunk_size), sys.stdout)
+        except ValueError as exc:
+            print(f"error: {exc}", file=sys.stderr)
+            return 1
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    else:
+        serve(args.host, args.port, args.chunk_size)
+    return 0
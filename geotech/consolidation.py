@@ -0,0 +1,80 @@
+"""Time-dependent consolidation from Terzaghi's one-dimensional theory.
+
+The average degree of consolidation is the series solution
+
+    U(T_v) = 1 - Σ (2 / M²) exp(-M² T_v),   M = π(2m + 1)/2,  m = 0, 1, 2, ...
+
+evaluated as a (time steps × terms) matrix. The number of terms is chosen
+per time step so the first neglected term is below a tolerance: late times
+need one or two terms, very early times need many.
+"""
+import numpy as np
+
+from geotech import formulas
+
+# Time factors for 50 % and 90 % average consolidation
+TV_50 = 0.197
+TV_90 = 0.848
+
+
+def series_terms(Tv, tol=1e-10):
+    """Number of series terms needed so that the first dropped term is < tol"""
+    Tv = np.asarray(Tv, dtype=float)
+    with np.errstate(divide="ignore"):
+        # 2/M² ≤ 1 beyond the first term, so exp(-M² T_v) < tol is sufficient
+        M_needed = np.sqrt(np.log(1 / tol) / Tv)
+    return np.maximum(np.ceil(M_needed / np.pi - 0.5), 1).astype(np.int64)
+
+
+def degree_of_consolidation(Tv, tol=1e-10, max_terms=5_000, block=1 << 22):
+    """Average degree of consolidation U (0..1) for any array of time factors.
+
+    Time factors are grouped by the number of terms they need and evaluated
+    in blocks of at most `block` matrix cells to bound memory. Time factors
+    that would need more than max_terms terms use the early-time
+    approximation U = √(4 T_v / π), which is exact to the tolerance there.
+    """
+    Tv = np.asarray(Tv, dtype=float)
+    flat = Tv.ravel()
+    U = np.zeros_like(flat)
+    U[np.isnan(flat)] = np.nan
+
+    positive = flat > 0
+    terms = np.zeros(flat.shape, dtype=np.int64)
+    terms[positive] = series_terms(flat[positive], tol)
+    early = positive & (terms > max_terms)
+    U[early] = np.sqrt(4 * flat[early] / np.pi)
+
+    # Most demanding time factors first, so each block's first row sets its width
+    idx = np.flatnonzero(positive & ~early)
+    idx = idx[np.argsort(-terms[idx], kind="stable")]
+    start = 0
+    while start < idx.size:
+        n_terms = terms[idx[start]]
+        rows = idx[start:start + max(1, block // n_terms)]
+        M = np.pi * (2 * np.arange(n_terms) + 1) / 2
+        U[rows] = 1 - (2 / M**2 * np.exp(-np.outer(flat[rows], M**2))).sum(axis=1)
+        start += rows.size
+    return formulas._finish(U.reshape(Tv.shape))
+
+
+def settlement_curve(t, Cc, Hc, e0, sigma0, dsigma_p, dsigma_f, Cv):
+    """Consolidation settlement against time for one or more clay layers.
+
+    Layer properties are scalars or 1-D arrays of equal length (one entry
+    per layer); t is a 1-D array of times in the units of C_v. Each layer is
+    taken as drained top and bottom, as in formulas.consolidation_time, and
+    settles independently towards its final settlement from
+    formulas.consolidation_settlement.
+
+    Returns (total, per_layer) with shapes (len(t),) and (layers, len(t)).
+    """
+    t = np.asarray(t, dtype=float)
+    layers = np.broadcast_arrays(*(np.atleast_1d(np.asarray(x, dtype=float))
+                                   for x in (Cc, Hc, e0, sigma0, dsigma_p, dsigma_f, Cv)))
+    Cc, Hc, e0, sigma0, dsigma_p, dsigma_f, Cv = layers
+
+    final = np.asarray(formulas.consolidation_settlement(Cc, Hc, e0, sigma0, dsigma_p, dsigma_f))
+    Tv = np.asarray(formulas.time_factor(t[np.newaxis, :], Hc[:, np.newaxis], Cv[:, np.newaxis]))
+    per_layer = final[:, np.newaxis] * degree_of_consolidation(Tv)
+    return per_layer.sum(axis=0), per_layer
@@ -0,0 +1,266 @@
+"""Step-by-step derivations of the shared formulas.
+
+Each function computes its result with geotech.formulas and returns it
+together with a trace.Derivation holding the intermediate steps, in the
+wording of the learning calculator. The intermediate values come from the
+formulas themselves (their trace argument), so a derivation always shows
+the numbers its result was computed from. Nothing is formatted until the
+derivation is rendered.
+"""
+import math
+
+from geotech import formulas
+from geotech.trace import Derivation
+
+
+def kp(phi2):
+    """Rankine Kp; returns (kp, derivation)"""
+    d = Derivation("Kp")
+    d.formula("Kp = tan²(45° + φ₂'/2)")
+    t = {}
+    kp = formulas.rankine_kp(phi2, trace=t)
+    d.step("Kp = tan²(45° + {phi2}/2)", phi2=phi2)
+    d.step("Kp = tan²(45° + {half:.1f}°)", half=phi2 / 2)
+    d.step("Kp = tan²({angle:.1f}°)", angle=t["angle"])
+    d.step("Kp = {tan:.4f}²", tan=t["tan"])
+    d.result("Kp = {kp:.4f}", kp=kp)
+    return kp, d
+
+
+def pp(kp, gamma2, D, c2):
+    """Rankine Pp from Kp; returns (pp, derivation)"""
+    d = Derivation("Pp")
+    t = {}
+    pp = formulas.rankine_pp(kp, gamma2, D, c2, trace=t)
+    d.formula("Pp = ½ × Kp × γ₂ × D² + 2 × c₂' × D × √Kp")
+    d.step("Pp = ½ × {kp:.4f} × {gamma2} × {D}² + 2 × {c2} × {D} × √{kp:.4f}",
+           kp=kp, gamma2=gamma2, D=D, c2=c2)
+    d.step("Pp = ½ × {kp:.4f} × {gamma2} × {D_sq:.2f} + 2 × {c2} × {D} × {sqrt_kp:.4f}",
+           kp=kp, gamma2=gamma2, D=D, D_sq=t["D_sq"], c2=c2, sqrt_kp=t["sqrt_kp"])
+    d.step("Pp = {term1:.2f} + {term2:.2f}", term1=t["weight"], term2=t["cohesion"])
+    d.result("Pp = {pp:.2f} kN/m", pp=pp)
+    return pp, d
+
+
+def ka(alpha, phi):
+    """Coulomb Ka; returns (ka, derivation), ka is NaN for invalid input"""
+    d = Derivation("Ka")
+    d.formula("Ka = cosα × [cosα - √(cos²α - cos²φ')] / [cosα + √(cos²α - cos²φ')]")
+
+    t = {}
+    ka = formulas.coulomb_ka(alpha, phi, trace=t)
+    d.step("cosα = cos({alpha}°) = {cos_alpha:.4f}", alpha=alpha, cos_alpha=t["cos_alpha"])
+    d.step("cosφ' = cos({phi}°) = {cos_phi:.4f}", phi=phi, cos_phi=t["cos_phi"])
+    d.step("cos²α = {cos_alpha_sq:.4f}", cos_alpha_sq=t["cos_alpha_sq"])
+    d.step("cos²φ' = {cos_phi_sq:.4f}", cos_phi_sq=t["cos_phi_sq"])
+
+    if not formulas.coulomb_ka_valid(alpha, phi):
+        d.fail("Invalid input: cos²α must be greater than cos²φ'")
+        return math.nan, d
+
+    d.step("√(cos²α - cos²φ') = √({cos_alpha_sq:.4f} - {cos_phi_sq:.4f}) = √{difference:.4f} = {sqrt_term:.4f}",
+           cos_alpha_sq=t["cos_alpha_sq"], cos_phi_sq=t["cos_phi_sq"], difference=t["disc"], sqrt_term=t["root"])
+    d.step("Numerator = {cos_alpha:.4f} - {sqrt_term:.4f} = {numerator:.4f}",
+           cos_alpha=t["cos_alpha"], sqrt_term=t["root"], numerator=t["numerator"])
+    d.step("Denominator = {cos_alpha:.4f} + {sqrt_term:.4f} = {denominator:.4f}",
+           cos_alpha=t["cos_alpha"], sqrt_term=t["root"], denominator=t["denominator"])
+    d.step("Ka = {cos_alpha:.4f} × ({numerator:.4f} / {denominator:.4f})",
+           cos_alpha=t["cos_alpha"], numerator=t["numerator"], denominator=t["denominator"])
+    d.step("Ka = {cos_alpha:.4f} × {ratio:.4f}", cos_alpha=t["cos_alpha"], ratio=t["ratio"])
+    d.result("Ka = {ka:.4f}", ka=ka)
+    return ka, d
+
+
+def sliding_fs(sigma_v, k1, phi2, B, k2, c2, Pp, Pa, alpha):
+    """Factor of safety against sliding; returns (fs, derivation)"""
+    d = Derivation("FS")
+    d.formula("FS = [ΣV × tan(k₁ × φ₂') + B × k₂ × c₂' + Pp] / [Pₐ × cosα]")
+
+    t = {}
+    fs = formulas.sliding_fs(sigma_v, k1, phi2, B, k2, c2, Pp, Pa, alpha, trace=t)
+
+    d.heading("Resisting Force Components:")
+    d.step("ΣV × tan(k₁ × φ₂') = {sigma_v} × tan({k1} × {phi2}°)", sigma_v=sigma_v, k1=k1, phi2=phi2)
+    d.step("= {sigma_v} × tan({angle:.1f}°)", sigma_v=sigma_v, angle=t["angle"])
+    d.step("= {sigma_v} × {tan:.4f} = {tan_component:.2f} kN/m",
+           sigma_v=sigma_v, tan=t["tan"], tan_component=t["friction"])
+    d.step("B × k₂ × c₂' = {B} × {k2} × {c2} = {cohesion:.2f} kN/m",
+           B=B, k2=k2, c2=c2, cohesion=t["cohesion"])
+    d.step("Pp = {Pp} kN/m", Pp=Pp)
+    d.heading("Total Resisting Force = {tan_component:.2f} + {cohesion:.2f} + {Pp} = {resisting:.2f} kN/m",
+              tan_component=t["friction"], cohesion=t["cohesion"], Pp=Pp, resisting=t["resisting"])
+
+    d.heading("Driving Force:")
+    d.step("Pₐ × cosα = {Pa} × cos({alpha}°)", Pa=Pa, alpha=alpha)
+    d.step("= {Pa} × {cos:.4f} = {driving:.2f} kN/m", Pa=Pa, cos=t["cos_alpha"], driving=t["driving"])
+
+    if t["driving"] == 0:
+        d.result("FS = ∞", note="driving force is zero")
+    else:
+        d.result("FS = {resisting:.2f} / {driving:.2f} = {fs:.3f}",
+                 resisting=t["resisting"], driving=t["driving"], fs=fs)
+    return fs, d
+
+
+def bearing_pressure(sigma_v, B, e):
+    """Base pressure distribution; returns ((q_max, q_min), derivation)"""
+    d = Derivation("Bearing Pressure")
+    if not formulas.eccentricity_ok(B, e):
+        d.fail("Eccentricity (e) cannot exceed B/6")
+        return (math.nan, math.nan), d
+
+    d.heading("Formulas:")
+    d.step("q_max = (ΣV/B) × (1 + 6e/B)")
+    d.step("q_min = (ΣV/B) × (1 - 6e/B)")
+
+    t = {}
+    q_max, q_min = formulas.bearing_pressure(sigma_v, B, e, trace=t)
+    d.step("ΣV/B = {sigma_v} / {B} = {base:.2f} kPa", sigma_v=sigma_v, B=B, base=t["base"])
+    d.step("1 + 6e/B = 1 + 6×{e}/{B} = 1 + {ratio:.2f} = {factor:.2f}",
+           e=e, B=B, ratio=t["ratio"], factor=t["factor_max"])
+    d.step("1 - 6e/B = 1 - 6×{e}/{B} = 1 - {ratio:.2f} = {factor:.2f}",
+           e=e, B=B, ratio=t["ratio"], factor=t["factor_min"])
+
+    d.result("q_max = {base:.2f} × {factor:.2f} = {q:.2f} kPa", base=t["base"], factor=t["factor_max"], q=q_max)
+    d.result("q_min = {base:.2f} × {factor:.2f} = {q:.2f} kPa", base=t["base"], factor=t["factor_min"], q=q_min)
+    return (q_max, q_min), d
+
+
+def bearing_capacity(phi2, B_prime, c2=None, gamma2=None, q=None, D=None, psi=None):
+    """General bearing capacity; returns (formulas.bearing_capacity dict, derivation).
+
+    Missing optional inputs (None) drop their term (c₂', q, γ₂) or leave
+    their factors at 1 (D, ψ), and the derivation says so.
+    """
+    d = Derivation("Bearing Capacity")
+    d.formula("q_u = c₂' × Nc × Fcd × Fci + q × Nq × Fqd × Fqi + ½ × γ₂ × B' × Nγ × Fγd × Fγi")
+
+    t = {}
+    bc = formulas.bearing_capacity(
+        phi2, B_prime,
+        c2=c2 or 0, gamma2=gamma2 or 0, q=q or 0,
+        D=D or 0, psi=psi or 0,
+        trace=t,
+    )
+
+    d.heading("Bearing Capacity Factors:")
+    Nq, Nc, Ng = bc["Nq"], bc["Nc"], bc["Ng"]
+    d.step("Nq = exp(π × tanφ₂') × tan²(45° + φ₂'/2)")
+    d.step("Nq = exp({pi:.3f} × tan{phi2}°) × tan²(45° + {half:.1f}°)", pi=math.pi, phi2=phi2, half=phi2 / 2)
+    d.step("Nq = exp({pi:.3f} × {tan_phi:.4f}) × tan²({angle:.1f}°)",
+           pi=math.pi, tan_phi=t["tan_phi"], angle=45 + phi2 / 2)
+    d.step("Nq = {exp:.3f} × {tan_sq:.3f} = {Nq:.3f}", exp=t["exp_term"], tan_sq=t["tan_sq"], Nq=Nq)
+
+    if phi2 > 0:
+        d.step("Nc = (Nq - 1) × cotφ₂' = ({Nq:.3f} - 1) × cot{phi2}° = {Nc:.3f}", Nq=Nq, phi2=phi2, Nc=Nc)
+    else:
+        d.step("Nc = {Nc}", note="for φ₂' = 0°", Nc=formulas.NC_UNDRAINED)
+
+    d.step("Nγ = 2 × (Nq + 1) × tanφ₂' = 2 × ({Nq:.3f} + 1) × tan{phi2}° = {Ng:.3f}", Nq=Nq, phi2=phi2, Ng=Ng)
+
+    d.heading("Depth Factors:")
+    Fcd, Fqd, Fyd = bc["Fcd"], bc["Fqd"], bc["Fyd"]
+    if D is not None:
+        d.step("Fqd = 1 + 2 × tanφ₂' × (1 - sinφ₂')² × (D/B')")
+        d.step("Fqd = 1 + 2 × tan{phi2}° × (1 - sin{phi2}°)² × ({D}/{B_prime})", phi2=phi2, D=D, B_prime=B_prime)
+        d.step("Fqd = 1 + 2 × {tan_phi:.4f} × {sin_term:.4f} × {ratio:.3f} = {Fqd:.3f}",
+               tan_phi=t["tan_phi"], sin_term=t["sin_term"], ratio=t["depth_ratio"], Fqd=Fqd)
+    else:
+        d.step("Fqd = 1", note="D not provided")
+
+    if phi2 > 0:
+        d.step("Fcd = Fqd - (1 - Fqd)/(Nc × tanφ₂') = {Fqd:.3f} - (1 - {Fqd:.3f})/({Nc:.3f} × tan{phi2}°) = {Fcd:.3f}",
+               Fqd=Fqd, Nc=Nc, phi2=phi2, Fcd=Fcd)
+
+    d.step("Fγd = 1", note="common simplification")
+
+    d.heading("Inclination Factors:")
+    Fci, Fqi, Fyi = bc["Fci"], bc["Fqi"], bc["Fyi"]
+    if psi is not None:
+        d.step("Fci = Fqi = (1 - ψ/90)² = (1 - {psi}/90)² = {Fci:.3f}", psi=psi, Fci=Fci)
+        if phi2 > 0:
+            d.step("Fγi = (1 - ψ/φ₂')² = (1 - {psi}/{phi2})² = {Fyi:.3f}", psi=psi, phi2=phi2, Fyi=Fyi)
+        else:
+            d.step("Fγi = 1", note="φ₂' = 0°")
+    else:
+        d.step("Fci = Fqi = Fγi = 1", note="ψ not provided")
+
+    d.heading("Ultimate Bearing Capacity:")
+    component1, component2, component3 = bc["cohesion"], bc["surcharge"], bc["soil_weight"]
+    if c2 is not None:
+        d.step("Cohesion term = c₂' × Nc × Fcd × Fci = {c2} × {Nc:.3f} × {Fcd:.3f} × {Fci:.3f} = {term:.2f} kPa",
+               c2=c2, Nc=Nc, Fcd=Fcd, Fci=Fci, term=component1)
+    else:
+        d.step("Cohesion term = 0", note="c₂' not provided")
+
+    if q is not None:
+        d.step("Surcharge term = q × Nq × Fqd × Fqi = {q} × {Nq:.3f} × {Fqd:.3f} × {Fqi:.3f} = {term:.2f} kPa",
+               q=q, Nq=Nq, Fqd=Fqd, Fqi=Fqi, term=component2)
+    else:
+        d.step("Surcharge term = 0", note="q not provided")
+
+    if gamma2 is not None:
+        d.step("Soil weight term = ½ × γ₂ × B' × Nγ × Fγd × Fγi = 0.5 × {gamma2} × {B_prime} × {Ng:.3f} × {Fyd:g} × {Fyi:.3f} = {term:.2f} kPa",
+               gamma2=gamma2, B_prime=B_prime, Ng=Ng, Fyd=Fyd, Fyi=Fyi, term=component3)
+    else:
+        d.step("Soil weight term = 0", note="γ₂ not provided")
+
+    d.result("q_u = {c:.2f} + {q:.2f} + {g:.2f} = {qu:.2f} kPa",
+             c=component1, q=component2, g=component3, qu=bc["qu"])
+    return bc, d
+
+
+def resultant_inclination(Pa, alpha, sigma_v):
+    """Inclination ψ of the resultant; returns (psi, derivation)"""
+    d = Derivation("ψ")
+    d.formula("ψ = arctan[(Pₐ × cosα) / ΣV]")
+    d.step("ψ = arctan[({Pa} × cos{alpha}°) / {sigma_v}]", Pa=Pa, alpha=alpha, sigma_v=sigma_v)
+
+    t = {}
+    psi = formulas.resultant_inclination(Pa, alpha, sigma_v, trace=t)
+    d.step("Horizontal component = Pₐ × cosα = {Pa} × cos{alpha}°", Pa=Pa, alpha=alpha)
+    d.step("= {Pa} × {cos:.4f} = {horizontal:.2f} kN/m", Pa=Pa, cos=t["cos_alpha"], horizontal=t["horizontal"])
+
+    if sigma_v == 0:
+        d.result("ψ = 90°", note="ΣV = 0, resultant is purely horizontal")
+    else:
+        d.step("tanψ = {horizontal:.2f} / {sigma_v} = {tan_psi:.4f}",
+               horizontal=t["horizontal"], sigma_v=sigma_v, tan_psi=t["tan_psi"])
+        d.step("ψ = arctan({tan_psi:.4f}) = {psi:.2f}°", tan_psi=t["tan_psi"], psi=psi)
+        d.result("ψ = {psi:.2f} degrees", psi=psi)
+    return psi, d
+
+
+def consolidation_settlement(Cc, Hc, e0, sigma0, dsigma_p, dsigma_f):
+    """Primary consolidation settlement; returns (settlement, derivation)"""
+    d = Derivation("Settlement")
+    d.formula("S_c(p+f) = [C_c × H_c / (1 + e₀)] × log₁₀[(σ₀' + Δσ₍ₚ₎' + Δσ₍f₎') / σ₀']")
+    d.step("S_c(p+f) = [{Cc} × {Hc} / (1 + {e0})] × log₁₀[({sigma0} + {dsigma_p} + {dsigma_f}) / {sigma0}]",
+           Cc=Cc, Hc=Hc, e0=e0, sigma0=sigma0, dsigma_p=dsigma_p, dsigma_f=dsigma_f)
+
+    t = {}
+    settlement = formulas.consolidation_settlement(Cc, Hc, e0, sigma0, dsigma_p, dsigma_f, trace=t)
+    d.step("Term 1 = C_c × H_c / (1 + e₀) = {Cc} × {Hc} / {one_plus_e0} = {term1:.4f} m",
+           Cc=Cc, Hc=Hc, one_plus_e0=1 + e0, term1=t["term"])
+    d.step("Total stress = σ₀' + Δσ₍ₚ₎' + Δσ₍f₎' = {sigma0} + {dsigma_p} + {dsigma_f} = {total:g} kPa",
+           sigma0=sigma0, dsigma_p=dsigma_p, dsigma_f=dsigma_f, total=t["total"])
+    d.step("Stress ratio = {total:g} / {sigma0} = {ratio:.4f}", total=t["total"], sigma0=sigma0, ratio=t["ratio"])
+    d.step("log₁₀({ratio:.4f}) = {log_term:.4f}", ratio=t["ratio"], log_term=t["log_term"])
+    d.result("S_c(p+f) = {term1:.4f} × {log_term:.4f} = {settlement:.4f} m",
+             term1=t["term"], log_term=t["log_term"], settlement=settlement)
+    return settlement, d
+
+
+def consolidation_time(Tv, H, Cv):
+    """Time to reach a time factor with two-way drainage; returns (t, derivation)"""
+    d = Derivation("Time")
+    d.formula("t = (T_v × H_drainage²) / C_v")
+    d.text("Where H_drainage = H/2 (for two-way drainage)")
+
+    t = {}
+    time = formulas.consolidation_time(Tv, H, Cv, trace=t)
+    d.step("H_drainage = {H} / 2 = {H_drainage} m", H=H, H_drainage=t["drainage"])
+    d.step("t = ({Tv} × {H_drainage}²) / {Cv}", Tv=Tv, H_drainage=t["drainage"], Cv=Cv)
+    d.step("t = ({Tv} × {H_drainage_sq:.4f}) / {Cv}", Tv=Tv, H_drainage_sq=t["drainage_sq"], Cv=Cv)
+    d.result("t = {time:.2f} years", time=time)
+    return time, d
@@ -0,0 +1,235 @@
+"""Pure geotechnical formulas shared by the calculator apps.
+
+Every function accepts scalars, NumPy arrays or a mix of both and broadcasts
+them together, so a whole table of design cases can be evaluated in one call.
+Angles are always given in degrees. Scalar inputs give scalar results.
+
+Functions with a trace argument store their intermediate values in it when
+given a dict, for the step-by-step derivations (see geotech.derivations).
+"""
+import numpy as np
+
+# Nc used by the apps when φ' = 0 (undrained case)
+NC_UNDRAINED = 5.14
+
+
+def _finish(x):
+    """Return a NumPy scalar for 0-d results and the array otherwise"""
+    return np.asarray(x)[()]
+
+
+def _tan_deg(angle):
+    return np.tan(np.radians(angle))
+
+
+def _record(trace, **values):
+    if trace is not None:
+        trace.update({name: _finish(value) for name, value in values.items()})
+
+
+def rankine_kp(phi2, trace=None):
+    """Rankine passive earth pressure coefficient Kp = tan²(45° + φ₂'/2)"""
+    phi2 = np.asarray(phi2, dtype=float)
+    angle = 45 + phi2 / 2
+    tan = _tan_deg(angle)
+    _record(trace, angle=angle, tan=tan)
+    return _finish(tan**2)
+
+
+def rankine_pp(kp, gamma2, D, c2, trace=None):
+    """Rankine passive force Pp = ½ Kp γ₂ D² + 2 c₂' D √Kp (kN/m)"""
+    kp = np.asarray(kp, dtype=float)
+    D = np.asarray(D, dtype=float)
+    sqrt_kp = np.sqrt(kp)
+    weight = 0.5 * kp * gamma2 * D**2
+    cohesion = 2 * c2 * D * sqrt_kp
+    _record(trace, D_sq=D**2, sqrt_kp=sqrt_kp, weight=weight, cohesion=cohesion)
+    return _finish(weight + cohesion)
+
+
+def coulomb_ka(alpha, phi, trace=None):
+    """Coulomb active earth pressure coefficient for a sloping backfill.
+
+    Ka = cosα [cosα - √(cos²α - cos²φ')] / [cosα + √(cos²α - cos²φ')]
+
+    Cases where cos²α < cos²φ' have no real solution and come back as NaN
+    instead of raising, so invalid regions of a sweep are simply masked.
+    """
+    cos_alpha = np.cos(np.radians(np.asarray(alpha, dtype=float)))
+    cos_phi = np.cos(np.radians(np.asarray(phi, dtype=float)))
+    disc = cos_alpha**2 - cos_phi**2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        root = np.sqrt(np.where(disc < 0, np.nan, disc))
+        numerator = cos_alpha - root
+        denominator = cos_alpha + root
+        ratio = numerator / denominator
+    _record(trace, cos_alpha=cos_alpha, cos_phi=cos_phi, cos_alpha_sq=cos_alpha**2, cos_phi_sq=cos_phi**2,
+            disc=disc, root=root, numerator=numerator, denominator=denominator, ratio=ratio)
+    return _finish(cos_alpha * ratio)
+
+
+def coulomb_pa(ka, gamma1, H):
+    """Active thrust on the wall Pₐ = ½ Ka γ₁ H² (kN/m)"""
+    return _finish(0.5 * np.multiply(ka, gamma1) * np.asarray(H, dtype=float) ** 2)
+
+
+def coulomb_ka_valid(alpha, phi):
+    """True where cos²α ≥ cos²φ', i.e. where Ka is defined"""
+    cos_alpha = np.cos(np.radians(np.asarray(alpha, dtype=float)))
+    cos_phi = np.cos(np.radians(np.asarray(phi, dtype=float)))
+    return _finish(cos_alpha**2 - cos_phi**2 >= 0)
+
+
+def sliding_resisting_force(sigma_v, k1, phi2, B, k2, c2, Pp, trace=None):
+    """Resisting force ΣV tan(k₁φ₂') + B k₂ c₂' + Pp (kN/m)"""
+    angle = np.multiply(k1, phi2, dtype=float)
+    tan = _tan_deg(angle)
+    friction = sigma_v * tan
+    cohesion = np.multiply(B, k2) * c2
+    resisting = friction + cohesion + Pp
+    _record(trace, angle=angle, tan=tan, friction=friction, cohesion=cohesion, resisting=resisting)
+    return _finish(resisting)
+
+
+def sliding_driving_force(Pa, alpha, trace=None):
+    """Driving force Pₐ cosα (kN/m)"""
+    cos_alpha = np.cos(np.radians(np.asarray(alpha, dtype=float)))
+    driving = Pa * cos_alpha
+    _record(trace, cos_alpha=cos_alpha, driving=driving)
+    return _finish(driving)
+
+
+def sliding_fs(sigma_v, k1, phi2, B, k2, c2, Pp, Pa, alpha, trace=None):
+    """Factor of safety against sliding.
+
+    FS = [ΣV tan(k₁φ₂') + B k₂ c₂' + Pp] / [Pₐ cosα], infinite when the
+    driving force is zero.
+    """
+    resisting = np.asarray(sliding_resisting_force(sigma_v, k1, phi2, B, k2, c2, Pp, trace))
+    driving = np.asarray(sliding_driving_force(Pa, alpha, trace))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fs = np.where(driving == 0, np.inf, resisting / driving)
+    return _finish(fs)
+
+
+def eccentricity_ok(B, e):
+    """True where the eccentricity stays within the middle third (e ≤ B/6)"""
+    return _finish(np.asarray(e, dtype=float) <= np.asarray(B, dtype=float) / 6)
+
+
+def bearing_pressure(sigma_v, B, e, trace=None):
+    """Base pressures (q_max, q_min) = (ΣV/B)(1 ± 6e/B) in kPa"""
+    B = np.asarray(B, dtype=float)
+    base = sigma_v / B
+    ratio = 6 * np.asarray(e, dtype=float) / B
+    _record(trace, base=base, ratio=ratio, factor_max=1 + ratio, factor_min=1 - ratio)
+    return _finish(base * (1 + ratio)), _finish(base * (1 - ratio))
+
+
+def bearing_capacity_factors(phi2, trace=None):
+    """Bearing capacity factors (Nc, Nq, Nγ) for φ₂' in degrees"""
+    phi2 = np.asarray(phi2, dtype=float)
+    tan_phi = _tan_deg(phi2)
+    exp_term = np.exp(np.pi * tan_phi)
+    tan_sq = _tan_deg(45 + phi2 / 2) ** 2
+    _record(trace, tan_phi=tan_phi, exp_term=exp_term, tan_sq=tan_sq)
+    Nq = exp_term * tan_sq
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Nc = np.where(phi2 > 0, (Nq - 1) / tan_phi, NC_UNDRAINED)
+    Ng = 2 * (Nq + 1) * tan_phi
+    return _finish(Nc), _finish(Nq), _finish(Ng)
+
+
+def depth_factors(phi2, D, B_prime, Nc=None, trace=None):
+    """Depth factors (Fcd, Fqd, Fγd); pass D = 0 when the depth is unknown"""
+    phi2 = np.asarray(phi2, dtype=float)
+    if Nc is None:
+        Nc = bearing_capacity_factors(phi2)[0]
+    tan_phi = _tan_deg(phi2)
+    sin_term = (1 - np.sin(np.radians(phi2))) ** 2
+    depth_ratio = np.asarray(D, dtype=float) / B_prime
+    _record(trace, sin_term=sin_term, depth_ratio=depth_ratio)
+    Fqd = 1 + 2 * tan_phi * sin_term * depth_ratio
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Fcd = np.where(phi2 > 0, Fqd - (1 - Fqd) / (Nc * tan_phi), 1.0)
+    Fyd = np.ones_like(Fqd)
+    return _finish(Fcd), _finish(Fqd), _finish(Fyd)
+
+
+def inclination_factors(phi2, psi):
+    """Inclination factors (Fci, Fqi, Fγi); pass ψ = 0 for a vertical load"""
+    phi2 = np.asarray(phi2, dtype=float)
+    psi = np.asarray(psi, dtype=float)
+    Fci = (1 - psi / 90) ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Fyi = np.where(phi2 > 0, (1 - psi / phi2) ** 2, 1.0)
+    return _finish(Fci), _finish(Fci), _finish(Fyi)
+
+
+def bearing_capacity(phi2, B_prime, c2=0.0, gamma2=0.0, q=0.0, D=0.0, psi=0.0, trace=None):
+    """General bearing capacity equation with all intermediate factors.
+
+    q_u = c₂' Nc Fcd Fci + q Nq Fqd Fqi + ½ γ₂ B' Nγ Fγd Fγi
+
+    Optional inputs default to zero, which drops the matching term (c₂', q,
+    γ₂) or makes the matching factors equal to 1 (D, ψ), exactly as leaving
+    the field empty does in the apps. Returns a dict of arrays keyed
+    Nc, Nq, Ng, Fcd, Fqd, Fyd, Fci, Fqi, Fyi, cohesion, surcharge,
+    soil_weight and qu.
+    """
+    Nc, Nq, Ng = bearing_capacity_factors(phi2, trace)
+    Fcd, Fqd, Fyd = depth_factors(phi2, D, B_prime, Nc=Nc, trace=trace)
+    Fci, Fqi, Fyi = inclination_factors(phi2, psi)
+    cohesion = _finish(c2 * Nc * Fcd * Fci)
+    surcharge = _finish(q * Nq * Fqd * Fqi)
+    soil_weight = _finish(0.5 * np.multiply(gamma2, B_prime) * Ng * Fyd * Fyi)
+    return {
+        "Nc": Nc, "Nq": Nq, "Ng": Ng,
+        "Fcd": Fcd, "Fqd": Fqd, "Fyd": Fyd,
+        "Fci": Fci, "Fqi": Fqi, "Fyi": Fyi,
+        "cohesion": cohesion, "surcharge": surcharge, "soil_weight": soil_weight,
+        "qu": _finish(cohesion + surcharge + soil_weight),
+    }
+
+
+def resultant_inclination(Pa, alpha, sigma_v, trace=None):
+    """Inclination ψ = arctan(Pₐ cosα / ΣV) in degrees, 90° when ΣV = 0"""
+    cos_alpha = np.cos(np.radians(np.asarray(alpha, dtype=float)))
+    horizontal = np.asarray(Pa * cos_alpha)
+    sigma_v = np.asarray(sigma_v, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tan_psi = horizontal / sigma_v
+        psi = np.where(sigma_v == 0, 90.0, np.degrees(np.arctan(tan_psi)))
+    _record(trace, cos_alpha=cos_alpha, horizontal=horizontal, tan_psi=tan_psi)
+    return _finish(psi)
+
+
+def consolidation_settlement(Cc, Hc, e0, sigma0, dsigma_p, dsigma_f, trace=None):
+    """Primary consolidation settlement of normally consolidated clay (m).
+
+    S_c = [C_c H_c / (1 + e₀)] log₁₀[(σ₀' + Δσ_p' + Δσ_f') / σ₀']
+    """
+    sigma0 = np.asarray(sigma0, dtype=float)
+    term = np.multiply(Cc, Hc) / np.add(1, e0)
+    total = sigma0 + dsigma_p + dsigma_f
+    ratio = total / sigma0
+    log_term = np.log10(ratio)
+    _record(trace, term=term, total=total, ratio=ratio, log_term=log_term)
+    return _finish(term * log_term)
+
+
+def drainage_path(H):
+    """Drainage path length H_dr = H/2 for a layer drained top and bottom"""
+    return _finish(np.asarray(H, dtype=float) / 2)
+
+
+def consolidation_time(Tv, H, Cv, trace=None):
+    """Time t = T_v H_dr² / C_v for a two-way drained layer of thickness H"""
+    drainage = np.asarray(drainage_path(H))
+    _record(trace, drainage=drainage, drainage_sq=drainage**2)
+    return _finish(Tv * drainage**2 / np.asarray(Cv, dtype=float))
+
+
+def time_factor(t, H, Cv):
+    """Time factor T_v = C_v t / H_dr², the inverse of consolidation_time"""
+    return _finish(np.multiply(Cv, t) / np.asarray(drainage_path(H)) ** 2)
@@ -0,0 +1,94 @@
+"""Incremental dataflow graph for chained formula evaluation.
+
+Inputs are plain named values and every node is a formula that declares the
+names it reads. Setting an input marks only its downstream nodes as stale;
+evaluation recomputes just those nodes, in dependency order. A node with a
+missing (None) input evaluates to None instead of raising, so a partly
+filled form still shows whatever can be computed.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is b
+    try:
+        return bool(np.array_equal(a, b, equal_nan=True))
+    except TypeError:
+        return a == b
+
+
+class Graph:
+    """Named inputs plus formula nodes, recomputed only where stale"""
+
+    def __init__(self):
+        self._inputs = {}
+        self._nodes = {}
+        self._values = {}
+        self._dependents = defaultdict(set)
+        self._stale = set()
+        self._order = []
+
+    def add_input(self, name, value=None):
+        if name in self._nodes or name in self._inputs:
+            raise ValueError(f"{name} is already defined")
+        self._inputs[name] = value
+        self._values[name] = value
+
+    def add_node(self, name, fn, inputs):
+        """Add a formula node computed as fn(*[value of each input name])"""
+        if name in self._nodes or name in self._inputs:
+            raise ValueError(f"{name} is already defined")
+        unknown = [source for source in inputs if source not in self._nodes and source not in self._inputs]
+        if unknown:
+            raise KeyError(f"{name} depends on undefined {', '.join(unknown)}")
+        self._nodes[name] = (fn, tuple(inputs))
+        for source in inputs:
+            self._dependents[source].add(name)
+        # Sources must already exist, so insertion order is a topological order
+        self._order.append(name)
+        self._stale.add(name)
+
+    def downstream(self, name):
+        """Every node that depends on name, directly or indirectly"""
+        seen = set()
+        pending = [name]
+        while pending:
+            for dependent in self._dependents[pending.pop()]:
+                if dependent not in seen:
+                    seen.add(dependent)
+                    pending.append(dependent)
+        return seen
+
+    def set(self, **values):
+        """Update inputs; only inputs whose value changed invalidate anything"""
+        for name, value in values.items():
+            if name not in self._inputs:
+                raise KeyError(f"{name} is not an input")
+            if _same(self._inputs[name], value):
+                continue
+            self._inputs[name] = value
+            self._values[name] = value
+            self._stale |= self.downstream(name)
+
+    def evaluate(self):
+        """Recompute stale nodes; returns their names in evaluation order"""
+        recomputed = [name for name in self._order if name in self._stale]
+        for name in recomputed:
+            fn, inputs = self._nodes[name]
+            args = [self._values[source] for source in inputs]
+            self._values[name] = None if any(arg is None for arg in args) else fn(*args)
+        self._stale.clear()
+        return recomputed
+
+    def __getitem__(self, name):
+        if self._stale:
+            self.evaluate()
+        return self._values[name]
+
+    def values(self):
+        if self._stale:
+            self.evaluate()
+        return dict(self._values)
@@ -0,0 +1,160 @@
+"""Monte Carlo reliability analysis of the factor of safety against sliding.
+
+Each input of formulas.sliding_fs gets a distribution spec, a tuple of the
+distribution kind and its parameters:
+
+    ("fixed", value)
+    ("normal", mean, std)
+    ("lognormal", mean, std)        # mean and std of the variable itself
+    ("uniform", low, high)
+    ("triangular", low, mode, high)
+
+A bare number is treated as ("fixed", value). Parameters that do not
+define a distribution (a negative std, a lognormal mean ≤ 0, bounds out of
+order) raise ValueError. Samples are drawn and
+evaluated in fixed-size chunks and only a histogram of FS is kept, so memory
+does not grow with the number of samples. Chunks can be spread over a
+process pool; every chunk has its own seed, so the result for a given seed
+does not depend on the number of workers.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from geotech import formulas
+
+# Inputs of formulas.sliding_fs, in call order
+FS_INPUTS = ("sigma_v", "k1", "phi2", "B", "k2", "c2", "Pp", "Pa", "alpha")
+
+DISTRIBUTIONS = {
+    "fixed": ("value",),
+    "normal": ("mean", "std"),
+    "lognormal": ("mean", "std"),
+    "uniform": ("low", "high"),
+    "triangular": ("low", "mode", "high"),
+}
+
+
+def normalize_spec(spec):
+    """A distribution spec as (kind, *float parameters), checked; raises ValueError if invalid"""
+    if np.isscalar(spec):
+        spec = ("fixed", spec)
+    kind, *params = spec
+    if kind not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution: {kind}")
+    if len(params) != len(DISTRIBUTIONS[kind]):
+        raise ValueError(f"{kind} takes {', '.join(DISTRIBUTIONS[kind])}")
+    params = [float(param) for param in params]
+    if not np.all(np.isfinite(params)):
+        raise ValueError(f"{kind} parameters must be finite numbers")
+    if kind in ("normal", "lognormal") and params[1] < 0:
+        raise ValueError(f"{kind} std cannot be negative")
+    if kind == "lognormal" and params[0] <= 0:
+        raise ValueError("lognormal mean must be greater than 0")
+    if kind == "uniform" and params[0] > params[1]:
+        raise ValueError("uniform low cannot exceed high")
+    if kind == "triangular" and not (params[0] <= params[1] <= params[2] and params[0] < params[2]):
+        raise ValueError("triangular needs low ≤ mode ≤ high, with low < high")
+    return (kind, *params)
+
+
+def sample(spec, rng, size):
+    """Draw size samples from a distribution spec"""
+    kind, *params = normalize_spec(spec)
+    if kind == "fixed":
+        return np.full(size, params[0])
+    if kind == "normal":
+        return rng.normal(params[0], params[1], size)
+    if kind == "lognormal":
+        mean, std = params
+        sigma2 = np.log1p((std / mean) ** 2)
+        return rng.lognormal(np.log(mean) - sigma2 / 2, np.sqrt(sigma2), size)
+    if kind == "uniform":
+        return rng.uniform(params[0], params[1], size)
+    return rng.triangular(params[0], params[1], params[2], size)
+
+
+def _run_chunk(task):
+    """Sample and evaluate one chunk; returns the partial statistics"""
+    specs, seed, size, threshold, edges = task
+    rng = np.random.default_rng(seed)
+    fs = formulas.sliding_fs(*(sample(specs[name], rng, size) for name in FS_INPUTS))
+
+    valid = fs[~np.isnan(fs)]
+    finite = valid[np.isfinite(valid)]
+    # Bin 0 collects FS below the first edge, the last bin FS above the last edge
+    width = edges[1] - edges[0]
+    index = np.clip(np.floor((valid - edges[0]) / width), -1, len(edges) - 1).astype(np.int64) + 1
+    counts = np.bincount(index, minlength=len(edges) + 1)
+    return {
+        "n_valid": valid.size,
+        "n_fail": int(np.count_nonzero(valid < threshold)),
+        "n_finite": finite.size,
+        "sum": float(finite.sum()),
+        "sum_sq": float(np.square(finite).sum()),
+        "counts": counts,
+    }
+
+
+def _percentile(counts, edges, p):
+    """Percentile interpolated from histogram counts with under/overflow bins"""
+    cumulative = np.cumsum(counts)
+    target = p / 100 * cumulative[-1]
+    i = int(np.searchsorted(cumulative, target, side="left"))
+    if i == 0:
+        return edges[0]
+    if i == len(counts) - 1:
+        return np.inf
+    before = cumulative[i - 1]
+    fraction = (target - before) / counts[i] if counts[i] else 0.0
+    return edges[i - 1] + fraction * (edges[i] - edges[i - 1])
+
+
+def simulate_sliding_fs(specs, n_samples=1_000_000, chunk_size=250_000, seed=None, workers=1,
+                        threshold=1.0, percentiles=(5, 50, 95), fs_max=10.0, bins=10_000):
+    """Probability of failure and FS percentiles for uncertain sliding inputs.
+
+    specs maps every name in FS_INPUTS to a distribution spec. Failure means
+    FS < threshold. Percentiles are read from a histogram of `bins` bins over
+    0..fs_max (resolution fs_max / bins); one below 0 is reported as 0 and
+    one above fs_max as inf. Samples with an undefined FS are dropped.
+    """
+    missing = [name for name in FS_INPUTS if name not in specs]
+    if missing:
+        raise KeyError(f"Missing distributions for: {', '.join(missing)}")
+    checked = {}
+    for name in FS_INPUTS:
+        try:
+            checked[name] = normalize_spec(specs[name])
+        except ValueError as exc:
+            raise ValueError(f"{name}: {exc}") from None
+    specs = checked
+
+    edges = np.linspace(0.0, fs_max, bins + 1)
+    sizes = [chunk_size] * (n_samples // chunk_size)
+    if n_samples % chunk_size:
+        sizes.append(n_samples % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(specs, s, size, threshold, edges) for s, size in zip(seeds, sizes)]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_run_chunk, tasks))
+    else:
+        parts = [_run_chunk(task) for task in tasks]
+
+    n_valid = sum(part["n_valid"] for part in parts)
+    n_finite = sum(part["n_finite"] for part in parts)
+    counts = np.sum([part["counts"] for part in parts], axis=0)
+    mean = sum(part["sum"] for part in parts) / n_finite if n_finite else np.nan
+    variance = sum(part["sum_sq"] for part in parts) / n_finite - mean**2 if n_finite else np.nan
+    return {
+        "n_samples": n_samples,
+        "n_valid": n_valid,
+        "probability_of_failure": sum(part["n_fail"] for part in parts) / n_valid if n_valid else np.nan,
+        "mean": mean,
+        "std": float(np.sqrt(max(variance, 0.0))) if n_finite else np.nan,
+        "percentiles": {p: _percentile(counts, edges, p) for p in percentiles} if n_valid else {},
+        "edges": edges,
+        "counts": counts[1:-1],
+    }
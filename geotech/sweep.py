@@ -0,0 +1,59 @@
+"""Parametric sweeps of the earth pressure formulas over 2-D grids.
+
+A sweep evaluates a formula once over the full outer product of two input
+ranges by broadcasting a row vector against a column vector, so a 1000×1000
+grid is a single array expression. Invalid cells come back as NaN.
+"""
+import warnings
+
+import numpy as np
+
+from geotech import formulas
+
+
+def passive_force(phi2, gamma2, D, c2):
+    """Rankine passive force Pp straight from φ₂' (kN/m)"""
+    return formulas.rankine_pp(formulas.rankine_kp(phi2), gamma2, D, c2)
+
+
+def sweep_2d(fn, x_name, x_values, y_name, y_values, **fixed):
+    """Evaluate fn over the grid of x_values × y_values.
+
+    Returns an array of shape (len(y_values), len(x_values)) so rows follow
+    the y axis, with any remaining keyword arguments held fixed.
+    """
+    x = np.asarray(x_values, dtype=float)[np.newaxis, :]
+    y = np.asarray(y_values, dtype=float)[:, np.newaxis]
+    z = np.asarray(fn(**{x_name: x, y_name: y, **fixed}), dtype=float)
+    return np.broadcast_to(z, (y.shape[0], x.shape[1]))
+
+
+def ka_grid(alpha_values, phi_values):
+    """Coulomb Ka over α (rows) × φ' (columns), NaN where cos²α < cos²φ'"""
+    return sweep_2d(formulas.coulomb_ka, "phi", phi_values, "alpha", alpha_values)
+
+
+def coarsen(x_values, y_values, z, max_side=100):
+    """Block-average a grid down to at most max_side cells per axis.
+
+    Used to keep the number of chart marks small for very fine sweeps.
+    Blocks that are entirely invalid stay NaN. Returns the block-centre x and
+    y values together with the reduced grid.
+    """
+    x = np.asarray(x_values, dtype=float)
+    y = np.asarray(y_values, dtype=float)
+    z = np.asarray(z, dtype=float)
+    by = -(-z.shape[0] // max_side)
+    bx = -(-z.shape[1] // max_side)
+    if bx == 1 and by == 1:
+        return x, y, z
+
+    ny, nx = -(-z.shape[0] // by), -(-z.shape[1] // bx)
+    padded = np.full((ny * by, nx * bx), np.nan)
+    padded[:z.shape[0], :z.shape[1]] = z
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        z_coarse = np.nanmean(padded.reshape(ny, by, nx, bx), axis=(1, 3))
+        x_coarse = np.nanmean(np.pad(x, (0, nx * bx - x.size), constant_values=np.nan).reshape(nx, bx), axis=1)
+        y_coarse = np.nanmean(np.pad(y, (0, ny * by - y.size), constant_values=np.nan).reshape(ny, by), axis=1)
+    return x_coarse, y_coarse, z_coarse
@@ -0,0 +1,149 @@
+"""Structured derivation traces for the step-by-step calculator.
+
+A Derivation stores each step as a (kind, template, values, note) tuple and
+formats nothing until it is rendered, so computing a derivation is cheap and
+the same record can be shown on the page or exported as Markdown or LaTeX.
+"""
+import re
+
+_FUNCTIONS = {"tan", "cos", "sin", "exp", "cot", "arctan"}
+
+_LATEX_SYMBOLS = [
+    ("₍ₚ₎", "_{(p)}"), ("₍f₎", "_{(f)}"), ("₁₀", "_{10}"),
+    ("₀", "_{0}"), ("₁", "_{1}"), ("₂", "_{2}"), ("ₐ", "_{a}"),
+    ("²", "^{2}"), ("°", "^{\\circ}"), ("½", "\\tfrac{1}{2}"), ("∞", "\\infty "),
+    ("×", "\\times "), ("φ", "\\varphi "), ("α", "\\alpha "), ("γ", "\\gamma "),
+    ("ψ", "\\psi "), ("σ", "\\sigma "), ("Δ", "\\Delta "), ("Σ", "\\Sigma "), ("π", "\\pi "),
+]
+
+_LATEX_TEXT_ESCAPES = str.maketrans({"&": "\\&", "%": "\\%", "$": "\\$", "#": "\\#", "_": "\\_",
+                                     "{": "\\{", "}": "\\}"})
+
+
+def _latex_word(match):
+    base, _, sub = match.group(0).partition("_")
+    if sub:
+        return f"{_latex_word_part(base)}_{{{_latex_word_part(sub)}}}"
+    return _latex_word_part(base)
+
+
+def _latex_word_part(word):
+    if word == "log":
+        return "\\log"
+    if word in _FUNCTIONS:
+        return f"\\{word} " if word != "arctan" else "\\arctan "
+    return f"\\text{{{word}}}" if len(word) >= 3 else word
+
+
+def _latex_sqrt(text):
+    """Turn √(...) and √number into \\sqrt{...}"""
+    out = []
+    i = 0
+    while i < len(text):
+        if text[i] != "√":
+            out.append(text[i])
+            i += 1
+            continue
+        i += 1
+        if i < len(text) and text[i] == "(":
+            depth, j = 0, i
+            while j < len(text):
+                depth += {"(": 1, ")": -1}.get(text[j], 0)
+                if depth == 0:
+                    break
+                j += 1
+            out.append("\\sqrt{" + _latex_sqrt(text[i + 1:j]) + "}")
+            i = j + 1
+        else:
+            j = i
+            while j < len(text) and (text[j].isalnum() or text[j] in "._"):
+                j += 1
+            out.append("\\sqrt{" + text[i:j] + "}")
+            i = j
+    return "".join(out)
+
+
+def latex_math(text):
+    """Best-effort conversion of a calculator step to LaTeX math"""
+    text = re.sub(r"[A-Za-z]+(?:_[A-Za-z0-9]+)?", _latex_word, text)
+    text = text.replace("} \\text{", " ")  # keep multi-word labels in one \text
+    for symbol, latex in _LATEX_SYMBOLS:
+        text = text.replace(symbol, latex)
+    return _latex_sqrt(text).replace("[", "\\left[").replace("]", "\\right]")
+
+
+class Derivation:
+    """Compact, lazily formatted record of one calculation"""
+
+    __slots__ = ("title", "steps")
+
+    def __init__(self, title):
+        self.title = title
+        self.steps = []
+
+    def _add(self, kind, template, values, note=None):
+        self.steps.append((kind, template, values, note))
+
+    def formula(self, template, **values):
+        self._add("formula", template, values)
+
+    def heading(self, template, **values):
+        self._add("heading", template, values)
+
+    def step(self, template, note=None, **values):
+        self._add("step", template, values, note)
+
+    def text(self, template, **values):
+        self._add("text", template, values)
+
+    def result(self, template, note=None, **values):
+        self._add("result", template, values, note)
+
+    def fail(self, message):
+        self._add("error", message, {})
+
+    @property
+    def error(self):
+        for kind, template, _, _ in self.steps:
+            if kind == "error":
+                return template
+        return None
+
+    def results(self):
+        """Formatted result lines, e.g. for a success message"""
+        return [self._format(template, values, note)
+                for kind, template, values, note in self.steps if kind == "result"]
+
+    @staticmethod
+    def _format(template, values, note=None):
+        line = template.format(**values) if values else template
+        return f"{line} ({note})" if note else line
+
+    def to_markdown(self):
+        lines = []
+        for kind, template, values, note in self.steps:
+            line = self._format(template, values, note)
+            if kind == "formula":
+                line = f"**Formula:** {line}"
+            elif kind in ("heading", "result"):
+                line = f"**{line}**"
+            elif kind == "error":
+                line = f"**⚠️ {line}**"
+            lines.append(line)
+        return "\n\n".join(lines)
+
+    def to_latex(self):
+        lines = [f"\\subsection*{{{self.title.translate(_LATEX_TEXT_ESCAPES)}}}"]
+        for kind, template, values, note in self.steps:
+            line = template.format(**values) if values else template
+            suffix = f" \\quad \\text{{({note.translate(_LATEX_TEXT_ESCAPES)})}}" if note else ""
+            if kind == "heading":
+                lines.append(f"\\paragraph{{{line.translate(_LATEX_TEXT_ESCAPES)}}}")
+            elif kind in ("text", "error"):
+                text = line.translate(_LATEX_TEXT_ESCAPES)
+                lines.append(f"\\textbf{{{text}}}" if kind == "error" else text)
+            elif kind == "result":
+                lines.append(f"\\[ \\boxed{{{latex_math(line)}}}{suffix} \\]")
+            else:
+                lines.append(f"\\[ {latex_math(line)}{suffix} \\]")
+        return "\n\n".join(lines) + "\n"
@@ -0,0 +1,114 @@
+"""Retaining-wall check wired as one dataflow graph.
+
+Ka feeds Pₐ, Pₐ feeds the sliding FS and the inclination ψ, ψ feeds the
+bearing capacity and q_u together with q_max gives the bearing FS. Each
+quantity is entered once and a change only recomputes what depends on it.
+"""
+import numpy as np
+
+from geotech import formulas
+from geotech.graph import Graph
+
+# Project inputs: name -> label
+WALL_INPUTS = {
+    "alpha": "α, backfill slope (degrees)",
+    "phi1": "φ₁', backfill (degrees)",
+    "gamma1": "γ₁, backfill (kN/m³)",
+    "H": "H, height for Pₐ (m)",
+    "phi2": "φ₂', foundation soil (degrees)",
+    "c2": "c₂', foundation soil (kPa)",
+    "gamma2": "γ₂, foundation soil (kN/m³)",
+    "D": "D, embedment (m)",
+    "sigma_v": "ΣV (kN/m)",
+    "B": "B, base width (m)",
+    "e": "e, eccentricity (m)",
+    "k1": "k₁",
+    "k2": "k₂",
+}
+
+
+def _fs_bearing(qu, q_max):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.divide(qu, q_max)
+
+
+def build_wall_graph(**values):
+    """Graph of the full retaining-wall check, optionally with initial inputs"""
+    graph = Graph()
+    for name in WALL_INPUTS:
+        graph.add_input(name, values.get(name))
+
+    graph.add_node("ka", formulas.coulomb_ka, ("alpha", "phi1"))
+    graph.add_node("pa", formulas.coulomb_pa, ("ka", "gamma1", "H"))
+    graph.add_node("kp", formulas.rankine_kp, ("phi2",))
+    graph.add_node("pp", formulas.rankine_pp, ("kp", "gamma2", "D", "c2"))
+    graph.add_node("fs_sliding", formulas.sliding_fs,
+                   ("sigma_v", "k1", "phi2", "B", "k2", "c2", "pp", "pa", "alpha"))
+    graph.add_node("psi", formulas.resultant_inclination, ("pa", "alpha", "sigma_v"))
+    graph.add_node("base_pressure", formulas.bearing_pressure, ("sigma_v", "B", "e"))
+    graph.add_node("q_max", lambda pressure: pressure[0], ("base_pressure",))
+    graph.add_node("q_min", lambda pressure: pressure[1], ("base_pressure",))
+    graph.add_node("B_prime", lambda B, e: B - 2 * e, ("B", "e"))
+    graph.add_node("q", lambda gamma2, D: gamma2 * D, ("gamma2", "D"))
+    graph.add_node("bearing", lambda phi2, B_prime, c2, gamma2, q, D, psi: formulas.bearing_capacity(
+        phi2, B_prime, c2=c2, gamma2=gamma2, q=q, D=D, psi=psi,
+    ), ("phi2", "B_prime", "c2", "gamma2", "q", "D", "psi"))
+    graph.add_node("qu", lambda bearing: bearing["qu"], ("bearing",))
+    graph.add_node("fs_bearing", _fs_bearing, ("qu", "q_max"))
+    return graph
+
+
+def _format_result(value, fmt):
+    if value is None:
+        return "—"
+    if np.isnan(value):
+        return "invalid"
+    return fmt.format(value) if np.isfinite(value) else "∞"
+
+
+def render_wall_tab():
+    """The "Retaining Wall Check" tab shared by both Streamlit apps"""
+    # Imported here so the CLI and batch runner do not need Streamlit
+    import streamlit as st
+
+    st.header("Retaining Wall Check")
+    st.write("Enter each quantity once. Changing a value only recomputes the results that depend on it.")
+
+    if 'wall_graph' not in st.session_state:
+        st.session_state.wall_graph = build_wall_graph()
+    wall_graph = st.session_state.wall_graph
+
+    wall_inputs = {}
+    input_cols = st.columns(3)
+    for i, (name, label) in enumerate(WALL_INPUTS.items()):
+        with input_cols[i % 3]:
+            wall_inputs[name] = st.number_input(label, value=None, placeholder="Enter value", key=f"wall_{name}", format="%.4f")
+
+    wall_graph.set(**wall_inputs)
+    recomputed = wall_graph.evaluate()
+
+    def wall_result(name, fmt):
+        return _format_result(wall_graph[name], fmt)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.subheader("Earth Pressure")
+        st.metric("Ka", wall_result("ka", "{:.4f}"))
+        st.metric("Pₐ", wall_result("pa", "{:.2f} kN/m"))
+        st.metric("Kp", wall_result("kp", "{:.4f}"))
+        st.metric("Pp", wall_result("pp", "{:.2f} kN/m"))
+    with col2:
+        st.subheader("Sliding")
+        st.metric("FS against sliding", wall_result("fs_sliding", "{:.3f}"))
+        st.metric("ψ", wall_result("psi", "{:.2f}°"))
+    with col3:
+        st.subheader("Bearing")
+        st.metric("q_max", wall_result("q_max", "{:.2f} kPa"))
+        st.metric("q_min", wall_result("q_min", "{:.2f} kPa"))
+        st.metric("q_u", wall_result("qu", "{:.2f} kPa"))
+        st.metric("FS against bearing failure (q_u / q_max)", wall_result("fs_bearing", "{:.3f}"))
+
+    if wall_inputs["e"] is not None and wall_inputs["B"] is not None and wall_inputs["e"] > wall_inputs["B"] / 6:
+        st.error("Eccentricity (e) cannot exceed B/6")
+
+    st.caption(f"Recomputed this run: {', '.join(recomputed)}" if recomputed else "Nothing changed, no results recomputed")
@@ -1,5 +1,12 @@
 import streamlit as st
-import math
+import pandas as pd
+import numpy as np
+import altair as alt
+import io
+import os
+
+from geotech import batch, cache, consolidation, formulas, reliability, sweep
+from geotech.wall import render_wall_tab
 
 st.set_page_config(page_title="Geotech Calculator", layout="wide")
 st.title("RMIT Geotechnical Engineering Calculator")
@@ -15,8 +22,67 @@ def clear_all_inputs():
             del st.session_state[key]
     st.session_state.clear_all = True
 
+@st.cache_data(max_entries=4, show_spinner="Evaluating design cases...")
+def run_bearing_case_table(data, file_name):
+    """Read an uploaded case table and append the bearing capacity results"""
+    if file_name.lower().endswith(".parquet"):
+        cases = pd.read_parquet(io.BytesIO(data))
+    else:
+        cases = pd.read_csv(io.BytesIO(data))
+    missing = batch.missing_columns(cases)
+    if missing:
+        return cases, [f"Missing columns {', '.join(missing)}"]
+    invalid = invalid_case_values(cases)
+    if invalid:
+        return cases, invalid
+    results = pd.DataFrame(batch.run_bearing_cases(cases), index=cases.index)
+    return pd.concat([cases, results], axis=1), []
+
+def invalid_case_values(cases, max_cases=10):
+    """Coerce the input columns to numbers in place, describing each case with a non-numeric value"""
+    bad_columns = pd.Series([[] for _ in range(len(cases))], index=cases.index)
+    for name in batch.BEARING_INPUTS:
+        if name not in cases:
+            continue
+        values = pd.to_numeric(cases[name], errors="coerce")
+        for row in cases.index[values.isna() & cases[name].notna()]:
+            bad_columns[row].append(f"{name} = {cases.at[row, name]!r}")
+        cases[name] = values
+    bad_columns = bad_columns[bad_columns.str.len() > 0]
+    problems = [f"Case {position + 1}: non-numeric {', '.join(columns)}"
+                for position, columns in zip(cases.index.get_indexer(bad_columns.index), bad_columns)]
+    if len(problems) > max_cases:
+        problems[max_cases:] = [f"and {len(problems) - max_cases:,} more cases"]
+    return problems
+
+def sweep_heatmap(x, y, z, x_title, y_title, z_title):
+    """Heatmap of a sweep grid, block-averaged so the chart stays light"""
+    xs, ys, zs = sweep.coarsen(x, y, z)
+    dx = xs[1] - xs[0] if len(xs) > 1 else 1.0
+    dy = ys[1] - ys[0] if len(ys) > 1 else 1.0
+    xx, yy = np.meshgrid(xs, ys)
+    valid = ~np.isnan(zs)  # masked cells are simply not drawn
+    data = pd.DataFrame({
+        "x0": xx[valid] - dx / 2, "x1": xx[valid] + dx / 2,
+        "y0": yy[valid] - dy / 2, "y1": yy[valid] + dy / 2,
+        "x": xx[valid], "y": yy[valid], "z": zs[valid],
+    })
+    return alt.Chart(data).mark_rect().encode(
+        x=alt.X("x0:Q", title=x_title, scale=alt.Scale(zero=False, nice=False)),
+        x2="x1:Q",
+        y=alt.Y("y0:Q", title=y_title, scale=alt.Scale(zero=False, nice=False)),
+        y2="y1:Q",
+        color=alt.Color("z:Q", title=z_title, scale=alt.Scale(scheme="viridis")),
+        tooltip=[alt.Tooltip("x:Q", title=x_title, format=".2f"),
+                 alt.Tooltip("y:Q", title=y_title, format=".2f"),
+                 alt.Tooltip("z:Q", title=z_title, format=".4f")],
+    ).properties(height=450)
+
+# Scalar formula results are memoized in a cache shared by every session
+calc = cache.memoized(formulas)
+
 # Create tabs
-tab1, tab2, tab3, tab4 = st.tabs(["Earth Pressure", "Factor of Safety", "Bearing Capacity", "Consolidation"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["Earth Pressure", "Factor of Safety", "Bearing Capacity", "Consolidation", "Retaining Wall Check"])
 
 with tab1:
     st.header("Earth Pressure Calculations")
@@ -35,7 +101,7 @@ with tab1:
             if phi2_prime is None:
                 st.error("Cannot calculate Kp: Missing φ₂' value")
             else:
-                kp = math.tan(math.radians(45 + phi2_prime/2))**2
+                kp = calc.rankine_kp(phi2_prime)
                 st.success(f"Kp = {kp:.4f}")
                 
                 # Check if we have enough for Pp calculation
@@ -47,7 +113,7 @@ with tab1:
                 if pp_missing:
                     st.warning(f"Cannot calculate Pp: Missing {', '.join(pp_missing)}")
                 else:
-                    pp = 0.5 * kp * gamma2 * D**2 + 2 * c2_prime * D * math.sqrt(kp)
+                    pp = calc.rankine_pp(kp, gamma2, D, c2_prime)
                     st.success(f"Pp = {pp:.2f} kN/m")
     
     with col2:
@@ -63,17 +129,72 @@ with tab1:
             if missing_fields:
                 st.error(f"Cannot calculate Ka: Missing {', '.join(missing_fields)}")
             else:
-                alpha_rad = math.radians(alpha)
-                phi_rad = math.radians(phi_prime)
-                
                 # Check for valid input range
-                if math.cos(alpha_rad)**2 - math.cos(phi_rad)**2 < 0:
+                if not calc.coulomb_ka_valid(alpha, phi_prime):
                     st.error("Invalid input: cos²α must be greater than cos²φ'")
                 else:
-                    numerator = math.cos(alpha_rad) - math.sqrt(math.cos(alpha_rad)**2 - math.cos(phi_rad)**2)
-                    denominator = math.cos(alpha_rad) + math.sqrt(math.cos(alpha_rad)**2 - math.cos(phi_rad)**2)
-                    ka = math.cos(alpha_rad) * (numerator / denominator)
+                    ka = calc.coulomb_ka(alpha, phi_prime)
                     st.success(f"Ka = {ka:.4f}")
+    
+    st.header("Parametric Sweep")
+    sweep_kind = st.radio("Sweep", ["Ka over α and φ'", "Pp over φ₂' and D", "Pp over φ₂' and c₂'"],
+                          horizontal=True, key="sweep_kind")
+    
+    col1, col2 = st.columns(2)
+    
+    if sweep_kind == "Ka over α and φ'":
+        with col1:
+            sweep_alpha = st.slider("α range (degrees)", 0.0, 60.0, (0.0, 30.0), key="sweep_alpha")
+        with col2:
+            sweep_phi = st.slider("φ' range (degrees)", 0.0, 60.0, (20.0, 45.0), key="sweep_phi")
+    else:
+        with col1:
+            sweep_phi2 = st.slider("φ₂' range (degrees)", 0.0, 50.0, (20.0, 40.0), key="sweep_phi2")
+            if sweep_kind == "Pp over φ₂' and D":
+                sweep_second = st.slider("D range (m)", 0.0, 10.0, (0.5, 3.0), key="sweep_D")
+            else:
+                sweep_second = st.slider("c₂' range (kPa)", 0.0, 100.0, (0.0, 30.0), key="sweep_c2")
+        with col2:
+            sweep_gamma2 = st.number_input("γ₂ (kN/m³)", value=None, placeholder="Enter value", key="sweep_gamma2", format="%.4f")
+            if sweep_kind == "Pp over φ₂' and D":
+                sweep_fixed = st.number_input("c₂' (kPa)", value=None, placeholder="Enter value", key="sweep_fixed_c2", format="%.4f")
+            else:
+                sweep_fixed = st.number_input("D (m)", value=None, placeholder="Enter value", key="sweep_fixed_D", format="%.4f")
+    
+    sweep_points = st.select_slider("Grid points per axis", options=[50, 100, 200, 500, 1000], value=200, key="sweep_points")
+    
+    if st.button("Run Sweep", key="calc_sweep"):
+        if sweep_kind == "Ka over α and φ'":
+            alpha_values = np.linspace(*sweep_alpha, sweep_points)
+            phi_values = np.linspace(*sweep_phi, sweep_points)
+            ka_values = sweep.ka_grid(alpha_values, phi_values)
+            
+            st.altair_chart(sweep_heatmap(phi_values, alpha_values, ka_values, "φ' (degrees)", "α (degrees)", "Ka"),
+                            use_container_width=True)
+            masked = np.isnan(ka_values).mean()
+            if masked > 0:
+                st.info(f"{masked:.0%} of the grid is masked where cos²α < cos²φ'")
+        else:
+            missing_fields = []
+            if sweep_gamma2 is None: missing_fields.append("γ₂")
+            if sweep_fixed is None: missing_fields.append("c₂'" if sweep_kind == "Pp over φ₂' and D" else "D")
+            
+            if missing_fields:
+                st.error(f"Cannot run sweep: Missing {', '.join(missing_fields)}")
+            else:
+                phi2_values = np.linspace(*sweep_phi2, sweep_points)
+                second_values = np.linspace(*sweep_second, sweep_points)
+                if sweep_kind == "Pp over φ₂' and D":
+                    pp_values = sweep.sweep_2d(sweep.passive_force, "phi2", phi2_values, "D", second_values,
+                                               gamma2=sweep_gamma2, c2=sweep_fixed)
+                    y_title = "D (m)"
+                else:
+                    pp_values = sweep.sweep_2d(sweep.passive_force, "phi2", phi2_values, "c2", second_values,
+                                               gamma2=sweep_gamma2, D=sweep_fixed)
+                    y_title = "c₂' (kPa)"
+                
+                st.altair_chart(sweep_heatmap(phi2_values, second_values, pp_values, "φ₂' (degrees)", y_title, "Pp (kN/m)"),
+                                use_container_width=True)
 
 with tab2:
     st.header("Factor of Safety Against Sliding")
@@ -108,16 +229,76 @@ with tab2:
         if missing_fields:
             st.error(f"Cannot calculate FS: Missing {', '.join(missing_fields)}")
         else:
-            resisting_force = sigma_v * math.tan(math.radians(k1 * phi2_prime_slide)) + B_slide * k2 * c2_prime_slide + Pp_slide
-            driving_force = Pa_slide * math.cos(math.radians(alpha_slide))
-            
-            if driving_force == 0:
-                fs = float('inf')
-            else:
-                fs = resisting_force / driving_force
-            
+            fs = calc.sliding_fs(sigma_v, k1, phi2_prime_slide, B_slide, k2, c2_prime_slide,
+                                 Pp_slide, Pa_slide, alpha_slide)
             st.success(f"Factor of Safety against Sliding = {fs:.3f}")
     
+    with st.expander("Reliability Analysis (Monte Carlo)"):
+        st.write("Give a distribution for each input to estimate the probability of failure against sliding.")
+        
+        fs_labels = {"sigma_v": "ΣV (kN/m)", "k1": "k₁", "phi2": "φ₂' (degrees)", "B": "B (m)", "k2": "k₂",
+                     "c2": "c₂' (kPa)", "Pp": "Pp (kN/m)", "Pa": "Pₐ (kN/m)", "alpha": "α (degrees)"}
+        fs_specs = {}
+        mc_missing = []
+        mc_invalid = []
+        for name in reliability.FS_INPUTS:
+            col_kind, col_params = st.columns([1, 3])
+            with col_kind:
+                kind = st.selectbox(fs_labels[name], list(reliability.DISTRIBUTIONS), key=f"mc_kind_{name}")
+            param_cols = col_params.columns(3)
+            params = []
+            for param_col, param in zip(param_cols, reliability.DISTRIBUTIONS[kind]):
+                with param_col:
+                    params.append(st.number_input(param, value=None, placeholder="Enter value",
+                                                  key=f"mc_{name}_{param}", format="%.4f"))
+            if None in params:
+                mc_missing.append(fs_labels[name].split(" ")[0])
+            else:
+                try:
+                    fs_specs[name] = reliability.normalize_spec((kind, *params))
+                except ValueError as exc:
+                    mc_invalid.append(f"{fs_labels[name].split(' ')[0]}: {exc}")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            mc_samples = st.select_slider("Samples", options=[10_000, 100_000, 1_000_000, 10_000_000],
+                                          value=1_000_000, format_func=lambda n: f"{n:,}", key="mc_samples")
+        with col2:
+            mc_target = st.number_input("Failure when FS <", value=1.0, key="mc_target", format="%.2f")
+        with col3:
+            mc_workers = st.number_input("Worker processes", min_value=1, max_value=os.cpu_count() or 1,
+                                         value=1, key="mc_workers")
+        
+        if st.button("Run Simulation", key="calc_mc"):
+            if mc_missing:
+                st.error(f"Cannot run simulation: Missing {', '.join(mc_missing)}")
+            elif mc_invalid:
+                st.error(f"Cannot run simulation: {'; '.join(mc_invalid)}")
+            else:
+                mc = reliability.simulate_sliding_fs(fs_specs, n_samples=mc_samples, workers=int(mc_workers),
+                                                     threshold=mc_target)
+                st.success(f"Probability of failure (FS < {mc_target:.2f}) = {mc['probability_of_failure']:.4%}")
+                
+                pct_cols = st.columns(len(mc["percentiles"]) + 1)
+                pct_cols[0].metric("Mean FS", f"{mc['mean']:.3f}")
+                for pct_col, (p, value) in zip(pct_cols[1:], mc["percentiles"].items()):
+                    pct_col.metric(f"FS {p}th percentile", f"{value:.3f}" if np.isfinite(value) else "> 10")
+                
+                # Merge the fine histogram into 100 bars for display
+                counts = mc["counts"].reshape(100, -1).sum(axis=1)
+                edges = mc["edges"][::len(mc["counts"]) // 100]
+                hist = pd.DataFrame({"FS": edges[:-1], "FS_end": edges[1:], "Samples": counts})
+                chart = alt.Chart(hist).mark_bar().encode(
+                    x=alt.X("FS:Q", title="Factor of Safety"),
+                    x2="FS_end:Q",
+                    y=alt.Y("Samples:Q"),
+                    color=alt.condition(alt.datum.FS < mc_target, alt.value("#d62728"), alt.value("#1f77b4")),
+                ).properties(height=300)
+                st.altair_chart(chart, use_container_width=True)
+                
+                if mc["n_valid"] < mc["n_samples"]:
+                    st.warning(f"{mc['n_samples'] - mc['n_valid']:,} samples gave an undefined FS and were ignored")
+    
     st.header("Bearing Pressure Distribution")
     sigma_v_bp = st.number_input("ΣV (kN/m)", value=None, placeholder="Enter value", key="sv_bp", format="%.4f")
     B_bp = st.number_input("B (m)", value=None, placeholder="Enter value", key="B_bp", format="%.4f")
@@ -133,11 +314,10 @@ with tab2:
             st.error(f"Cannot calculate bearing pressure: Missing {', '.join(missing_fields)}")
         else:
             # Check for eccentricity limit
-            if e_bp > B_bp/6:
+            if not calc.eccentricity_ok(B_bp, e_bp):
                 st.error("Eccentricity (e) cannot exceed B/6")
             else:
-                q_max = (sigma_v_bp / B_bp) * (1 + (6 * e_bp) / B_bp)
-                q_min = (sigma_v_bp / B_bp) * (1 - (6 * e_bp) / B_bp)
+                q_max, q_min = calc.bearing_pressure(sigma_v_bp, B_bp, e_bp)
                 st.success(f"q_max = {q_max:.2f} kPa")
                 st.success(f"q_min = {q_min:.2f} kPa")
 
@@ -165,27 +345,13 @@ with tab3:
         if missing_fields:
             st.error(f"Cannot calculate bearing capacity: Missing {', '.join(missing_fields)}")
         else:
-            # Bearing capacity factors
-            Nq = math.exp(math.pi * math.tan(math.radians(phi2_prime_bc))) * (math.tan(math.radians(45 + phi2_prime_bc/2))**2)
-            Nc = (Nq - 1) * (1 / math.tan(math.radians(phi2_prime_bc))) if phi2_prime_bc > 0 else 5.14
-            Ng = 2 * (Nq + 1) * math.tan(math.radians(phi2_prime_bc))
-            
-            # Depth factors
-            Fqd = 1 + 2 * math.tan(math.radians(phi2_prime_bc)) * (1 - math.sin(math.radians(phi2_prime_bc)))**2 * (D_bc/B_prime_bc if D_bc is not None else 0)
-            Fcd = Fqd - (1 - Fqd) / (Nc * math.tan(math.radians(phi2_prime_bc))) if phi2_prime_bc > 0 else 1
-            Fyd = 1  # Common simplification
-            
-            # Inclination factors
-            Fci = Fqi = (1 - (psi_bc/90 if psi_bc is not None else 0))**2
-            Fyi = (1 - (psi_bc/phi2_prime_bc if psi_bc is not None and phi2_prime_bc > 0 else 0))**2 if phi2_prime_bc > 0 else 1
-            
-            # Calculate each component separately
-            component1 = (c2_prime_bc * Nc * Fcd * Fci) if c2_prime_bc is not None else 0
-            component2 = (q_bc * Nq * Fqd * Fqi) if q_bc is not None else 0
-            component3 = (0.5 * gamma2_bc * B_prime_bc * Ng * Fyd * Fyi) if gamma2_bc is not None else 0
-            
-            # Ultimate bearing capacity
-            qu = component1 + component2 + component3
+            # Missing optional inputs drop their term (c₂', q, γ₂) or leave their factors at 1 (D, ψ)
+            bc = calc.bearing_capacity(
+                phi2_prime_bc, B_prime_bc,
+                c2=c2_prime_bc or 0, gamma2=gamma2_bc or 0, q=q_bc or 0,
+                D=D_bc or 0, psi=psi_bc or 0,
+            )
+            qu = bc["qu"]
             
             st.success(f"q_u = {qu:.2f} kPa")
             
@@ -196,7 +362,30 @@ with tab3:
             if gamma2_bc is not None: components_used.append("soil weight")
             
             st.info(f"Calculation includes: {', '.join(components_used) if components_used else 'no components (all inputs missing)'}")
-            st.info(f"Nc = {Nc:.2f}, Nq = {Nq:.2f}, Nγ = {Ng:.2f}")
+            st.info(f"Nc = {bc['Nc']:.2f}, Nq = {bc['Nq']:.2f}, Nγ = {bc['Ng']:.2f}")
+    
+    with st.expander("Batch Mode: upload a table of design cases"):
+        st.write("One row per case. Columns `phi2` and `B_prime` are required; "
+                 "`c2`, `gamma2`, `q`, `D` and `psi` are optional and an empty cell counts as not provided.")
+        cases_file = st.file_uploader("Case table", type=["csv", "parquet"], key="bc_cases")
+        
+        if cases_file is not None:
+            results, problems = run_bearing_case_table(cases_file.getvalue(), cases_file.name)
+            
+            if problems:
+                st.error(f"Cannot run cases: {'; '.join(problems)}")
+            else:
+                st.success(f"Evaluated {len(results):,} cases")
+                st.dataframe(results.head(100), use_container_width=True)
+                
+                out_format = st.radio("Download format", ["CSV", "Parquet"], horizontal=True, key="bc_out_format")
+                if out_format == "CSV":
+                    st.download_button("Download results", data=lambda: results.to_csv(index=False),
+                                       file_name="bearing_capacity_results.csv", mime="text/csv")
+                else:
+                    st.download_button("Download results", data=lambda: results.to_parquet(index=False),
+                                       file_name="bearing_capacity_results.parquet",
+                                       mime="application/vnd.apache.parquet")
     
     st.header("Resultant Force Inclination")
     Pa_psi = st.number_input("Pₐ (kN/m)", value=None, placeholder="Enter value", key="Pa_psi", format="%.4f")
@@ -212,12 +401,7 @@ with tab3:
         if missing_fields:
             st.error(f"Cannot calculate ψ: Missing {', '.join(missing_fields)}")
         else:
-            if sigma_v_psi == 0:
-                psi = 90
-            else:
-                psi_rad = math.atan((Pa_psi * math.cos(math.radians(alpha_psi))) / sigma_v_psi)
-                psi = math.degrees(psi_rad)
-            
+            psi = calc.resultant_inclination(Pa_psi, alpha_psi, sigma_v_psi)
             st.success(f"ψ = {psi:.2f} degrees")
 
 with tab4:
@@ -247,7 +431,7 @@ with tab4:
         if missing_fields:
             st.error(f"Cannot calculate settlement: Missing {', '.join(missing_fields)}")
         else:
-            settlement = (Cc * Hc / (1 + e0)) * math.log10((sigma0_prime + dsigma_p_prime + dsigma_f_prime) / sigma0_prime)
+            settlement = calc.consolidation_settlement(Cc, Hc, e0, sigma0_prime, dsigma_p_prime, dsigma_f_prime)
             st.success(f"S_c(p+f) = {settlement:.4f} m")
     
     st.header("Time Factor Calculation")
@@ -264,15 +448,78 @@ with tab4:
         if missing_fields:
             st.error(f"Cannot calculate time: Missing {', '.join(missing_fields)}")
         else:
-            H_drainage = H_tv / 2
-            time = (Tv * H_drainage**2) / Cv
+            time = calc.consolidation_time(Tv, H_tv, Cv)
             st.success(f"t = {time:.2f} years")
+    
+    st.header("Time–Settlement Curve")
+    st.write("One row per clay layer; each layer is drained top and bottom.")
+    layer_columns = {
+        "C_c": "Cc", "H_c (m)": "Hc", "e₀": "e0", "σ₀' (kPa)": "sigma0",
+        "Δσ₍ₚ₎' (kPa)": "dsigma_p", "Δσ₍f₎' (kPa)": "dsigma_f", "C_v (m²/year)": "Cv",
+    }
+    layers = st.data_editor(pd.DataFrame(columns=list(layer_columns), dtype=float, index=[0]),
+                            num_rows="dynamic", use_container_width=True, key="layers")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        t_max = st.number_input("Time span (years)", value=None, placeholder="Enter value", key="t_max", format="%.4f")
+    with col2:
+        n_steps = st.select_slider("Time steps", options=[100, 1000, 5000, 10000], value=1000, key="n_steps")
+    
+    if st.button("Plot Settlement Curve", key="calc_curve"):
+        layers = layers.dropna(how="all")
+        if t_max is None:
+            st.error("Cannot plot settlement curve: Missing time span")
+        elif layers.empty or layers.isna().any().any():
+            st.error("Cannot plot settlement curve: Fill in every property for each layer")
+        else:
+            layer_props = {arg: layers[column].to_numpy(dtype=float) for column, arg in layer_columns.items()}
+            t = np.linspace(0, t_max, n_steps)
+            total, per_layer = consolidation.settlement_curve(t, **layer_props)
+            
+            curve = pd.DataFrame({"Time (years)": t, "Settlement (m)": total, "Layer": "Total"})
+            if len(layers) > 1:
+                curve = pd.concat([curve] + [
+                    pd.DataFrame({"Time (years)": t, "Settlement (m)": s, "Layer": f"Layer {i + 1}"})
+                    for i, s in enumerate(per_layer)
+                ])
+            chart = alt.Chart(curve).mark_line().encode(
+                x="Time (years):Q",
+                y=alt.Y("Settlement (m):Q", scale=alt.Scale(reverse=True)),
+                color="Layer:N",
+            ).properties(height=350)
+            st.altair_chart(chart, use_container_width=True)
+            
+            ultimate = formulas.consolidation_settlement(layer_props["Cc"], layer_props["Hc"], layer_props["e0"],
+                                                         layer_props["sigma0"], layer_props["dsigma_p"],
+                                                         layer_props["dsigma_f"])
+            st.success(f"Settlement after {t_max:g} years = {total[-1]:.4f} m of {ultimate.sum():.4f} m ultimate")
+            
+            t50 = formulas.consolidation_time(consolidation.TV_50, layer_props["Hc"], layer_props["Cv"])
+            t90 = formulas.consolidation_time(consolidation.TV_90, layer_props["Hc"], layer_props["Cv"])
+            st.dataframe(pd.DataFrame({
+                "Layer": [f"Layer {i + 1}" for i in range(len(layers))],
+                "S_c (m)": ultimate,
+                "t₅₀ (years)": t50,
+                "t₉₀ (years)": t90,
+            }), hide_index=True)
+
+with tab5:
+    render_wall_tab()
 
 # Clear all button
 if st.sidebar.button("Clear All Data"):
     clear_all_inputs()
     st.rerun()
 
+cache_stats = cache.stats()
+st.sidebar.subheader("Calculation Cache")
+col1, col2 = st.sidebar.columns(2)
+col1.metric("Hits", f"{cache_stats['hits']:,}")
+col2.metric("Misses", f"{cache_stats['misses']:,}")
+st.sidebar.caption(f"Hit rate {cache_stats['hit_rate']:.0%} · {cache_stats['size']:,}/{cache_stats['maxsize']:,} entries · "
+                   f"{cache_stats['evictions']:,} evictions (shared by all sessions)")
+
 st.sidebar.info("""
 **Geotech Calculator**  
 Created for RMIT Geotechnical Engineering 3  
@@ -1,5 +1,7 @@
 import streamlit as st
-import math
+
+from geotech import derivations
+from geotech.wall import render_wall_tab
 
 st.set_page_config(page_title="Geotech Calculator", layout="wide")
 st.title("RMIT Geotechnical Engineering Calculator")
@@ -15,8 +17,34 @@ def clear_all_inputs():
             del st.session_state[key]
     st.session_state.clear_all = True
 
+# Derivations are kept in session state because opening a breakdown reruns the
+# script; their steps are only formatted and sent while the breakdown is open
+if 'derivations' not in st.session_state:
+    st.session_state.derivations = {}
+
+def show_derivation(name):
+    """Show a stored result with a breakdown rendered only when opened"""
+    derivation = st.session_state.derivations.get(name)
+    if derivation is None:
+        return
+    if derivation.error:
+        st.error(derivation.error)
+    for line in derivation.results():
+        st.success(line)
+    breakdown = st.expander(f"Calculation Breakdown for {derivation.title}", key=f"breakdown_{name}", on_change="rerun")
+    if breakdown.open:
+        with breakdown:
+            markdown = derivation.to_markdown()
+            st.markdown(markdown)
+            col1, col2 = st.columns(2)
+            col1.download_button("Download Markdown", markdown, file_name=f"{name}.md",
+                                 mime="text/markdown", key=f"download_md_{name}")
+            # LaTeX is only generated when the button is clicked
+            col2.download_button("Download LaTeX", derivation.to_latex, file_name=f"{name}.tex",
+                                 mime="application/x-tex", key=f"download_tex_{name}")
+
 # Create tabs
-tab1, tab2, tab3, tab4 = st.tabs(["Earth Pressure", "Factor of Safety", "Bearing Capacity", "Consolidation"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["Earth Pressure", "Factor of Safety", "Bearing Capacity", "Consolidation", "Retaining Wall Check"])
 
 with tab1:
     st.header("Earth Pressure Calculations")
@@ -33,16 +61,11 @@ with tab1:
         if st.button("Calculate Kp and Pp", key="calc_kp_pp"):
             # Check if we have enough for Kp calculation
             if phi2_prime is None:
+                st.session_state.derivations.pop("kp", None)
+                st.session_state.derivations.pop("pp", None)
                 st.error("Cannot calculate Kp: Missing φ₂' value")
             else:
-                with st.expander("Calculation Breakdown for Kp", expanded=True):
-                    st.write("**Formula:** Kp = tan²(45° + φ₂'/2)")
-                    st.write(f"Kp = tan²(45° + {phi2_prime}/2)")
-                    st.write(f"Kp = tan²(45° + {phi2_prime/2:.1f}°)")
-                    st.write(f"Kp = tan²({45 + phi2_prime/2:.1f}°)")
-                    kp = math.tan(math.radians(45 + phi2_prime/2))**2
-                    st.write(f"Kp = {math.tan(math.radians(45 + phi2_prime/2)):.4f}²")
-                    st.write(f"**Kp = {kp:.4f}**")
+                kp, st.session_state.derivations["kp"] = derivations.kp(phi2_prime)
                 
                 # Check if we have enough for Pp calculation
                 pp_missing = []
@@ -51,17 +74,13 @@ with tab1:
                 if c2_prime is None: pp_missing.append("c₂'")
                 
                 if pp_missing:
+                    st.session_state.derivations.pop("pp", None)
                     st.warning(f"Cannot calculate Pp: Missing {', '.join(pp_missing)}")
                 else:
-                    with st.expander("Calculation Breakdown for Pp", expanded=True):
-                        st.write("**Formula:** Pp = ½ × Kp × γ₂ × D² + 2 × c₂' × D × √Kp")
-                        st.write(f"Pp = ½ × {kp:.4f} × {gamma2} × {D}² + 2 × {c2_prime} × {D} × √{kp:.4f}")
-                        st.write(f"Pp = ½ × {kp:.4f} × {gamma2} × {D**2:.2f} + 2 × {c2_prime} × {D} × {math.sqrt(kp):.4f}")
-                        term1 = 0.5 * kp * gamma2 * D**2
-                        term2 = 2 * c2_prime * D * math.sqrt(kp)
-                        st.write(f"Pp = {term1:.2f} + {term2:.2f}")
-                        pp = term1 + term2
-                        st.write(f"**Pp = {pp:.2f} kN/m**")
+                    st.session_state.derivations["pp"] = derivations.pp(kp, gamma2, D, c2_prime)[1]
+        
+        show_derivation("kp")
+        show_derivation("pp")
     
     with col2:
         st.subheader("Coulomb's Active Earth Pressure")
@@ -74,40 +93,12 @@ with tab1:
             if phi_prime is None: missing_fields.append("φ'")
             
             if missing_fields:
+                st.session_state.derivations.pop("ka", None)
                 st.error(f"Cannot calculate Ka: Missing {', '.join(missing_fields)}")
             else:
-                with st.expander("Calculation Breakdown for Ka", expanded=True):
-                    st.write("**Formula:** Ka = cosα × [cosα - √(cos²α - cos²φ')] / [cosα + √(cos²α - cos²φ')]")
-                    
-                    alpha_rad = math.radians(alpha)
-                    phi_rad = math.radians(phi_prime)
-                    
-                    cos_alpha = math.cos(alpha_rad)
-                    cos_phi = math.cos(phi_rad)
-                    cos_alpha_sq = cos_alpha**2
-                    cos_phi_sq = cos_phi**2
-                    
-                    st.write(f"cosα = cos({alpha}°) = {cos_alpha:.4f}")
-                    st.write(f"cosφ' = cos({phi_prime}°) = {cos_phi:.4f}")
-                    st.write(f"cos²α = {cos_alpha_sq:.4f}")
-                    st.write(f"cos²φ' = {cos_phi_sq:.4f}")
-                    
-                    # Check for valid input range
-                    if cos_alpha_sq - cos_phi_sq < 0:
-                        st.error("Invalid input: cos²α must be greater than cos²φ'")
-                    else:
-                        sqrt_term = math.sqrt(cos_alpha_sq - cos_phi_sq)
-                        st.write(f"√(cos²α - cos²φ') = √({cos_alpha_sq:.4f} - {cos_phi_sq:.4f}) = √{cos_alpha_sq - cos_phi_sq:.4f} = {sqrt_term:.4f}")
-                        
-                        numerator = cos_alpha - sqrt_term
-                        denominator = cos_alpha + sqrt_term
-                        st.write(f"Numerator = {cos_alpha:.4f} - {sqrt_term:.4f} = {numerator:.4f}")
-                        st.write(f"Denominator = {cos_alpha:.4f} + {sqrt_term:.4f} = {denominator:.4f}")
-                        
-                        ka = cos_alpha * (numerator / denominator)
-                        st.write(f"Ka = {cos_alpha:.4f} × ({numerator:.4f} / {denominator:.4f})")
-                        st.write(f"Ka = {cos_alpha:.4f} × {numerator/denominator:.4f}")
-                        st.write(f"**Ka = {ka:.4f}**")
+                st.session_state.derivations["ka"] = derivations.ka(alpha, phi_prime)[1]
+        
+        show_derivation("ka")
 
 with tab2:
     st.header("Factor of Safety Against Sliding")
@@ -140,37 +131,14 @@ with tab2:
         if alpha_slide is None: missing_fields.append("α")
         
         if missing_fields:
+            st.session_state.derivations.pop("fs", None)
             st.error(f"Cannot calculate FS: Missing {', '.join(missing_fields)}")
         else:
-            with st.expander("Calculation Breakdown for FS", expanded=True):
-                st.write("**Formula:** FS = [ΣV × tan(k₁ × φ₂') + B × k₂ × c₂' + Pp] / [Pₐ × cosα]")
-                
-                # Calculate resisting force components
-                tan_component = sigma_v * math.tan(math.radians(k1 * phi2_prime_slide))
-                cohesion_component = B_slide * k2 * c2_prime_slide
-                resisting_force = tan_component + cohesion_component + Pp_slide
-                
-                st.write("**Resisting Force Components:**")
-                st.write(f"ΣV × tan(k₁ × φ₂') = {sigma_v} × tan({k1} × {phi2_prime_slide}°)")
-                st.write(f"= {sigma_v} × tan({k1 * phi2_prime_slide:.1f}°)")
-                st.write(f"= {sigma_v} × {math.tan(math.radians(k1 * phi2_prime_slide)):.4f} = {tan_component:.2f} kN/m")
-                
-                st.write(f"B × k₂ × c₂' = {B_slide} × {k2} × {c2_prime_slide} = {cohesion_component:.2f} kN/m")
-                st.write(f"Pp = {Pp_slide} kN/m")
-                st.write(f"**Total Resisting Force = {tan_component:.2f} + {cohesion_component:.2f} + {Pp_slide} = {resisting_force:.2f} kN/m**")
-                
-                # Calculate driving force
-                driving_force = Pa_slide * math.cos(math.radians(alpha_slide))
-                st.write("**Driving Force:**")
-                st.write(f"Pₐ × cosα = {Pa_slide} × cos({alpha_slide}°)")
-                st.write(f"= {Pa_slide} × {math.cos(math.radians(alpha_slide)):.4f} = {driving_force:.2f} kN/m")
-                
-                if driving_force == 0:
-                    fs = float('inf')
-                    st.write("**FS = ∞ (driving force is zero)**")
-                else:
-                    fs = resisting_force / driving_force
-                    st.write(f"**FS = {resisting_force:.2f} / {driving_force:.2f} = {fs:.3f}**")
+            st.session_state.derivations["fs"] = derivations.sliding_fs(
+                sigma_v, k1, phi2_prime_slide, B_slide, k2, c2_prime_slide, Pp_slide, Pa_slide, alpha_slide,
+            )[1]
+    
+    show_derivation("fs")
     
     st.header("Bearing Pressure Distribution")
     sigma_v_bp = st.number_input("ΣV (kN/m)", value=None, placeholder="Enter value", key="sv_bp", format="%.4f")
@@ -184,30 +152,12 @@ with tab2:
         if e_bp is None: missing_fields.append("e")
         
         if missing_fields:
+            st.session_state.derivations.pop("bearing_pressure", None)
             st.error(f"Cannot calculate bearing pressure: Missing {', '.join(missing_fields)}")
         else:
-            with st.expander("Calculation Breakdown", expanded=True):
-                # Check for eccentricity limit
-                if e_bp > B_bp/6:
-                    st.error("Eccentricity (e) cannot exceed B/6")
-                else:
-                    st.write("**Formulas:**")
-                    st.write("q_max = (ΣV/B) × (1 + 6e/B)")
-                    st.write("q_min = (ΣV/B) × (1 - 6e/B)")
-                    
-                    base_pressure = sigma_v_bp / B_bp
-                    st.write(f"ΣV/B = {sigma_v_bp} / {B_bp} = {base_pressure:.2f} kPa")
-                    
-                    eccentricity_factor_max = 1 + (6 * e_bp) / B_bp
-                    eccentricity_factor_min = 1 - (6 * e_bp) / B_bp
-                    st.write(f"1 + 6e/B = 1 + 6×{e_bp}/{B_bp} = 1 + {6*e_bp/B_bp:.2f} = {eccentricity_factor_max:.2f}")
-                    st.write(f"1 - 6e/B = 1 - 6×{e_bp}/{B_bp} = 1 - {6*e_bp/B_bp:.2f} = {eccentricity_factor_min:.2f}")
-                    
-                    q_max = base_pressure * eccentricity_factor_max
-                    q_min = base_pressure * eccentricity_factor_min
-                    
-                    st.write(f"**q_max = {base_pressure:.2f} × {eccentricity_factor_max:.2f} = {q_max:.2f} kPa**")
-                    st.write(f"**q_min = {base_pressure:.2f} × {eccentricity_factor_min:.2f} = {q_min:.2f} kPa**")
+            st.session_state.derivations["bearing_pressure"] = derivations.bearing_pressure(sigma_v_bp, B_bp, e_bp)[1]
+    
+    show_derivation("bearing_pressure")
 
 with tab3:
     st.header("General Bearing Capacity Equation")
@@ -231,95 +181,14 @@ with tab3:
         if B_prime_bc is None: missing_fields.append("B'")
         
         if missing_fields:
+            st.session_state.derivations.pop("bearing_capacity", None)
             st.error(f"Cannot calculate bearing capacity: Missing {', '.join(missing_fields)}")
         else:
-            with st.expander("Calculation Breakdown", expanded=True):
-                st.write("**Formula:** q_u = c₂' × Nc × Fcd × Fci + q × Nq × Fqd × Fqi + ½ × γ₂ × B' × Nγ × Fγd × Fγi")
-                
-                # Bearing capacity factors
-                st.write("**Bearing Capacity Factors:**")
-                Nq = math.exp(math.pi * math.tan(math.radians(phi2_prime_bc))) * (math.tan(math.radians(45 + phi2_prime_bc/2))**2)
-                st.write(f"Nq = exp(π × tanφ₂') × tan²(45° + φ₂'/2)")
-                st.write(f"Nq = exp({math.pi:.3f} × tan{phi2_prime_bc}°) × tan²(45° + {phi2_prime_bc/2:.1f}°)")
-                st.write(f"Nq = exp({math.pi:.3f} × {math.tan(math.radians(phi2_prime_bc)):.4f}) × tan²({45 + phi2_prime_bc/2:.1f}°)")
-                st.write(f"Nq = {math.exp(math.pi * math.tan(math.radians(phi2_prime_bc))):.3f} × {math.tan(math.radians(45 + phi2_prime_bc/2))**2:.3f} = {Nq:.3f}")
-                
-                if phi2_prime_bc > 0:
-                    Nc = (Nq - 1) * (1 / math.tan(math.radians(phi2_prime_bc)))
-                    st.write(f"Nc = (Nq - 1) × cotφ₂' = ({Nq:.3f} - 1) × cot{phi2_prime_bc}° = {Nc:.3f}")
-                else:
-                    Nc = 5.14
-                    st.write(f"Nc = 5.14 (for φ₂' = 0°)")
-                
-                Ng = 2 * (Nq + 1) * math.tan(math.radians(phi2_prime_bc))
-                st.write(f"Nγ = 2 × (Nq + 1) × tanφ₂' = 2 × ({Nq:.3f} + 1) × tan{phi2_prime_bc}° = {Ng:.3f}")
-                
-                # Depth factors
-                st.write("**Depth Factors:**")
-                if D_bc is not None:
-                    Fqd = 1 + 2 * math.tan(math.radians(phi2_prime_bc)) * (1 - math.sin(math.radians(phi2_prime_bc)))**2 * (D_bc / B_prime_bc)
-                    st.write(f"Fqd = 1 + 2 × tanφ₂' × (1 - sinφ₂')² × (D/B')")
-                    st.write(f"Fqd = 1 + 2 × tan{phi2_prime_bc}° × (1 - sin{phi2_prime_bc}°)² × ({D_bc}/{B_prime_bc})")
-                    st.write(f"Fqd = 1 + 2 × {math.tan(math.radians(phi2_prime_bc)):.4f} × {((1 - math.sin(math.radians(phi2_prime_bc)))**2):.4f} × {D_bc/B_prime_bc:.3f} = {Fqd:.3f}")
-                else:
-                    Fqd = 1
-                    st.write("Fqd = 1 (D not provided)")
-                
-                if phi2_prime_bc > 0:
-                    Fcd = Fqd - (1 - Fqd) / (Nc * math.tan(math.radians(phi2_prime_bc)))
-                    st.write(f"Fcd = Fqd - (1 - Fqd)/(Nc × tanφ₂') = {Fqd:.3f} - (1 - {Fqd:.3f})/({Nc:.3f} × tan{phi2_prime_bc}°) = {Fcd:.3f}")
-                else:
-                    Fcd = 1
-                
-                Fyd = 1
-                st.write("Fγd = 1 (common simplification)")
-                
-                # Inclination factors
-                st.write("**Inclination Factors:**")
-                if psi_bc is not None:
-                    Fci = Fqi = (1 - psi_bc / 90)**2
-                    st.write(f"Fci = Fqi = (1 - ψ/90)² = (1 - {psi_bc}/90)² = {Fci:.3f}")
-                    
-                    if phi2_prime_bc > 0:
-                        Fyi = (1 - psi_bc / phi2_prime_bc)**2
-                        st.write(f"Fγi = (1 - ψ/φ₂')² = (1 - {psi_bc}/{phi2_prime_bc})² = {Fyi:.3f}")
-                    else:
-                        Fyi = 1
-                        st.write("Fγi = 1 (φ₂' = 0°)")
-                else:
-                    Fci = Fqi = Fyi = 1
-                    st.write("Fci = Fqi = Fγi = 1 (ψ not provided)")
-                
-                # Ultimate bearing capacity
-                st.write("**Ultimate Bearing Capacity:**")
-                components = []
-                
-                if c2_prime_bc is not None:
-                    component1 = c2_prime_bc * Nc * Fcd * Fci
-                    st.write(f"Cohesion term = c₂' × Nc × Fcd × Fci = {c2_prime_bc} × {Nc:.3f} × {Fcd:.3f} × {Fci:.3f} = {component1:.2f} kPa")
-                    components.append(component1)
-                else:
-                    component1 = 0
-                    st.write("Cohesion term = 0 (c₂' not provided)")
-                
-                if q_bc is not None:
-                    component2 = q_bc * Nq * Fqd * Fqi
-                    st.write(f"Surcharge term = q × Nq × Fqd × Fqi = {q_bc} × {Nq:.3f} × {Fqd:.3f} × {Fqi:.3f} = {component2:.2f} kPa")
-                    components.append(component2)
-                else:
-                    component2 = 0
-                    st.write("Surcharge term = 0 (q not provided)")
-                
-                if gamma2_bc is not None:
-                    component3 = 0.5 * gamma2_bc * B_prime_bc * Ng * Fyd * Fyi
-                    st.write(f"Soil weight term = ½ × γ₂ × B' × Nγ × Fγd × Fγi = 0.5 × {gamma2_bc} × {B_prime_bc} × {Ng:.3f} × {Fyd} × {Fyi:.3f} = {component3:.2f} kPa")
-                    components.append(component3)
-                else:
-                    component3 = 0
-                    st.write("Soil weight term = 0 (γ₂ not provided)")
-                
-                qu = sum(components)
-                st.write(f"**q_u = {component1:.2f} + {component2:.2f} + {component3:.2f} = {qu:.2f} kPa**")
+            st.session_state.derivations["bearing_capacity"] = derivations.bearing_capacity(
+                phi2_prime_bc, B_prime_bc, c2=c2_prime_bc, gamma2=gamma2_bc, q=q_bc, D=D_bc, psi=psi_bc,
+            )[1]
+    
+    show_derivation("bearing_capacity")
     
     st.header("Resultant Force Inclination")
     Pa_psi = st.number_input("Pₐ (kN/m)", value=None, placeholder="Enter value", key="Pa_psi", format="%.4f")
@@ -333,26 +202,12 @@ with tab3:
         if sigma_v_psi is None: missing_fields.append("ΣV")
         
         if missing_fields:
+            st.session_state.derivations.pop("psi", None)
             st.error(f"Cannot calculate ψ: Missing {', '.join(missing_fields)}")
         else:
-            with st.expander("Calculation Breakdown", expanded=True):
-                st.write("**Formula:** ψ = arctan[(Pₐ × cosα) / ΣV]")
-                st.write(f"ψ = arctan[({Pa_psi} × cos{alpha_psi}°) / {sigma_v_psi}]")
-                
-                horizontal_component = Pa_psi * math.cos(math.radians(alpha_psi))
-                st.write(f"Horizontal component = Pₐ × cosα = {Pa_psi} × cos{alpha_psi}°")
-                st.write(f"= {Pa_psi} × {math.cos(math.radians(alpha_psi)):.4f} = {horizontal_component:.2f} kN/m")
-                
-                if sigma_v_psi == 0:
-                    psi = 90
-                    st.write("**ψ = 90° (ΣV = 0, resultant is purely horizontal)**")
-                else:
-                    tan_psi = horizontal_component / sigma_v_psi
-                    st.write(f"tanψ = {horizontal_component:.2f} / {sigma_v_psi} = {tan_psi:.4f}")
-                    psi_rad = math.atan(tan_psi)
-                    psi = math.degrees(psi_rad)
-                    st.write(f"ψ = arctan({tan_psi:.4f}) = {psi:.2f}°")
-                    st.write(f"**ψ = {psi:.2f} degrees**")
+            st.session_state.derivations["psi"] = derivations.resultant_inclination(Pa_psi, alpha_psi, sigma_v_psi)[1]
+    
+    show_derivation("psi")
 
 with tab4:
     st.header("Consolidation Settlement")
@@ -379,27 +234,14 @@ with tab4:
         if dsigma_f_prime is None: missing_fields.append("Δσ₍f₎'")
         
         if missing_fields:
+            st.session_state.derivations.pop("settlement", None)
             st.error(f"Cannot calculate settlement: Missing {', '.join(missing_fields)}")
         else:
-            with st.expander("Calculation Breakdown", expanded=True):
-                st.write("**Formula:** S_c(p+f) = [C_c × H_c / (1 + e₀)] × log₁₀[(σ₀' + Δσ₍ₚ₎' + Δσ₍f₎') / σ₀']")
-                
-                st.write(f"S_c(p+f) = [{Cc} × {Hc} / (1 + {e0})] × log₁₀[({sigma0_prime} + {dsigma_p_prime} + {dsigma_f_prime}) / {sigma0_prime}]")
-                
-                term1 = Cc * Hc / (1 + e0)
-                st.write(f"Term 1 = C_c × H_c / (1 + e₀) = {Cc} × {Hc} / {1 + e0} = {term1:.4f} m")
-                
-                total_sigma = sigma0_prime + dsigma_p_prime + dsigma_f_prime
-                st.write(f"Total stress = σ₀' + Δσ₍ₚ₎' + Δσ₍f₎' = {sigma0_prime} + {dsigma_p_prime} + {dsigma_f_prime} = {total_sigma} kPa")
-                
-                stress_ratio = total_sigma / sigma0_prime
-                st.write(f"Stress ratio = {total_sigma} / {sigma0_prime} = {stress_ratio:.4f}")
-                
-                log_term = math.log10(stress_ratio)
-                st.write(f"log₁₀({stress_ratio:.4f}) = {log_term:.4f}")
-                
-                settlement = term1 * log_term
-                st.write(f"**S_c(p+f) = {term1:.4f} × {log_term:.4f} = {settlement:.4f} m**")
+            st.session_state.derivations["settlement"] = derivations.consolidation_settlement(
+                Cc, Hc, e0, sigma0_prime, dsigma_p_prime, dsigma_f_prime,
+            )[1]
+    
+    show_derivation("settlement")
     
     st.header("Time Factor Calculation")
     Tv = st.number_input("T_v", value=None, placeholder="Enter value", key="Tv", format="%.4f")
@@ -413,19 +255,15 @@ with tab4:
         if Cv is None: missing_fields.append("C_v")
         
         if missing_fields:
+            st.session_state.derivations.pop("time", None)
             st.error(f"Cannot calculate time: Missing {', '.join(missing_fields)}")
         else:
-            with st.expander("Calculation Breakdown", expanded=True):
-                st.write("**Formula:** t = (T_v × H_drainage²) / C_v")
-                st.write("Where H_drainage = H/2 (for two-way drainage)")
-                
-                H_drainage = H_tv / 2
-                st.write(f"H_drainage = {H_tv} / 2 = {H_drainage} m")
-                
-                time = (Tv * H_drainage**2) / Cv
-                st.write(f"t = ({Tv} × {H_drainage}²) / {Cv}")
-                st.write(f"t = ({Tv} × {H_drainage**2:.4f}) / {Cv}")
-                st.write(f"**t = {time:.2f} years**")
+            st.session_state.derivations["time"] = derivations.consolidation_time(Tv, H_tv, Cv)[1]
+    
+    show_derivation("time")
+
+with tab5:
+    render_wall_tab()
 
 # Clear all button
 if st.sidebar.button("Clear All Data"):
@@ -0,0 +1,64 @@
+"""The shared LRU cache, and the formula memoization built on it."""
+import numpy as np
+
+from emotional_toolkit.cache import LRUCache
+from geotech.cache import memoize
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {
+        "hits": 3, "misses": 1, "evictions": 1, "size": 2, "maxsize": 2, "hit_rate": 0.75,
+    }
+
+
+def test_get_or_compute_computes_once():
+    cache = LRUCache(4)
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("key", lambda: calls.append(1) or "value") == "value"
+    assert len(calls) == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.stats()["hits"] == 0
+
+
+def counted(cache):
+    calls = []
+
+    def double(x):
+        calls.append(x)
+        return x * 2
+
+    return memoize(double, cache), calls
+
+
+def test_equal_inputs_share_an_entry():
+    double, calls = counted(LRUCache(16))
+    for x in (2, 2.0, np.float64(2), np.int64(2)):
+        double(x)
+    double(-0.0)
+    double(0.0)
+    assert len(calls) == 2
+
+
+def test_only_exactly_equal_inputs_hit():
+    double, calls = counted(LRUCache(16))
+    double(0.1 + 0.2)
+    double(0.3)
+    double(2**53 + 1)
+    assert double(2**53) == 2**54  # not the cached 2**53 + 1
+    assert len(calls) == 4
+
+
+def test_array_inputs_bypass_the_cache():
+    cache = LRUCache(16)
+    double, calls = counted(cache)
+    double(np.arange(3))
+    double(np.arange(3))
+    assert len(calls) == 2 and len(cache) == 0
@@ -0,0 +1,133 @@
+"""Upgrading a populated database created before migrations existed."""
+import sqlite3
+
+import pytest
+
+from emotional_toolkit.migrations import SCHEMA_VERSION, migrate, schema_version
+from emotional_toolkit.search import fts5_available
+from emotional_toolkit.storage import lookup_user_id
+
+# The schema the app created before migrations existed
+BASELINE_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS evidence (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_slug TEXT NOT NULL,
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        evidence TEXT NOT NULL,
+        impact INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS reframing_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_slug TEXT NOT NULL,
+        original_thought TEXT NOT NULL,
+        reframed_thought TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_evidence_user ON evidence(user_slug);
+    CREATE INDEX IF NOT EXISTS idx_reframing_user ON reframing_history(user_slug);
+'''
+
+EVIDENCE = [
+    ("alice", "2024-01-05", "Loving Action", "listened to me all evening", 4),
+    ("bob", "2024-02-10", "Made Me Laugh", "told the worst joke", 2),
+    ("alice", "2024-03-15", "Smart Insight", "saw the problem before I did", 5),
+    ("bob", "2024-03-20", "Teamwork Win", "cooked while I cleaned", 3),
+    ("alice", "2024-04-01", "Loving Action", "left a note", 3),
+]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / "toolkit.db")
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        'INSERT INTO evidence (user_slug, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)', EVIDENCE
+    )
+    conn.execute('DELETE FROM evidence WHERE id = 5')  # its id must not come back
+    conn.executemany(
+        'INSERT INTO reframing_history (user_slug, original_thought, reframed_thought) VALUES (?, ?, ?)',
+        [("bob", "I always mess up", "I mess up sometimes"), ("alice", "Nobody cares", "She listened")],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def rows(conn, sql, params=()):
+    return [tuple(row) for row in conn.execute(sql, params)]
+
+
+def user_stats(conn):
+    return rows(conn, 'SELECT user_id, entries, impact_sum, first_date, last_date FROM evidence_user_stats ORDER BY user_id')
+
+
+def recomputed_user_stats(conn):
+    return rows(conn, '''
+        SELECT user_id, COUNT(*), SUM(impact), MIN(date), MAX(date) FROM evidence GROUP BY user_id ORDER BY user_id
+    ''')
+
+
+def test_upgrade_keeps_ids_and_owners(conn):
+    migrate(conn)
+    assert schema_version(conn) == SCHEMA_VERSION
+    assert 'user_slug' not in [row[1] for row in conn.execute('PRAGMA table_info(evidence)')]
+    alice, bob = lookup_user_id(conn, "alice"), lookup_user_id(conn, "bob")
+    assert rows(conn, 'SELECT id, user_id, evidence FROM evidence ORDER BY id') == [
+        (1, alice, "listened to me all evening"),
+        (2, bob, "told the worst joke"),
+        (3, alice, "saw the problem before I did"),
+        (4, bob, "cooked while I cleaned"),
+    ]
+    assert rows(conn, 'SELECT id, user_id FROM reframing_history ORDER BY id') == [(1, bob), (2, alice)]
+    assert rows(conn, 'SELECT name, seq FROM sqlite_sequence WHERE name = ?', ("evidence",)) == [("evidence", 5)]
+    cursor = conn.execute(
+        'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+        (alice, "2024-05-01", "Sweet Gesture", "brought flowers", 4)
+    )
+    assert cursor.lastrowid == 6
+    assert migrate(conn) == []
+
+
+def test_upgrade_keeps_summaries_and_their_triggers(conn):
+    migrate(conn)
+    assert user_stats(conn) == recomputed_user_stats(conn)
+    alice = lookup_user_id(conn, "alice")
+    versions = dict(rows(conn, 'SELECT user_id, version FROM user_data_versions'))
+
+    conn.execute(
+        'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+        (alice, "2024-06-01", "Loving Action", "made breakfast", 5)
+    )
+    conn.execute('UPDATE evidence SET impact = 1, date = ? WHERE id = 1', ("2024-07-01",))
+    conn.execute('DELETE FROM evidence WHERE id = 2')
+    conn.commit()
+    assert user_stats(conn) == recomputed_user_stats(conn)
+    assert rows(conn, 'SELECT entries, impact_sum FROM evidence_category_stats WHERE user_id = ? AND category = ?',
+                (alice, "Loving Action")) == [(2, 6)]
+    assert dict(rows(conn, 'SELECT user_id, version FROM user_data_versions'))[alice] > versions.get(alice, 0)
+
+
+@pytest.mark.skipif(not fts5_available(sqlite3.connect(":memory:")), reason="SQLite without FTS5")
+def test_upgrade_keeps_the_full_text_index_in_step(conn):
+    migrate(conn)
+
+    def matches(term):
+        return [row[0] for row in conn.execute(
+            'SELECT rowid FROM evidence_fts WHERE evidence_fts MATCH ? ORDER BY rowid', (term,)
+        )]
+
+    assert matches("listened") == [1]
+    assert matches("left") == []
+    conn.execute('UPDATE evidence SET evidence = ? WHERE id = 1', ("listened and laughed",))
+    conn.execute('DELETE FROM evidence WHERE id = 3')
+    conn.execute(
+        'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+        (lookup_user_id(conn, "bob"), "2024-05-01", "Teamwork Win", "laughed at the problem together", 4)
+    )
+    conn.commit()
+    assert matches("laughed") == [1, 6]
+    assert matches("problem") == [6]
+    # Raises if the index and the table disagree
+    conn.execute("INSERT INTO evidence_fts(evidence_fts) VALUES ('integrity-check')")
@@ -0,0 +1,68 @@
+"""The app's reads must be served in index order, never sorted through a temporary B-tree.
+
+Runs the plan checks of `python -m emotional_toolkit.migrations` on a
+migrated and analyzed database, empty and populated, since the planner's
+index choice depends on the statistics ANALYZE gathers.
+"""
+import random
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from emotional_toolkit.migrations import (
+    QUERY_PLAN_CHECKS, SCHEMA_VERSION, explain, migrate, schema_version, temp_btree_queries,
+)
+from emotional_toolkit.storage import lookup_user_id
+
+CATEGORIES = [
+    "Growth & Maturity", "Considerate Moment", "Loving Action", "Smart Insight",
+    "Emotional Strength", "Made Me Laugh", "Teamwork Win", "Personal Breakthrough",
+    "Sweet Gesture", "Problem-Solving", "Patience & Understanding",
+]
+
+
+def populate(conn, users, entries, seed=0):
+    """Random evidence and reframings, in date order as a journal is written"""
+    rng = random.Random(seed)
+    user_ids = [lookup_user_id(conn, f"user_{i}") for i in range(users)]
+    start = date(2020, 1, 1)
+    days = sorted(rng.randrange(2000) for _ in range(entries))
+    conn.executemany(
+        'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+        (
+            (rng.choice(user_ids), (start + timedelta(days=day)).isoformat(),
+             rng.choice(CATEGORIES), f"Entry {i}: you listened and helped", rng.randint(1, 5))
+            for i, day in enumerate(days)
+        ),
+    )
+    conn.executemany(
+        'INSERT INTO reframing_history (user_id, original_thought, reframed_thought) VALUES (?, ?, ?)',
+        ((rng.choice(user_ids), "original", "reframed") for _ in range(entries // 10)),
+    )
+    conn.commit()
+
+
+@pytest.mark.parametrize("users, entries", [(0, 0), (1, 200), (20, 20_000)])
+def test_no_query_sorts_through_a_temporary_btree(tmp_path, users, entries):
+    conn = sqlite3.connect(tmp_path / "toolkit.db")
+    try:
+        migrate(conn)
+        assert schema_version(conn) == SCHEMA_VERSION
+        populate(conn, users, entries)
+        conn.execute('ANALYZE')
+        assert temp_btree_queries(conn) == []
+    finally:
+        conn.close()
+
+
+def test_evidence_page_reads_the_date_index(tmp_path):
+    conn = sqlite3.connect(tmp_path / "toolkit.db")
+    try:
+        migrate(conn)
+        populate(conn, 5, 5_000)
+        conn.execute('ANALYZE')
+        sql, params = QUERY_PLAN_CHECKS["evidence page"]
+        assert any('idx_evidence_user_date_id' in line for line in explain(conn, sql, params))
+    finally:
+        conn.close()
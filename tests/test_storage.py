@@ -0,0 +1,147 @@
+"""Shard routing, and eviction of open shards while sessions are using them."""
+import os
+import threading
+import time
+
+import pytest
+
+from emotional_toolkit import storage as storage_module
+from emotional_toolkit.db import PoolClosed
+from emotional_toolkit.storage import PER_USER, ShardedStorage, parse_shards
+
+
+def save(storage, user, text):
+    with storage.connection(user) as conn:
+        conn.execute(
+            'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)',
+            (storage.user_id(user), "2024-01-01", "Loving Action", text, 3)
+        )
+        conn.commit()
+
+
+def texts(storage, user):
+    with storage.connection(user) as conn:
+        return [row[0] for row in conn.execute(
+            'SELECT evidence FROM evidence WHERE user_id = ? ORDER BY id', (storage.user_id(user),)
+        )]
+
+
+@pytest.mark.parametrize("value, shards", [(None, 1), ("", 1), ("8", 8), (" User ", PER_USER)])
+def test_parse_shards(value, shards):
+    assert parse_shards(value) == shards
+
+
+@pytest.mark.parametrize("value", ["0", "-2", "many"])
+def test_parse_shards_rejects_invalid_settings(value):
+    with pytest.raises(ValueError):
+        parse_shards(value)
+
+
+def test_one_shard_is_the_database_file(tmp_path):
+    path = str(tmp_path / "toolkit.db")
+    assert ShardedStorage(path).shard_path("alice") == path
+
+
+def test_users_are_routed_to_a_stable_shard(tmp_path):
+    path = str(tmp_path / "toolkit.db")
+    storage = ShardedStorage(path, 4)
+    users = [f"user_{i}" for i in range(40)]
+    for user in users:
+        save(storage, user, f"{user} listened")
+    storage.close()
+
+    storage = ShardedStorage(path, 4)
+    paths = {user: storage.shard_path(user) for user in users}
+    assert set(paths.values()) == {str(tmp_path / f"toolkit.{i}-of-4.db") for i in range(4)}
+    for user in users:
+        assert texts(storage, user) == [f"{user} listened"]
+    storage.close()
+
+    # A different shard count looks in files of its own
+    storage = ShardedStorage(path, 2)
+    assert texts(storage, "user_0") == []
+    storage.close()
+
+
+def test_every_user_gets_a_file_of_their_own(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "toolkit.db"), PER_USER)
+    save(storage, "alice", "listened")
+    save(storage, "bob", "helped")
+    storage.close()
+    assert len(os.listdir(tmp_path / "toolkit.users")) == 2
+    assert os.path.dirname(storage.shard_path("alice")) == str(tmp_path / "toolkit.users")
+    assert storage.shard_path("alice") != storage.shard_path("bob")
+
+
+def test_least_recently_used_shard_is_closed_first(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "toolkit.db"), PER_USER, max_open=2)
+    alice, bob = storage.pool("alice"), storage.pool("bob")
+    assert storage.pool("alice") is alice
+    storage.pool("carol")
+    assert storage.open_shards() == [storage.shard_path("alice"), storage.shard_path("carol")]
+    with pytest.raises(PoolClosed):
+        bob.acquire()
+
+    # Evicted shards open again, with their data
+    save(storage, "bob", "helped")
+    assert texts(storage, "bob") == ["helped"]
+    assert len(storage.open_shards()) == 2
+    storage.close()
+    assert storage.open_shards() == []
+
+
+def test_opening_a_shard_blocks_only_its_own_users(tmp_path, monkeypatch):
+    storage = ShardedStorage(str(tmp_path / "toolkit.db"), PER_USER)
+    storage.pool("alice")
+    migrate = storage_module.migrate
+    migrated = []
+    release = threading.Event()
+
+    def slow_migrate(conn):
+        migrated.append(conn)
+        release.wait(5)
+        return migrate(conn)
+
+    monkeypatch.setattr(storage_module, "migrate", slow_migrate)
+    openers = [threading.Thread(target=storage.pool, args=("bob",)) for _ in range(4)]
+    for opener in openers:
+        opener.start()
+    while not migrated:
+        time.sleep(0.01)
+    started = time.monotonic()
+    with storage.connection("alice") as conn:
+        conn.execute('SELECT 1')
+    assert time.monotonic() - started < 1.0
+    release.set()
+    for opener in openers:
+        opener.join()
+    assert len(migrated) == 1
+    assert len(storage.open_shards()) == 2
+    storage.close()
+
+
+def test_evicting_shards_under_load_fails_no_request(tmp_path):
+    # Twelve users over a file each, at most two open, one connection per
+    # shard: sessions keep waiting on pools that another thread evicts
+    storage = ShardedStorage(str(tmp_path / "toolkit.db"), "user", max_open=2, max_size=1, timeout=5.0)
+    users = [f"user_{i}" for i in range(12)]
+    errors = []
+
+    def session(k):
+        try:
+            for i in range(40):
+                with storage.connection(users[(i * 5 + k) % len(users)]) as conn:
+                    conn.execute('SELECT COUNT(*) FROM evidence').fetchone()
+                    time.sleep(0.001)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=session, args=(k,)) for k in range(8)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    storage.close()
+    assert errors == []
+    assert time.monotonic() - started < 5.0  # nobody sat out a pool timeout
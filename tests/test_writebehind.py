@@ -0,0 +1,134 @@
+"""Write-behind queue: crash replay, temporary ids and failure reporting."""
+import sqlite3
+
+import pytest
+
+from emotional_toolkit.storage import ShardedStorage
+from emotional_toolkit.writebehind import WriteBehindQueue
+
+INSERT = 'INSERT INTO evidence (user_id, date, category, evidence, impact) VALUES (?, ?, ?, ?, ?)'
+UPDATE = 'UPDATE evidence SET evidence = ? WHERE id = ?'
+DELETE = 'DELETE FROM evidence WHERE id = ?'
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = ShardedStorage(str(tmp_path / "toolkit.db"), 2)
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "toolkit.db.writes")
+
+
+def started(storage, journal, **options):
+    queue = WriteBehindQueue(storage, journal, **{"flush_interval": 0.01, **options})
+    queue.start()
+    return queue
+
+
+def save(queue, storage, user, text, session="session"):
+    return queue.submit(
+        session, user, "Saving evidence", INSERT,
+        (storage.user_id(user), "2024-01-01", "Loving Action", text, 3), returns_id=True
+    )
+
+
+def edit(queue, user, evidence_id, text, session="session"):
+    queue.submit(session, user, "Updating evidence", UPDATE, (text, evidence_id), id_params=(1,), must_change=True)
+
+
+def evidence(storage, user):
+    with storage.connection(user) as conn:
+        return [
+            tuple(row) for row in conn.execute(
+                'SELECT id, evidence FROM evidence WHERE user_id = ? ORDER BY id', (storage.user_id(user),)
+            )
+        ]
+
+
+def test_replay_applies_writes_left_in_the_journal_once(storage, journal, monkeypatch):
+    # A crash before the background thread applied anything
+    with monkeypatch.context() as patch:
+        patch.setattr(WriteBehindQueue, "_run", lambda self: None)
+        queue = started(storage, journal)
+        first = save(queue, storage, "alice", "listened")
+        save(queue, storage, "bob", "helped")
+        edit(queue, "alice", first, "listened patiently")
+        queue.close()
+    assert evidence(storage, "alice") == []
+
+    # A crash after applying, before the journal was emptied
+    with monkeypatch.context() as patch:
+        patch.setattr(WriteBehindQueue, "_truncate_journal", lambda self: None)
+        queue = started(storage, journal)
+        assert queue.flush(timeout=5)
+        queue.close()
+    assert evidence(storage, "alice") == [(1, "listened patiently")]
+    assert evidence(storage, "bob") == [(1, "helped")]
+
+    queue = started(storage, journal)
+    assert queue.flush(timeout=5)
+    later = save(queue, storage, "alice", "made me laugh")
+    assert later < first  # never a temporary id handed out before
+    queue.close()
+    assert evidence(storage, "alice") == [(1, "listened patiently"), (2, "made me laugh")]
+    assert evidence(storage, "bob") == [(1, "helped")]
+
+
+def test_temporary_ids_resolve_across_batches(storage, journal):
+    queue = started(storage, journal, max_batch=1, max_ids=1)
+    first = save(queue, storage, "alice", "listened")
+    second = save(queue, storage, "alice", "helped")
+    edit(queue, "alice", first, "listened patiently")
+    queue.submit("session", "alice", "Deleting evidence", DELETE, (second,), id_params=(0,), must_change=True)
+    queue.close()
+    assert queue.failures("session") == []
+    assert evidence(storage, "alice") == [(1, "listened patiently")]
+    # Only the last id is still in memory, the others come from the shard
+    assert queue.resolve("alice", first) == 1
+    assert queue.resolve("alice", second) == 2
+
+
+def test_resolved_ids_are_dropped_from_the_shard(storage, journal):
+    queue = started(storage, journal)
+    temp_id = save(queue, storage, "alice", "listened")
+    assert queue.flush(timeout=5)
+    assert queue.resolve("alice", temp_id) == 1
+    save(queue, storage, "alice", "helped")  # drained again after this write
+    queue.close()
+    with storage.connection("alice") as conn:
+        assert [row[0] for row in conn.execute('SELECT temp_id FROM write_behind_ids')] == [temp_id - 1]
+
+
+def test_failed_write_is_reported_to_its_session_only(storage, journal):
+    queue = started(storage, journal, flush_interval=0.2)
+    save(queue, storage, "alice", "listened", session="first")
+    edit(queue, "alice", 999, "gone", session="first")
+    save(queue, storage, "alice", "helped", session="second")
+    assert queue.flush(timeout=5)
+    assert queue.failures("first") == ["Updating evidence failed: the entry no longer exists"]
+    assert queue.failures("first") == []
+    assert queue.failures("second") == []
+    queue.close()
+    assert evidence(storage, "alice") == [(1, "listened"), (2, "helped")]
+
+
+def test_applied_writes_are_not_reported_when_marking_a_failure_fails(storage, journal, monkeypatch):
+    apply_ops = WriteBehindQueue._apply_ops
+
+    def failing_mark(self, conn, ops, seq=None):
+        if not ops:
+            raise sqlite3.OperationalError("disk I/O error")
+        return apply_ops(self, conn, ops, seq)
+
+    monkeypatch.setattr(WriteBehindQueue, "_apply_ops", failing_mark)
+    queue = started(storage, journal, flush_interval=0.2)
+    save(queue, storage, "alice", "listened")
+    edit(queue, "alice", 999, "gone")
+    save(queue, storage, "alice", "helped")
+    queue.close()
+    assert queue.failures("session") == ["Updating evidence failed: the entry no longer exists"]
+    assert evidence(storage, "alice") == [(1, "listened"), (2, "helped")]